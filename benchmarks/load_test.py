@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Test de charge du service ECG
+N captures simultanées sur matériel simulé et M clients (tableaux de bord) interrogeant l'API
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from multiprocessing.managers import BaseManager
+from typing import Dict, Any, List, Optional
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# Répertoires isolés pour ne pas mélanger les données de charge avec une vraie installation
+LOAD_TEST_DIR = tempfile.mkdtemp(prefix='ecg_load_')
+os.environ.setdefault('SPOOL_DIR', os.path.join(LOAD_TEST_DIR, 'spool'))
+os.environ.setdefault('PROFILE_DIR', os.path.join(LOAD_TEST_DIR, 'profiles'))
+os.environ.setdefault('BLOB_STORE_PATH', os.path.join(LOAD_TEST_DIR, 'blobs'))
+
+import requests
+
+# Série Prometheus avec le label diagnostic_id
+METRIC_LINE = re.compile(r'^(\w+)\{diagnostic_id="(\d+)"\} ([0-9.eE+-]+)$')
+
+class MemoryDatabase:
+    """
+    Base de données en mémoire partagée entre le service et les processus de capture
+
+    Implémente le sous-ensemble de DatabaseManager utilisé par le service et la capture.
+    Servie par un BaseManager : les processus de capture y accèdent par proxy.
+    """
+
+    def __init__(self):
+        self.images: Dict[int, Dict[str, Any]] = {}
+        self.sessions: Dict[int, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.next_id = 1
+
+    def save_ecg_images(self, windows: List[Dict[str, Any]]) -> bool:
+        with self.lock:
+            for window in windows:
+                created_at = datetime.fromtimestamp(window['created_at']) if window.get('created_at') else datetime.now()
+                self.images[self.next_id] = {
+                    'id': self.next_id,
+                    'diagnostic_id': window['diagnostic_id'],
+                    'image_blob': window['image_blob'],
+                    'image_format': window.get('image_format') or ('png' if window['image_blob'] else None),
+                    'image_created_at': created_at,
+                    'capture_duration': window.get('capture_duration', 5),
+                    'status': 'completed',
+                    'first_sample_index': window.get('first_sample_index'),
+                    'last_sample_index': window.get('last_sample_index'),
+                    'sample_rate': window.get('sample_rate')
+                }
+                self.next_id += 1
+        return True
+
+    def save_ecg_image(self, diagnostic_id: int, image_blob: bytes, capture_duration: int = 5) -> bool:
+        return self.save_ecg_images([{'diagnostic_id': diagnostic_id, 'image_blob': image_blob,
+                                      'capture_duration': capture_duration}])
+
+    def _listing(self, diagnostic_id: int) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = [image for image in self.images.values() if image['diagnostic_id'] == diagnostic_id]
+
+        rows.sort(key=lambda image: image['image_created_at'], reverse=True)
+        return [
+            {key: value.isoformat() if isinstance(value, datetime) else value
+             for key, value in image.items() if key not in ('image_blob', 'diagnostic_id')}
+            for image in rows
+        ]
+
+    def get_diagnostic_images(self, diagnostic_id: int, since=None, until=None) -> List[Dict[str, Any]]:
+        return self._listing(diagnostic_id)
+
+    def get_latest_images(self, diagnostic_id: int, limit: int = 5) -> List[Dict[str, Any]]:
+        return self._listing(diagnostic_id)[:limit]
+
+    def get_image_blob(self, image_id: int, created_at=None) -> Optional[Dict[str, Any]]:
+        image = self.images.get(image_id)
+        if not image or not image['image_blob']:
+            return None
+
+        return {
+            'image_blob': base64.b64encode(image['image_blob']).decode('utf-8'),
+            'image_format': image['image_format'],
+            'image_created_at': image['image_created_at'].isoformat()
+        }
+
+    def get_image_blobs(self, diagnostic_id: int, image_ids: List[int]) -> List[Dict[str, Any]]:
+        return [
+            {'id': image['id'], 'image_blob': image['image_blob'], 'image_format': image['image_format'],
+             'image_created_at': image['image_created_at'].isoformat()}
+            for image in (self.images.get(image_id) for image_id in image_ids)
+            if image and image['diagnostic_id'] == diagnostic_id and image['image_blob']
+        ]
+
+    def init_capture_session(self, diagnostic_id: int, profile: Dict[str, Any] = None) -> bool:
+        with self.lock:
+            self.sessions[diagnostic_id] = {
+                'diagnostic_id': diagnostic_id, 'status': 'running', 'started_at': datetime.now().isoformat(),
+                'stopped_at': None, 'total_images': 0, 'last_error': None, 'profile': profile
+            }
+        return True
+
+    def update_capture_status(self, diagnostic_id: int, status: str, error_message: str = None) -> bool:
+        with self.lock:
+            session = self.sessions.setdefault(diagnostic_id, {'diagnostic_id': diagnostic_id})
+            session.update(status=status, last_error=error_message)
+            if status == 'stopped':
+                session['stopped_at'] = datetime.now().isoformat()
+        return True
+
+    def update_capture_session_count(self, diagnostic_id: int, total_images: int) -> bool:
+        with self.lock:
+            self.sessions.setdefault(diagnostic_id, {'diagnostic_id': diagnostic_id})['total_images'] = total_images
+        return True
+
+    def finalize_capture_session(self, diagnostic_id: int, final_count: int) -> bool:
+        with self.lock:
+            self.sessions.setdefault(diagnostic_id, {'diagnostic_id': diagnostic_id}).update(
+                status='stopped', stopped_at=datetime.now().isoformat(), total_images=final_count
+            )
+        return True
+
+    def get_capture_session(self, diagnostic_id: int) -> Optional[Dict[str, Any]]:
+        session = self.sessions.get(diagnostic_id)
+        return dict(session) if session else None
+
+class StandInManager(BaseManager):
+    """Serveur de la base en mémoire"""
+
+StandInManager.register('MemoryDatabase', MemoryDatabase)
+
+# Proxy partagé, hérité par les processus de capture (fork)
+STAND_IN = None
+
+class StandInDatabaseManager:
+    """Remplaçant de DatabaseManager délégant à la base en mémoire partagée"""
+
+    def __getattr__(self, name):
+        method = getattr(STAND_IN, name, None)
+        if method is None:
+            # Opérations de maintenance sans objet en mémoire
+            return lambda *args, **kwargs: [] if name.startswith(('get_', 'ensure_', 'drop_')) else 0
+        return method
+
+def start_local_service(port: int) -> str:
+    """
+    Démarrer le service dans ce processus, sur matériel simulé et base en mémoire
+
+    Args:
+        port: Port d'écoute (0 pour un port libre)
+
+    Returns:
+        str: URL de base du service
+    """
+    global STAND_IN
+
+    import simulated_hardware
+    simulated_hardware.install()
+
+    manager = StandInManager()
+    manager.start()
+    STAND_IN = manager.MemoryDatabase()
+
+    # Remplacer la base avant l'import des modules qui l'instancient
+    import database_manager
+    database_manager.DatabaseManager = StandInDatabaseManager
+
+    import ecg_service
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', port, ecg_service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='ecg-service', daemon=True).start()
+
+    return f'http://127.0.0.1:{server.server_port}'
+
+class LatencyRecorder:
+    """Latences et erreurs par point d'accès, partagées entre les clients"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def request(self, session: requests.Session, name: str, method: str, url: str, **kwargs):
+        """
+        Effectuer et chronométrer une requête
+
+        Returns:
+            requests.Response: Réponse, None en cas d'erreur réseau
+        """
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=30, **kwargs)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if response is None or response.status_code >= 400:
+                self.errors[name] += 1
+
+        return response
+
+    def report(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        """
+        Statistiques par point d'accès
+
+        Args:
+            duration: Durée de la phase de charge en secondes
+
+        Returns:
+            dict: Requêtes, débit, erreurs, p50/p99/max en secondes
+        """
+        report = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            report[name] = {
+                'requests': len(values),
+                'requests_per_sec': len(values) / duration,
+                'errors': self.errors[name],
+                'p50': statistics.median(values),
+                'p99': values[min(len(values) - 1, int(len(values) * 0.99))],
+                'max': values[-1]
+            }
+        return report
+
+def poller(base_url: str, diagnostic_ids: List[int], interval: float, recorder: LatencyRecorder,
+           stop_event: threading.Event):
+    """Client de tableau de bord : statut et liste des images à intervalle fixe"""
+    session = requests.Session()
+    index = 0
+
+    while not stop_event.is_set():
+        diagnostic_id = diagnostic_ids[index % len(diagnostic_ids)]
+        index += 1
+
+        recorder.request(session, 'status', 'GET', f'{base_url}/capture/status/{diagnostic_id}')
+        recorder.request(session, 'images', 'GET', f'{base_url}/images/{diagnostic_id}')
+        stop_event.wait(interval)
+
+def streamer(base_url: str, diagnostic_id: int, interval: float, recorder: LatencyRecorder,
+             stop_event: threading.Event):
+    """Client de galerie temps réel : télécharge chaque nouvelle image d'un diagnostic"""
+    session = requests.Session()
+    seen = set()
+
+    while not stop_event.is_set():
+        response = recorder.request(session, 'images', 'GET', f'{base_url}/images/{diagnostic_id}')
+
+        if response is not None and response.ok:
+            for image in response.json().get('images', []):
+                if image['id'] in seen or not image.get('image_format'):
+                    continue
+                seen.add(image['id'])
+                recorder.request(session, 'image', 'GET', f"{base_url}/image/{image['id']}",
+                                 params={'created_at': image['image_created_at']})
+
+        stop_event.wait(interval)
+
+def parse_capture_metrics(text: str) -> Dict[int, Dict[str, float]]:
+    """
+    Extraire les compteurs par diagnostic de l'exposition Prometheus
+
+    Returns:
+        dict: Valeurs par diagnostic et par nom de métrique
+    """
+    values = defaultdict(dict)
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            name, diagnostic_id, value = match.groups()
+            values[int(diagnostic_id)][name] = float(value)
+    return values
+
+def run_load_test(base_url: str, args) -> Dict[str, Any]:
+    """
+    Dérouler un test de charge
+
+    Args:
+        base_url: URL du service
+        args: Paramètres de la ligne de commande
+
+    Returns:
+        dict: Rapport (latences par point d'accès, captures, échantillons perdus)
+    """
+    recorder = LatencyRecorder()
+    session = requests.Session()
+    diagnostic_ids = list(range(args.first_id, args.first_id + args.diagnostics))
+    profile = json.loads(args.profile) if args.profile else None
+
+    captures_started = time.perf_counter()
+    for diagnostic_id in diagnostic_ids:
+        response = recorder.request(session, 'start', 'POST', f'{base_url}/capture/start/{diagnostic_id}',
+                                    json=profile)
+        if response is None or not response.ok:
+            print(f'Could not start diagnostic {diagnostic_id}: '
+                  f'{response.text if response is not None else "connection error"}')
+
+    stop_event = threading.Event()
+    clients = [
+        threading.Thread(target=poller, args=(base_url, diagnostic_ids, args.poll_interval, recorder, stop_event))
+        for _ in range(args.pollers)
+    ] + [
+        threading.Thread(target=streamer, args=(base_url, diagnostic_ids[i % len(diagnostic_ids)],
+                                                args.poll_interval, recorder, stop_event))
+        for i in range(args.streamers)
+    ]
+
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+
+    time.sleep(args.duration)
+    stop_event.set()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    # État des captures avant l'arrêt
+    statuses = {}
+    for diagnostic_id in diagnostic_ids:
+        response = session.get(f'{base_url}/capture/status/{diagnostic_id}', timeout=30)
+        statuses[diagnostic_id] = (response.json().get('live') or {}) if response.ok else {}
+
+    metrics = parse_capture_metrics(session.get(f'{base_url}/metrics', timeout=30).text)
+    capture_elapsed = time.perf_counter() - captures_started
+
+    for diagnostic_id in diagnostic_ids:
+        recorder.request(session, 'stop', 'POST', f'{base_url}/capture/stop/{diagnostic_id}')
+
+    captures = {}
+    for diagnostic_id in diagnostic_ids:
+        live = statuses[diagnostic_id]
+        counters = metrics.get(diagnostic_id, {})
+        spool = live.get('spool') or {}
+        captures[diagnostic_id] = {
+            'samples': live.get('sample_count', 0),
+            'samples_per_sec': live.get('sample_count', 0) / capture_elapsed,
+            'windows_saved': live.get('save_count', 0),
+            'missed_samples': int(counters.get('ecg_missed_samples_total', 0)),
+            'dropped_windows': spool.get('dropped_windows', 0),
+            'spool_pending': spool.get('pending_windows', 0),
+            'last_error': live.get('last_error')
+        }
+
+    total_samples = sum(c['samples'] for c in captures.values())
+    total_missed = sum(c['missed_samples'] for c in captures.values())
+
+    # Import tardif : run_benchmarks charge la capture, après le remplacement de la base
+    from run_benchmarks import environment_info
+
+    return {
+        'environment': environment_info(),
+        'parameters': {
+            'url': base_url,
+            'diagnostics': args.diagnostics,
+            'pollers': args.pollers,
+            'streamers': args.streamers,
+            'poll_interval': args.poll_interval,
+            'duration': elapsed,
+            'profile': profile
+        },
+        'endpoints': recorder.report(elapsed),
+        'captures': captures,
+        'totals': {
+            'samples': total_samples,
+            'samples_per_sec': total_samples / capture_elapsed,
+            'missed_samples': total_missed,
+            'missed_ratio': total_missed / (total_samples + total_missed) if total_samples + total_missed else 0.0,
+            'windows_saved': sum(c['windows_saved'] for c in captures.values()),
+            'dropped_windows': sum(c['dropped_windows'] for c in captures.values())
+        }
+    }
+
+def print_report(report: Dict[str, Any]):
+    """Afficher le rapport sous forme de tableau"""
+    print(f'{"endpoint":10s} {"requests":>9s} {"req/s":>8s} {"errors":>7s} {"p50 ms":>9s} {"p99 ms":>9s}')
+    for name, stats in report['endpoints'].items():
+        print(f'{name:10s} {stats["requests"]:9d} {stats["requests_per_sec"]:8.1f} {stats["errors"]:7d} '
+              f'{stats["p50"] * 1000:9.2f} {stats["p99"] * 1000:9.2f}')
+
+    print()
+    print(f'{"diagnostic":10s} {"samples/s":>10s} {"missed":>8s} {"windows":>8s} {"dropped":>8s}')
+    for diagnostic_id, capture in report['captures'].items():
+        print(f'{diagnostic_id:<10d} {capture["samples_per_sec"]:10.1f} {capture["missed_samples"]:8d} '
+              f'{capture["windows_saved"]:8d} {capture["dropped_windows"]:8d}')
+
+    totals = report['totals']
+    print()
+    print(f'Total {totals["samples_per_sec"]:.0f} samples/s, {totals["missed_samples"]} missed '
+          f'({totals["missed_ratio"]:.2%}), {totals["windows_saved"]} windows saved, '
+          f'{totals["dropped_windows"]} dropped')
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='ECG service load test')
+    parser.add_argument('--url', help='Existing service to load (default: start one with simulated hardware)')
+    parser.add_argument('--port', type=int, default=0, help='Port of the local service (default: any free port)')
+    parser.add_argument('--diagnostics', type=int, default=4, help='Concurrent captures (N)')
+    parser.add_argument('--first-id', type=int, default=1000, help='First simulated diagnostic ID')
+    parser.add_argument('--pollers', type=int, default=4, help='Dashboard clients polling status and listings')
+    parser.add_argument('--streamers', type=int, default=4, help='Gallery clients fetching every new image')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='Client polling interval (s)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Load phase duration (s)')
+    parser.add_argument('--profile', help='Capture profile JSON sent to /capture/start')
+    parser.add_argument('--output', default='load_results.json', help='JSON results file')
+    parser.add_argument('--max-missed-ratio', type=float, help='Exit with 1 if the missed sample ratio exceeds this')
+    args = parser.parse_args(argv)
+
+    base_url = args.url.rstrip('/') if args.url else start_local_service(args.port)
+    print(f'Loading {base_url} with {args.diagnostics} captures, {args.pollers} pollers, '
+          f'{args.streamers} streamers for {args.duration:.0f}s')
+
+    report = run_load_test(base_url, args)
+    report['database'] = 'service' if args.url else 'memory'
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    print(f'Results written to {args.output}')
+
+    if args.max_missed_ratio is not None and report['totals']['missed_ratio'] > args.max_missed_ratio:
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
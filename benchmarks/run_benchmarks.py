@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Benchmarks des chemins critiques ECG
+Décodage SPI, conversion, rendu, persistance et capture de bout en bout
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# Spool isolé pour ne pas mélanger les fenêtres de benchmark avec une vraie capture
+os.environ.setdefault('SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'ecg_bench_spool'))
+
+import simulated_hardware
+simulated_hardware.install()
+
+import numpy as np
+from ecg_capture import ECGCapture
+from capture_profile import CaptureProfile
+from replay import VirtualClock
+from waveform_frame import encode_frame
+from database_manager import DatabaseManager
+
+SEED = 1234
+
+class MemoryDatabaseManager:
+    """Remplaçant en mémoire de DatabaseManager quand aucune base n'est disponible"""
+
+    def __init__(self):
+        self.images = []
+
+    def save_ecg_image(self, diagnostic_id: int, image_blob: bytes, capture_duration: int = 5) -> bool:
+        self.images.append((diagnostic_id, image_blob))
+        return True
+
+    def save_ecg_images(self, windows: List[Dict[str, Any]]) -> bool:
+        self.images.extend((w['diagnostic_id'], w['image_blob']) for w in windows)
+        return True
+
+    def __getattr__(self, name):
+        # Opérations de session sans effet
+        return lambda *args, **kwargs: True
+
+def measure(func: Callable[[], Any], rounds: int, inner: int = 1, warmup: int = 3) -> Dict[str, Any]:
+    """
+    Chronométrer une fonction
+
+    Args:
+        func: Fonction à mesurer
+        rounds: Nombre de mesures
+        inner: Nombre d'appels par mesure
+        warmup: Nombre d'appels d'échauffement
+
+    Returns:
+        dict: Statistiques en secondes par appel
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(inner):
+            func()
+        timings.append((time.perf_counter() - start) / inner)
+
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        'rounds': rounds,
+        'inner': inner,
+        'min': timings[0],
+        'median': median,
+        'mean': statistics.fmean(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'max': timings[-1],
+        'ops_per_sec': 1.0 / median if median > 0 else None
+    }
+
+def make_capture(diagnostic_id: int = 1, capture_class=ECGCapture, profile: CaptureProfile = None) -> ECGCapture:
+    """Créer une capture sur matériel simulé"""
+    return capture_class(diagnostic_id, threading.Event(), profile=profile)
+
+def bench_analog_read(rounds: int) -> Dict[str, Any]:
+    capture = make_capture()
+    return measure(capture._analog_read, rounds, inner=1000)
+
+def bench_convert_to_voltage(rounds: int) -> Dict[str, Any]:
+    capture = make_capture()
+    values = np.random.default_rng(SEED).integers(0, 1024, 1000).tolist()
+
+    def run():
+        for value in values:
+            capture._convert_to_voltage(value)
+
+    result = measure(run, rounds)
+    result['samples_per_call'] = len(values)
+    return result
+
+def _window(capture: ECGCapture):
+    """Construire une fenêtre complète de données simulées"""
+    voltages = [capture._convert_to_voltage(capture._analog_read()) for _ in range(capture.window_size)]
+    times = [i / capture.SAMPLE_RATE for i in range(capture.window_size)]
+    return voltages, times
+
+def bench_generate_plot(rounds: int) -> Dict[str, Any]:
+    capture = make_capture()
+    voltages, times = _window(capture)
+    result = measure(lambda: capture._generate_plot(voltages, times), rounds, warmup=1)
+    result['image_bytes'] = len(capture._generate_plot(voltages, times))
+    return result
+
+def bench_encode_frame(rounds: int) -> Dict[str, Any]:
+    """Trame binaire de la même fenêtre, alternative au rendu côté serveur"""
+    capture = make_capture()
+    samples = np.array([capture._analog_read() for _ in range(capture.window_size)])
+    result = measure(lambda: encode_frame(samples, capture.SAMPLE_RATE, 0.0), rounds, inner=100)
+    result['frame_bytes'] = len(encode_frame(samples, capture.SAMPLE_RATE, 0.0))
+    return result
+
+def bench_database(rounds: int, diagnostic_id: int) -> Dict[str, Any]:
+    """Mesurer save_ecg_image et get_image_blob sur une base locale"""
+    db_manager = DatabaseManager()
+    capture = make_capture(diagnostic_id)
+    image = capture._generate_plot(*_window(capture))
+
+    results = {
+        'save_ecg_image': measure(lambda: db_manager.save_ecg_image(diagnostic_id, image), rounds, warmup=1)
+    }
+
+    latest = db_manager.get_latest_images(diagnostic_id, limit=1)
+    if latest:
+        image_id = latest[0]['id']
+        results['get_image_blob'] = measure(lambda: db_manager.get_image_blob(image_id), rounds, warmup=1)
+
+    return results
+
+def bench_capture_throughput(duration: float, diagnostic_id: int, db_manager) -> Dict[str, Any]:
+    """
+    Faire tourner la boucle de capture complète à la vitesse maximale
+
+    Profil de diagnostic (100 Hz, fenêtres de 5 s) cadencé par une horloge virtuelle
+    sans attente : chaque échantillon enchaîne sur le suivant.
+
+    Args:
+        duration: Durée de la mesure en secondes
+        diagnostic_id: ID du diagnostic simulé
+        db_manager: Base utilisée pour la persistance
+    """
+    capture = make_capture(diagnostic_id, profile=CaptureProfile.from_dict({'preset': 'diagnostic'}))
+    capture.clock = VirtualClock()
+    capture.db_manager = db_manager
+    capture.replayer.db_manager = db_manager
+
+    stopper = threading.Timer(duration, capture.stop_event.set)
+    start = time.perf_counter()
+    stopper.start()
+    capture.run()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'duration': elapsed,
+        'samples': capture.sample_count,
+        'images': capture.save_count,
+        'samples_per_sec': capture.sample_count / elapsed,
+        'images_per_sec': capture.save_count / elapsed
+    }
+
+def database_available() -> bool:
+    """Vérifier qu'une base locale répond"""
+    try:
+        DatabaseManager()._get_connection().close()
+        return True
+    except Exception:
+        return False
+
+def environment_info() -> Dict[str, Any]:
+    """Décrire l'environnement d'exécution"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'seed': SEED
+    }
+
+def compare(results: Dict[str, Any], baseline_path: str, threshold: float) -> List[str]:
+    """
+    Comparer les médianes avec un résultat précédent
+
+    Args:
+        results: Résultats courants
+        baseline_path: Fichier JSON de référence
+        threshold: Dégradation relative tolérée
+
+    Returns:
+        list: Descriptions des régressions
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or 'median' not in current or 'median' not in previous:
+            continue
+
+        change = current['median'] / previous['median'] - 1
+        if change > threshold:
+            regressions.append(f"{name}: median {previous['median']:.6f}s -> {current['median']:.6f}s (+{change:.0%})")
+
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='ECG hot path benchmarks')
+    parser.add_argument('--output', default='bench_results.json', help='JSON results file')
+    parser.add_argument('--rounds', type=int, default=30, help='Measurements per benchmark')
+    parser.add_argument('--duration', type=float, default=5.0, help='End-to-end capture duration (s)')
+    parser.add_argument('--diagnostics', type=int, nargs='+', default=[1], help='Diagnostic IDs for DB and capture runs')
+    parser.add_argument('--no-db', action='store_true', help='Skip the database benchmarks')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Tolerated median slowdown when comparing')
+    args = parser.parse_args(argv)
+
+    np.random.seed(SEED)
+
+    use_db = not args.no_db and database_available()
+    if not args.no_db and not use_db:
+        print('Database not reachable, running persistence benchmarks in memory')
+
+    results = {}
+    print('Running analog_read...')
+    results['analog_read'] = bench_analog_read(args.rounds)
+    print('Running convert_to_voltage...')
+    results['convert_to_voltage'] = bench_convert_to_voltage(args.rounds)
+    print('Running generate_plot...')
+    results['generate_plot'] = bench_generate_plot(args.rounds)
+    print('Running encode_frame...')
+    results['encode_frame'] = bench_encode_frame(args.rounds)
+
+    if use_db:
+        print('Running database benchmarks...')
+        for name, result in bench_database(args.rounds, args.diagnostics[0]).items():
+            results[name] = result
+
+    for diagnostic_id in args.diagnostics:
+        print(f'Running capture throughput for diagnostic {diagnostic_id}...')
+        db_manager = DatabaseManager() if use_db else MemoryDatabaseManager()
+        results[f'capture_throughput[{diagnostic_id}]'] = bench_capture_throughput(
+            args.duration, diagnostic_id, db_manager
+        )
+
+    report = {
+        'environment': environment_info(),
+        'database': 'mysql' if use_db else 'memory',
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        if 'median' in result:
+            print(f'{name:32s} median {result["median"] * 1e6:12.2f} us')
+        else:
+            print(f'{name:32s} {result["samples_per_sec"]:12.0f} samples/s {result["images_per_sec"]:8.2f} images/s')
+
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,15 +26,77 @@ CREATE TABLE IF NOT EXISTS `diagnostics` (
 
 -- Table des données ECG
 CREATE TABLE IF NOT EXISTS `ecg_data` (
-  `id` INT AUTO_INCREMENT PRIMARY KEY,
-  `image_blob` LONGBLOB NOT NULL COMMENT 'Image blob',
-  `image_created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT 'Horodatage de la création de l''image',
+  `id` INT AUTO_INCREMENT,
+  `image_blob` LONGBLOB NULL COMMENT 'Image blob (NULL si déplacée vers le stockage disque)',
+  `blob_ref` CHAR(64) NULL COMMENT 'Empreinte SHA-256 de l''image dans le stockage disque',
+  `blob_size` INT NULL COMMENT 'Taille de l''image en octets',
+  `image_created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Horodatage de la création de l''image (clé de partitionnement)',
   `diagnostic_id` INT NOT NULL,
   `capture_duration` INT DEFAULT 5 COMMENT 'Durée de capture en secondes',
   `status` ENUM('captured', 'processing', 'completed') DEFAULT 'completed' COMMENT 'Statut de l''image',
-  FOREIGN KEY (`diagnostic_id`) REFERENCES `diagnostics`(`id`) ON DELETE CASCADE
+  `first_sample_index` BIGINT NULL COMMENT 'Indice du premier échantillon de la fenêtre',
+  `last_sample_index` BIGINT NULL COMMENT 'Indice du dernier échantillon de la fenêtre',
+  `sample_rate` INT NULL COMMENT 'Fréquence d''échantillonnage en Hz',
+  `samples_blob` MEDIUMBLOB NULL COMMENT 'Échantillons ADC bruts (uint16 little-endian)',
+  `image_format` VARCHAR(16) NULL COMMENT 'Format de l''image (png, png_palette, webp)',
+  -- La clé de partitionnement doit faire partie de la clé primaire ;
+  -- les tables partitionnées n'acceptent pas de clé étrangère (diagnostic_id est indexé seulement)
+  PRIMARY KEY (`id`, `image_created_at`),
+  INDEX `idx_diagnostic_created` (`diagnostic_id`, `image_created_at`),
+  INDEX `idx_diagnostic_sample` (`diagnostic_id`, `first_sample_index`),
+  INDEX `idx_blob_ref` (`blob_ref`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+-- Partitions mensuelles créées à l'avance par scripts/partition_maintenance.py
+PARTITION BY RANGE COLUMNS (`image_created_at`) (
+  PARTITION `p_future` VALUES LESS THAN (MAXVALUE)
+);
+
+-- Partitions initiales à partir de la date d'installation : historique avant le mois courant,
+-- mois courant et trois mois suivants (ECG_PARTITION_MONTHS_AHEAD par défaut)
+SET @month = DATE_FORMAT(CURDATE(), '%Y-%m-01');
+SET @partitions = (
+  SELECT COUNT(*) FROM information_schema.PARTITIONS
+  WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ecg_data' AND PARTITION_NAME IS NOT NULL
+);
+SET @ddl = IF(@partitions = 1, CONCAT(
+  'ALTER TABLE `ecg_data` REORGANIZE PARTITION `p_future` INTO (',
+  'PARTITION `p_history` VALUES LESS THAN (''', @month, '''), ',
+  'PARTITION `p', DATE_FORMAT(@month, '%Y%m'), '` VALUES LESS THAN (''', @month + INTERVAL 1 MONTH, '''), ',
+  'PARTITION `p', DATE_FORMAT(@month + INTERVAL 1 MONTH, '%Y%m'), '` VALUES LESS THAN (''', @month + INTERVAL 2 MONTH, '''), ',
+  'PARTITION `p', DATE_FORMAT(@month + INTERVAL 2 MONTH, '%Y%m'), '` VALUES LESS THAN (''', @month + INTERVAL 3 MONTH, '''), ',
+  'PARTITION `p', DATE_FORMAT(@month + INTERVAL 3 MONTH, '%Y%m'), '` VALUES LESS THAN (''', @month + INTERVAL 4 MONTH, '''), ',
+  'PARTITION `p_future` VALUES LESS THAN (MAXVALUE))'
+), 'DO 0');
+PREPARE create_partitions FROM @ddl;
+EXECUTE create_partitions;
+DEALLOCATE PREPARE create_partitions;
+
+-- Partitions supprimées par la rétention : résumés déjà décomptés (reprise sans double décompte)
+CREATE TABLE IF NOT EXISTS `ecg_partition_drops` (
+  `partition_name` VARCHAR(64) NOT NULL,
+  `upper_bound` DATETIME NOT NULL COMMENT 'Borne supérieure (exclue) de la partition',
+  `adjusted_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT 'Décompte des résumés',
+  PRIMARY KEY (`partition_name`, `upper_bound`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Diagnostics supprimés dont les fenêtres restent à effacer (ecg_data n'a pas de clé étrangère) ;
+-- alimentée par les triggers ci-dessous, vidée par scripts/partition_maintenance.py
+CREATE TABLE IF NOT EXISTS `ecg_deleted_diagnostics` (
+  `diagnostic_id` INT PRIMARY KEY,
+  `deleted_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  INDEX `idx_deleted_at` (`deleted_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DROP TRIGGER IF EXISTS `diagnostics_after_delete`;
+CREATE TRIGGER `diagnostics_after_delete` AFTER DELETE ON `diagnostics` FOR EACH ROW
+  INSERT IGNORE INTO `ecg_deleted_diagnostics` (`diagnostic_id`) VALUES (OLD.id);
+
+-- La cascade depuis patients ne déclenche pas les triggers de diagnostics
+DROP TRIGGER IF EXISTS `patients_before_delete`;
+CREATE TRIGGER `patients_before_delete` BEFORE DELETE ON `patients` FOR EACH ROW
+  INSERT IGNORE INTO `ecg_deleted_diagnostics` (`diagnostic_id`)
+  SELECT `id` FROM `diagnostics` WHERE `patient_id` = OLD.id;
+
 -- Table des utilisateurs (pour l'authentification)
 CREATE TABLE IF NOT EXISTS `users` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
@@ -66,7 +128,82 @@ CREATE TABLE IF NOT EXISTS `ecg_capture_sessions` (
   `stopped_at` TIMESTAMP NULL,
   `total_images` INT DEFAULT 0,
   `last_error` TEXT NULL,
+  `profile` JSON NULL COMMENT 'Profil de capture de la session',
+  `signal_issue` VARCHAR(16) NULL COMMENT 'Problème de signal en cours (saturation, flatline, noise)',
+  `signal_issue_since` DATETIME NULL COMMENT 'Début du problème de signal en cours',
+  `signal_events` INT NOT NULL DEFAULT 0 COMMENT 'Épisodes de signal inexploitable',
+  `suppressed_windows` INT NOT NULL DEFAULT 0 COMMENT 'Fenêtres non rendues (signal inexploitable)',
+  FOREIGN KEY (`diagnostic_id`) REFERENCES `diagnostics`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `ecg_diagnostic_summary` (
+  `diagnostic_id` INT PRIMARY KEY,
+  `total_windows` BIGINT NOT NULL DEFAULT 0 COMMENT 'Fenêtres enregistrées',
+  `total_images` BIGINT NOT NULL DEFAULT 0 COMMENT 'Fenêtres avec une image',
+  `total_bytes` BIGINT NOT NULL DEFAULT 0 COMMENT 'Octets stockés (images et échantillons)',
+  `total_samples` BIGINT NOT NULL DEFAULT 0 COMMENT 'Échantillons couverts par les fenêtres',
+  `first_capture_at` DATETIME NULL COMMENT 'Première fenêtre enregistrée',
+  `last_capture_at` DATETIME NULL COMMENT 'Dernière fenêtre enregistrée',
+  `session_count` INT NOT NULL DEFAULT 0 COMMENT 'Sessions de capture démarrées',
+  `total_capture_seconds` BIGINT NOT NULL DEFAULT 0 COMMENT 'Durée cumulée des sessions terminées',
+  `last_session_started_at` DATETIME NULL,
+  `last_session_stopped_at` DATETIME NULL,
+  `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   FOREIGN KEY (`diagnostic_id`) REFERENCES `diagnostics`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Résumé par diagnostic maintenu avec ecg_data';
+
+-- Caractéristiques par fenêtre, calculées à la capture (recherche multi-diagnostics)
+-- Clé primaire ordonnée par date : plages de dates et pagination par clé contiguës
+CREATE TABLE IF NOT EXISTS `ecg_window_features` (
+  `image_created_at` DATETIME NOT NULL COMMENT 'Horodatage de la fenêtre',
+  `ecg_data_id` INT NOT NULL COMMENT 'Fenêtre (ecg_data.id)',
+  `diagnostic_id` INT NOT NULL,
+  `beats` SMALLINT NULL COMMENT 'Battements détectés',
+  `heart_rate` FLOAT NULL COMMENT 'Fréquence cardiaque (bpm)',
+  `rr_mean` FLOAT NULL COMMENT 'Intervalle RR moyen (s)',
+  `rr_sdnn` FLOAT NULL COMMENT 'Écart type des intervalles RR (s)',
+  `rr_rmssd` FLOAT NULL COMMENT 'RMSSD des intervalles RR (s)',
+  `amplitude_range` FLOAT NULL COMMENT 'Amplitude crête à crête (V)',
+  `noise_score` FLOAT NULL COMMENT 'Bruit haute fréquence rapporté à l''amplitude (0 à 1)',
+  `flatline_ratio` FLOAT NULL COMMENT 'Part des échantillons identiques au précédent',
+  `saturation_ratio` FLOAT NULL COMMENT 'Part des échantillons en butée de l''ADC',
+  PRIMARY KEY (`image_created_at`, `ecg_data_id`),
+  UNIQUE KEY `uq_ecg_data` (`ecg_data_id`),
+  INDEX `idx_diagnostic_created` (`diagnostic_id`, `image_created_at`),
+  INDEX `idx_heart_rate` (`heart_rate`, `image_created_at`),
+  INDEX `idx_rr_sdnn` (`rr_sdnn`, `image_created_at`),
+  INDEX `idx_amplitude` (`amplitude_range`, `image_created_at`),
+  INDEX `idx_noise` (`noise_score`, `image_created_at`),
+  INDEX `idx_flatline` (`flatline_ratio`, `image_created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Résultats des analyses par lots (scripts/batch_analysis.py)
+CREATE TABLE IF NOT EXISTS `ecg_analysis_results` (
+  `analysis` VARCHAR(64) NOT NULL COMMENT 'Nom de l''analyse',
+  `ecg_data_id` INT NOT NULL COMMENT 'Fenêtre analysée',
+  `version` INT NOT NULL COMMENT 'Version de l''analyse ayant produit le résultat',
+  `diagnostic_id` INT NOT NULL,
+  `image_created_at` DATETIME NOT NULL COMMENT 'Horodatage de la fenêtre',
+  `result` JSON NULL,
+  `error` TEXT NULL,
+  `computed_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`analysis`, `ecg_data_id`),
+  INDEX `idx_diagnostic_analysis` (`diagnostic_id`, `analysis`, `image_created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Point de reprise des analyses par lots
+CREATE TABLE IF NOT EXISTS `ecg_analysis_jobs` (
+  `analysis` VARCHAR(64) NOT NULL,
+  `version` INT NOT NULL,
+  `scope` VARCHAR(16) NOT NULL DEFAULT '' COMMENT 'Empreinte des filtres (vide : tout l''historique)',
+  `filters` VARCHAR(255) NULL COMMENT 'Filtres du job (--since, --until, --diagnostics)',
+  `last_ecg_data_id` INT NOT NULL DEFAULT 0 COMMENT 'Dernière fenêtre traitée (ordre des id)',
+  `processed` BIGINT NOT NULL DEFAULT 0,
+  `failed` BIGINT NOT NULL DEFAULT 0,
+  `status` ENUM('running', 'completed', 'interrupted') NOT NULL DEFAULT 'running',
+  `started_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`analysis`, `version`, `scope`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Insertion d'un utilisateur admin par défaut (mot de passe: admin)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Analyses par lots sur l'historique ECG
+Parcourt ecg_data avec un curseur côté serveur et répartit les fenêtres sur un pool de processus
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+from database_manager import DatabaseManager
+from ecg_analysis import ANALYSES, run_analysis
+
+logger = logging.getLogger(__name__)
+
+# Priorité des processus d'analyse : les captures en cours passent avant
+WORKER_NICENESS = 10
+
+# Délai entre deux messages de progression en secondes
+PROGRESS_INTERVAL = 30
+
+def _init_worker():
+    """Initialiser un processus du pool (interruption gérée par le processus principal)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        os.nice(WORKER_NICENESS)
+    except OSError:
+        pass
+
+def _analyze_window(task: tuple) -> tuple:
+    """
+    Analyser une fenêtre dans un processus du pool
+
+    Args:
+        task: (analyse, (id, diagnostic_id, image_created_at, sample_rate, samples_blob))
+
+    Returns:
+        tuple: (id, diagnostic_id, image_created_at, résultat, erreur)
+    """
+    analysis, (window_id, diagnostic_id, created_at, sample_rate, samples_blob) = task
+    try:
+        return window_id, diagnostic_id, created_at, run_analysis(analysis, samples_blob, sample_rate), None
+    except Exception as e:
+        return window_id, diagnostic_id, created_at, None, str(e)
+
+def analysis_scope(since: datetime = None, until: datetime = None,
+                   diagnostic_ids: List[int] = None) -> Tuple[str, Optional[str]]:
+    """
+    Portée d'un job : chaque jeu de filtres a son propre point de reprise
+    
+    Args:
+        since: Début de la période analysée
+        until: Fin de la période analysée (exclue)
+        diagnostic_ids: Diagnostics analysés
+        
+    Returns:
+        tuple: (empreinte, vide sans filtre ; description lisible des filtres, None sans filtre)
+    """
+    filters = {}
+    if since is not None:
+        filters['since'] = since.isoformat()
+    if until is not None:
+        filters['until'] = until.isoformat()
+    if diagnostic_ids:
+        filters['diagnostic_ids'] = sorted(set(diagnostic_ids))
+    
+    if not filters:
+        return '', None
+    
+    description = json.dumps(filters, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()[:16], description[:255]
+
+class BatchAnalysisJob:
+    """Analyse par lots reprenable des fenêtres enregistrées"""
+
+    def __init__(self, db_manager, analysis: str, workers: Optional[int] = None, chunk_size: int = 1000,
+                 batch_size: int = 200, max_rate: Optional[float] = None, since: datetime = None,
+                 until: datetime = None, diagnostic_ids: List[int] = None):
+        """
+        Initialiser le job
+
+        Args:
+            db_manager: Gestionnaire de base de données
+            analysis: Nom de l'analyse (clé de ecg_analysis.ANALYSES)
+            workers: Nombre de processus (défaut : tous les cœurs)
+            chunk_size: Fenêtres lues par requête
+            batch_size: Résultats écrits par transaction (granularité du point de reprise)
+            max_rate: Fenêtres par seconde au maximum (None pour ne pas limiter)
+            since: Début de la période analysée
+            until: Fin de la période analysée (exclue)
+            diagnostic_ids: Restreindre à ces diagnostics
+        """
+        if analysis not in ANALYSES:
+            raise ValueError(f"Unknown analysis: {analysis}")
+
+        self.db_manager = db_manager
+        self.analysis = analysis
+        self.version = ANALYSES[analysis]['version']
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.since = since
+        self.until = until
+        self.diagnostic_ids = diagnostic_ids
+        self.scope, self.filters = analysis_scope(since, until, diagnostic_ids)
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        """Demander l'arrêt après le lot en cours"""
+        self.stop_event.set()
+
+    def _tasks(self, after_id: int, counter: List[int]):
+        """Fenêtres d'une requête, comptées au fil de la lecture"""
+        for row in self.db_manager.stream_ecg_windows(after_id, self.chunk_size, self.since, self.until,
+                                                      self.diagnostic_ids):
+            counter[0] += 1
+            yield self.analysis, row
+
+    def run(self, restart: bool = False) -> Dict[str, Any]:
+        """
+        Exécuter l'analyse depuis le dernier point de reprise
+
+        Args:
+            restart: Ignorer le point de reprise et tout recalculer
+
+        Returns:
+            dict: Bilan (statut, fenêtres traitées et en erreur, dernier id, débit)
+        """
+        if restart:
+            self.db_manager.reset_analysis_job(self.analysis, self.version, self.scope, self.filters)
+
+        try:
+            job = self.db_manager.get_analysis_job(self.analysis, self.version, self.scope)
+        except Exception as e:
+            # Repartir de l'id 0 recalculerait tout l'historique : abandon sans toucher au job
+            logger.error(f"Analysis {self.analysis} not started, checkpoint unavailable: {e}")
+            return self._summary('interrupted', 0, 0, None, 0.0)
+
+        last_id = job['last_ecg_data_id'] if job else 0
+        logger.info(f"Starting analysis {self.analysis} v{self.version} after id {last_id} "
+                    f"with {self.workers} workers" + (f" (filters {self.filters})" if self.filters else ""))
+
+        processed = failed = 0
+        status = 'interrupted'
+        started = last_progress = time.monotonic()
+
+        try:
+            with multiprocessing.Pool(self.workers, initializer=_init_worker) as pool:
+                while not self.stop_event.is_set():
+                    counter = [0]
+                    batch = []
+
+                    # imap conserve l'ordre des id : le point de reprise reste contigu
+                    for result in pool.imap(_analyze_window, self._tasks(last_id, counter), chunksize=16):
+                        batch.append(result)
+                        if len(batch) < self.batch_size:
+                            continue
+
+                        if not self.db_manager.save_analysis_results(self.analysis, self.version, batch,
+                                                                     self.scope, self.filters):
+                            raise RuntimeError('could not save analysis results')
+
+                        processed += len(batch)
+                        failed += sum(1 for item in batch if item[4] is not None)
+                        last_id = batch[-1][0]
+                        batch = []
+
+                        if self.max_rate:
+                            delay = processed / self.max_rate - (time.monotonic() - started)
+                            if delay > 0:
+                                time.sleep(delay)
+
+                        if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                            last_progress = time.monotonic()
+                            logger.info(f"Analysis {self.analysis}: {processed} windows processed, "
+                                        f"last id {last_id}")
+
+                        if self.stop_event.is_set():
+                            break
+
+                    if self.stop_event.is_set():
+                        break
+
+                    if batch:
+                        if not self.db_manager.save_analysis_results(self.analysis, self.version, batch,
+                                                                     self.scope, self.filters):
+                            raise RuntimeError('could not save analysis results')
+                        processed += len(batch)
+                        failed += sum(1 for item in batch if item[4] is not None)
+                        last_id = batch[-1][0]
+
+                    if counter[0] < self.chunk_size:
+                        status = 'completed'
+                        break
+
+        except Exception as e:
+            logger.error(f"Analysis {self.analysis} interrupted at id {last_id}: {e}")
+
+        self.db_manager.update_analysis_job_status(self.analysis, self.version, status, self.scope, self.filters)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Analysis {self.analysis} {status}: {processed} windows ({failed} failed) "
+                    f"in {elapsed:.1f}s, last id {last_id}")
+
+        return self._summary(status, processed, failed, last_id, elapsed)
+
+    def _summary(self, status: str, processed: int, failed: int, last_id: Optional[int],
+                 elapsed: float) -> Dict[str, Any]:
+        """Bilan d'une exécution"""
+        return {
+            'analysis': self.analysis,
+            'version': self.version,
+            'status': status,
+            'scope': self.scope,
+            'processed': processed,
+            'failed': failed,
+            'last_ecg_data_id': last_id,
+            'elapsed_seconds': elapsed,
+            'windows_per_second': processed / elapsed if elapsed > 0 else 0.0
+        }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    max_rate = os.getenv('ECG_ANALYSIS_MAX_RATE')
+
+    parser = argparse.ArgumentParser(description='Batch analysis over stored ECG windows')
+    parser.add_argument('analysis', nargs='?', choices=sorted(ANALYSES), help='Analysis to run')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Windows read per query')
+    parser.add_argument('--batch-size', type=int, default=200, help='Results written per transaction')
+    parser.add_argument('--max-rate', type=float, default=float(max_rate) if max_rate else None,
+                        help='Maximum windows per second (default: unlimited)')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Only windows created at or after this date')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Only windows created before this date')
+    parser.add_argument('--diagnostics', help='Comma separated diagnostic ids')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+    parser.add_argument('--list', action='store_true', help='List analyses and their checkpoints')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager()
+
+    if args.list or not args.analysis:
+        for name in sorted(ANALYSES):
+            version = ANALYSES[name]['version']
+            jobs = db_manager.get_analysis_jobs(name, version)
+            if not jobs:
+                print(f"{name:16s} v{version:<3d} never run")
+            for job in jobs:
+                print(f"{name:16s} v{version:<3d} {job['filters'] or 'all windows'}: {job['status']}, "
+                      f"{job['processed']} processed, {job['failed']} failed, last id {job['last_ecg_data_id']}")
+        return 0
+
+    diagnostic_ids = [int(value) for value in args.diagnostics.split(',')] if args.diagnostics else None
+    job = BatchAnalysisJob(db_manager, args.analysis, args.workers, args.chunk_size, args.batch_size,
+                           args.max_rate, args.since, args.until, diagnostic_ids)
+
+    # Arrêt propre : le dernier lot enregistré sert de point de reprise
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: job.stop())
+
+    result = job.run(restart=args.restart)
+    print(f"{result['status']}: {result['processed']} windows ({result['failed']} failed), "
+          f"last id {result['last_ecg_data_id']}, {result['windows_per_second']:.0f} windows/s")
+
+    return 0 if result['status'] == 'completed' else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
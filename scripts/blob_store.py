@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Stockage des images ECG sur disque
+Stockage adressé par contenu (SHA-256) pour sortir les blobs de MySQL
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """Stockage de blobs adressé par contenu sur le système de fichiers"""
+
+    def __init__(self, root_path: str = None):
+        """
+        Initialiser le stockage
+
+        Args:
+            root_path: Répertoire racine du stockage
+        """
+        self.root_path = root_path or os.getenv('BLOB_STORE_PATH', '/data/ecg_blobs')
+
+    def _path_for(self, blob_ref: str) -> str:
+        """
+        Calculer le chemin d'un blob à partir de sa référence
+
+        Args:
+            blob_ref: Empreinte SHA-256 du blob
+
+        Returns:
+            str: Chemin du fichier
+        """
+        if len(blob_ref) != 64 or any(c not in '0123456789abcdef' for c in blob_ref):
+            raise ValueError(f"Invalid blob reference: {blob_ref}")
+
+        return os.path.join(self.root_path, blob_ref[:2], blob_ref[2:4], blob_ref)
+
+    def put(self, data: bytes) -> str:
+        """
+        Écrire un blob dans le stockage
+
+        Args:
+            data: Contenu du blob
+
+        Returns:
+            str: Référence (SHA-256) du blob
+        """
+        blob_ref = hashlib.sha256(data).hexdigest()
+        path = self._path_for(blob_ref)
+
+        # Contenu identique déjà présent
+        if os.path.exists(path):
+            return blob_ref
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Écriture atomique : fichier temporaire puis renommage
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        return blob_ref
+
+    def get(self, blob_ref: str) -> Optional[bytes]:
+        """
+        Lire un blob depuis le stockage
+
+        Args:
+            blob_ref: Référence du blob
+
+        Returns:
+            bytes: Contenu du blob, None si absent
+        """
+        try:
+            with open(self._path_for(blob_ref), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            logger.error(f"Blob {blob_ref} not found in store")
+            return None
+
+    def exists(self, blob_ref: str) -> bool:
+        """
+        Vérifier la présence d'un blob
+
+        Args:
+            blob_ref: Référence du blob
+
+        Returns:
+            bool: True si présent
+        """
+        return os.path.exists(self._path_for(blob_ref))
+
+    def delete(self, blob_ref: str) -> bool:
+        """
+        Supprimer un blob qui n'est plus référencé
+
+        Args:
+            blob_ref: Référence du blob
+
+        Returns:
+            bool: True si le blob existait
+        """
+        try:
+            os.unlink(self._path_for(blob_ref))
+            return True
+        except FileNotFoundError:
+            return False
+
+class BlobMigrationWorker:
+    """Tâche de fond déplaçant les anciens blobs de MySQL vers le stockage disque"""
+
+    def __init__(self, db_manager, older_than_days: Optional[int], interval: int = 300, batch_size: int = 100):
+        """
+        Initialiser la tâche de migration
+
+        Args:
+            db_manager: Gestionnaire de base de données
+            older_than_days: Âge minimal des images à migrer (None pour toutes)
+            interval: Délai entre deux passes en secondes
+            batch_size: Nombre d'images par lot
+        """
+        self.db_manager = db_manager
+        self.older_than_days = older_than_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Démarrer la tâche en arrière-plan"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='blob-migration', daemon=True)
+        self.thread.start()
+        logger.info(f"Blob migration worker started (older_than_days={self.older_than_days})")
+
+    def stop(self):
+        """Arrêter la tâche"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def run_once(self) -> int:
+        """
+        Migrer tous les blobs éligibles, lot par lot
+
+        Returns:
+            int: Nombre d'images migrées
+        """
+        total = 0
+
+        while not self.stop_event.is_set():
+            migrated = self.db_manager.migrate_blobs_to_store(self.older_than_days, self.batch_size)
+            total += migrated
+
+            if migrated < self.batch_size:
+                break
+
+        if total:
+            logger.info(f"Migrated {total} ECG images to blob store")
+
+        return total
+
+    def _run(self):
+        """Boucle de la tâche de fond"""
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in blob migration worker: {e}")
+
+            self.stop_event.wait(self.interval)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Profils de capture ECG
+Fréquence, fenêtrage, taille de rendu et format d'image choisis par session
+"""
+
+from typing import Dict, Any
+
+IMAGE_FORMATS = {
+    'png': 'image/png',
+    'png_palette': 'image/png',
+    'webp': 'image/webp',
+    'none': None
+}
+
+# Durée maximale d'une fenêtre : buffers de capture, rendu et samples_blob restent bornés
+MAX_WINDOW_SECONDS = 60
+
+class CaptureProfile:
+    """Paramètres d'une session de capture"""
+
+    def __init__(self, sample_rate: int = 100, window_size: int = 500, window_overlap: int = 0,
+                 width: float = 12.0, height: float = 6.0, dpi: int = 100, image_format: str = 'png',
+                 name: str = 'custom'):
+        """
+        Initialiser et valider un profil
+
+        Args:
+            sample_rate: Fréquence d'échantillonnage en Hz
+            window_size: Nombre d'échantillons par fenêtre (MAX_WINDOW_SECONDS au plus)
+            window_overlap: Échantillons communs à deux fenêtres consécutives
+            width: Largeur du rendu en pouces
+            height: Hauteur du rendu en pouces
+            dpi: Résolution du rendu
+            image_format: 'png', 'png_palette', 'webp' ou 'none'
+            name: Nom du préréglage d'origine
+        """
+        self.sample_rate = int(sample_rate)
+        self.window_size = int(window_size)
+        self.window_overlap = int(window_overlap)
+        self.width = float(width)
+        self.height = float(height)
+        self.dpi = int(dpi)
+        self.image_format = image_format
+        self.name = name
+
+        if not 1 <= self.sample_rate <= 1000:
+            raise ValueError(f"sample_rate must be between 1 and 1000 Hz, got {self.sample_rate}")
+        if self.window_size <= 0 or not 0 <= self.window_overlap < self.window_size:
+            raise ValueError(f"Invalid window: size={self.window_size}, overlap={self.window_overlap}")
+        if self.window_size > MAX_WINDOW_SECONDS * self.sample_rate:
+            raise ValueError(f"window_size must not exceed {MAX_WINDOW_SECONDS} s "
+                             f"({MAX_WINDOW_SECONDS * self.sample_rate} samples at {self.sample_rate} Hz), "
+                             f"got {self.window_size}")
+        if not (1 <= self.width <= 30 and 1 <= self.height <= 20 and 20 <= self.dpi <= 300):
+            raise ValueError("Render size must be 1-30 x 1-20 inches at 20-300 dpi")
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_format must be one of {list(IMAGE_FORMATS)}")
+
+    @property
+    def mime_type(self):
+        """Type MIME des images produites (None sans image)"""
+        return IMAGE_FORMATS[self.image_format]
+
+    @property
+    def window_seconds(self) -> float:
+        return self.window_size / self.sample_rate
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any] = None) -> 'CaptureProfile':
+        """
+        Construire un profil depuis une requête
+
+        Accepte un préréglage ('preset') complété par des valeurs explicites.
+        La fenêtre peut être donnée en secondes (window_seconds, overlap_seconds)
+        ou en échantillons (window_size, window_overlap).
+
+        Args:
+            data: Paramètres du profil
+
+        Returns:
+            CaptureProfile: Profil validé
+        """
+        data = dict(data or {})
+        preset_name = data.pop('preset', 'diagnostic')
+
+        if preset_name not in PRESETS:
+            raise ValueError(f"Unknown profile preset: {preset_name}")
+
+        preset = PRESETS[preset_name]
+        params = dict(preset, name='custom' if data else preset_name)
+
+        for key in ('sample_rate', 'width', 'height', 'dpi', 'image_format'):
+            if key in data:
+                params[key] = data.pop(key)
+
+        rate = int(params['sample_rate'])
+
+        if 'window_seconds' in data:
+            params['window_size'] = round(float(data.pop('window_seconds')) * rate)
+        elif 'window_size' in data:
+            params['window_size'] = data.pop('window_size')
+        elif rate != preset['sample_rate']:
+            # Conserver la durée de fenêtre du préréglage si seule la fréquence change
+            params['window_size'] = round(preset['window_size'] / preset['sample_rate'] * rate)
+
+        if 'overlap_seconds' in data:
+            params['window_overlap'] = round(float(data.pop('overlap_seconds')) * rate)
+        elif 'window_overlap' in data:
+            params['window_overlap'] = data.pop('window_overlap')
+
+        if data:
+            raise ValueError(f"Unknown profile parameters: {sorted(data)}")
+
+        return cls(**params)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation sérialisable (stockée avec la session)"""
+        return {
+            'name': self.name,
+            'sample_rate': self.sample_rate,
+            'window_size': self.window_size,
+            'window_overlap': self.window_overlap,
+            'window_seconds': self.window_seconds,
+            'width': self.width,
+            'height': self.height,
+            'dpi': self.dpi,
+            'image_format': self.image_format
+        }
+
+# Préréglages disponibles
+PRESETS = {
+    # Diagnostic complet : rendu historique PNG 1200x600
+    'diagnostic': {
+        'sample_rate': 100, 'window_size': 500, 'window_overlap': 0,
+        'width': 12.0, 'height': 6.0, 'dpi': 100, 'image_format': 'png'
+    },
+    # Surveillance : fenêtres de 10 s, petite image WebP
+    'monitoring': {
+        'sample_rate': 100, 'window_size': 1000, 'window_overlap': 0,
+        'width': 8.0, 'height': 3.0, 'dpi': 60, 'image_format': 'webp'
+    },
+    # Échantillons seuls, aucun rendu
+    'samples_only': {
+        'sample_rate': 100, 'window_size': 1000, 'window_overlap': 0,
+        'width': 12.0, 'height': 6.0, 'dpi': 100, 'image_format': 'none'
+    }
+}
@@ -8,11 +8,78 @@ import pymysql
 import logging
 import os
 import base64
-from datetime import datetime
-from typing import List, Dict, Optional, Any
+import json
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterator, Optional, Any
+from blob_store import BlobStore
+from metrics import timed_query
+from window_spool import PermanentWriteError
 
 logger = logging.getLogger(__name__)
 
+# Partition ouverte recevant les lignes au-delà des partitions mensuelles
+FUTURE_PARTITION = 'p_future'
+# Partition des lignes antérieures au premier mois partitionné
+HISTORY_PARTITION = 'p_history'
+
+# Période consultée en premier pour les dernières images (capture en cours)
+LATEST_IMAGES_LOOKBACK = timedelta(days=1)
+
+# Mise à jour incrémentale du résumé d'un diagnostic (dans la transaction d'insertion)
+SUMMARY_UPSERT_SQL = """
+    INSERT INTO ecg_diagnostic_summary
+    (diagnostic_id, total_windows, total_images, total_bytes, total_samples, first_capture_at, last_capture_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        total_windows = total_windows + VALUES(total_windows),
+        total_images = total_images + VALUES(total_images),
+        total_bytes = total_bytes + VALUES(total_bytes),
+        total_samples = total_samples + VALUES(total_samples),
+        first_capture_at = LEAST(COALESCE(first_capture_at, VALUES(first_capture_at)), VALUES(first_capture_at)),
+        last_capture_at = GREATEST(COALESCE(last_capture_at, VALUES(last_capture_at)), VALUES(last_capture_at))
+"""
+
+SUMMARY_FIELDS = ('first_capture_at', 'last_capture_at', 'last_session_started_at',
+                  'last_session_stopped_at', 'updated_at')
+
+# Caractéristiques par fenêtre (clés de ecg_analysis.window_features)
+WINDOW_FEATURES_ANALYSIS = 'features'
+WINDOW_FEATURE_COLUMNS = ('beats', 'heart_rate', 'rr_mean', 'rr_sdnn', 'rr_rmssd',
+                          'amplitude_range', 'noise_score', 'flatline_ratio', 'saturation_ratio')
+
+WINDOW_FEATURES_UPSERT_SQL = f"""
+    INSERT INTO ecg_window_features
+    (ecg_data_id, diagnostic_id, image_created_at, {', '.join(WINDOW_FEATURE_COLUMNS)})
+    VALUES (%s, %s, %s{', %s' * len(WINDOW_FEATURE_COLUMNS)})
+    ON DUPLICATE KEY UPDATE {', '.join(f'{column} = VALUES({column})' for column in WINDOW_FEATURE_COLUMNS)}
+"""
+
+# Erreurs dues au contenu écrit (clé étrangère, valeur hors limites, paquet trop grand) :
+# réessayer le même lot échouerait de la même façon
+PERMANENT_WRITE_ERRORS = (pymysql.err.IntegrityError, pymysql.err.DataError)
+PACKET_TOO_LARGE_CODES = (1153, 1301)
+
+def _is_permanent_write_error(error: Exception) -> bool:
+    """Distinguer une erreur due au contenu d'une erreur passagère (connexion, verrou)"""
+    if isinstance(error, PERMANENT_WRITE_ERRORS):
+        return True
+    return (isinstance(error, pymysql.err.OperationalError) and bool(error.args)
+            and error.args[0] in PACKET_TOO_LARGE_CODES)
+
+def _month_start(value: datetime, offset: int = 0) -> datetime:
+    """
+    Premier jour du mois de value, décalé de offset mois
+    
+    Args:
+        value: Date de référence
+        offset: Décalage en mois
+        
+    Returns:
+        datetime: Début du mois
+    """
+    month = value.year * 12 + value.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
 class DatabaseManager:
     """Gestionnaire de base de données pour ECG"""
     
@@ -26,6 +93,9 @@ class DatabaseManager:
             'database': os.getenv('DB_NAME', 'ecg_database'),
             'charset': 'utf8mb4'
         }
+        
+        # Stockage disque des images déplacées hors de MySQL
+        self.blob_store = BlobStore()
     
     def _get_connection(self):
         """
@@ -40,6 +110,7 @@ class DatabaseManager:
             logger.error(f"Database connection error: {e}")
             raise
     
+    @timed_query
     def save_ecg_image(self, diagnostic_id: int, image_blob: bytes, capture_duration: int = 5) -> bool:
         """
         Sauvegarder une image ECG en base de données
@@ -57,11 +128,15 @@ class DatabaseManager:
                 with conn.cursor() as cursor:
                     sql = """
                         INSERT INTO ecg_data 
-                        (diagnostic_id, image_blob, capture_duration, status)
-                        VALUES (%s, %s, %s, %s)
+                        (diagnostic_id, image_blob, blob_size, capture_duration, status, image_created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s)
                     """
                     
-                    cursor.execute(sql, (diagnostic_id, image_blob, capture_duration, 'completed'))
+                    created_at = datetime.now()
+                    cursor.execute(sql, (diagnostic_id, image_blob, len(image_blob), capture_duration,
+                                         'completed', created_at))
+                    cursor.execute(SUMMARY_UPSERT_SQL, (diagnostic_id, 1, 1, len(image_blob), 0,
+                                                        created_at, created_at))
                     conn.commit()
                     
                     logger.debug(f"Saved ECG image for diagnostic {diagnostic_id}")
@@ -71,12 +146,156 @@ class DatabaseManager:
             logger.error(f"Error saving ECG image: {e}")
             return False
     
-    def get_diagnostic_images(self, diagnostic_id: int) -> List[Dict[str, Any]]:
+    @timed_query
+    def save_ecg_images(self, windows: List[Dict[str, Any]]) -> bool:
+        """
+        Sauvegarder un lot d'images ECG dans une seule transaction
+        
+        Args:
+            windows: Fenêtres (diagnostic_id, image_blob, image_format, capture_duration, created_at
+                     en timestamp, indices du premier et du dernier échantillon, sample_rate, samples_blob,
+                     features calculées à la capture)
+            
+        Returns:
+            bool: True si tout le lot est sauvegardé, False en cas d'erreur passagère
+            
+        Raises:
+            PermanentWriteError: Lot refusé pour son contenu (voir PERMANENT_WRITE_ERRORS)
+        """
+        if not windows:
+            return True
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        INSERT INTO ecg_data 
+                        (diagnostic_id, image_blob, blob_size, image_format, capture_duration, status,
+                         image_created_at, first_sample_index, last_sample_index, sample_rate, samples_blob)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """
+                    
+                    rows = [
+                        (
+                            window['diagnostic_id'],
+                            window['image_blob'],
+                            len(window['image_blob']) if window['image_blob'] else None,
+                            window.get('image_format'),
+                            window.get('capture_duration', 5),
+                            'completed',
+                            datetime.fromtimestamp(window['created_at']) if window.get('created_at') else datetime.now(),
+                            window.get('first_sample_index'),
+                            window.get('last_sample_index'),
+                            window.get('sample_rate'),
+                            window.get('samples_blob')
+                        )
+                        for window in windows
+                    ]
+                    
+                    # Insertion ligne à ligne : l'id de chaque fenêtre référence ses caractéristiques
+                    features = []
+                    for window, row in zip(windows, rows):
+                        cursor.execute(sql, row)
+                        if window.get('features'):
+                            features.append(self._window_feature_row(cursor.lastrowid, row[0], row[6],
+                                                                     window['features']))
+                    
+                    if features:
+                        cursor.executemany(WINDOW_FEATURES_UPSERT_SQL, features)
+                    cursor.executemany(SUMMARY_UPSERT_SQL, self._summarize_windows(rows))
+                    conn.commit()
+                    
+                    logger.debug(f"Saved {len(windows)} ECG images")
+                    return True
+                    
+        except Exception as e:
+            logger.error(f"Error saving ECG images: {e}")
+            if _is_permanent_write_error(e):
+                raise PermanentWriteError(str(e)) from e
+            return False
+    
+    @staticmethod
+    def _summarize_windows(rows: List[tuple]) -> List[tuple]:
+        """
+        Agréger un lot de lignes ecg_data par diagnostic pour SUMMARY_UPSERT_SQL
+        
+        Args:
+            rows: Lignes dans l'ordre des colonnes insérées par save_ecg_images
+            
+        Returns:
+            List[tuple]: Paramètres de SUMMARY_UPSERT_SQL, un par diagnostic
+        """
+        totals = {}
+        for (diagnostic_id, _, image_size, _, _, _, created_at,
+             first_index, last_index, _, samples_blob) in rows:
+            entry = totals.setdefault(diagnostic_id, [0, 0, 0, 0, created_at, created_at])
+            entry[0] += 1
+            entry[1] += 1 if image_size else 0
+            entry[2] += (image_size or 0) + (len(samples_blob) if samples_blob else 0)
+            if first_index is not None and last_index is not None:
+                entry[3] += last_index - first_index + 1
+            entry[4] = min(entry[4], created_at)
+            entry[5] = max(entry[5], created_at)
+        
+        return [(diagnostic_id, *entry) for diagnostic_id, entry in totals.items()]
+    
+    @staticmethod
+    def _window_feature_row(ecg_data_id: int, diagnostic_id: int, created_at: datetime,
+                            features: Dict[str, Any]) -> tuple:
+        """Paramètres de WINDOW_FEATURES_UPSERT_SQL pour une fenêtre"""
+        return (ecg_data_id, diagnostic_id, created_at, *(features.get(column) for column in WINDOW_FEATURE_COLUMNS))
+    
+    def _close_session_summary(self, cursor, diagnostic_id: int, stopped_at: datetime):
+        """
+        Ajouter la durée de la session en cours au résumé du diagnostic
+        
+        À exécuter avant la mise à jour de ecg_capture_sessions, dans la même transaction :
+        seule une session non encore arrêtée est comptée.
+        
+        Args:
+            cursor: Curseur ouvert
+            diagnostic_id: ID du diagnostic
+            stopped_at: Date d'arrêt
+        """
+        cursor.execute("""
+            UPDATE ecg_diagnostic_summary s
+            JOIN ecg_capture_sessions c ON c.diagnostic_id = s.diagnostic_id
+            SET s.total_capture_seconds = s.total_capture_seconds
+                    + GREATEST(TIMESTAMPDIFF(SECOND, c.started_at, %s), 0),
+                s.last_session_stopped_at = %s
+            WHERE s.diagnostic_id = %s AND c.started_at IS NOT NULL AND c.stopped_at IS NULL
+        """, (stopped_at, stopped_at, diagnostic_id))
+    
+    def _diagnostic_created_at(self, cursor, diagnostic_id: int) -> Optional[datetime]:
+        """
+        Date de création d'un diagnostic, borne inférieure de ses images
+        
+        Les requêtes sur ecg_data reçoivent cette borne en constante pour que
+        MySQL n'ouvre que les partitions postérieures.
+        
+        Args:
+            cursor: Curseur ouvert
+            diagnostic_id: ID du diagnostic
+            
+        Returns:
+            datetime: Date de création, None si inconnue
+        """
+        cursor.execute("SELECT created_at FROM diagnostics WHERE id = %s", (diagnostic_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return row['created_at'] if isinstance(row, dict) else row[0]
+    
+    @timed_query
+    def get_diagnostic_images(self, diagnostic_id: int, since: datetime = None,
+                              until: datetime = None) -> List[Dict[str, Any]]:
         """
         Récupérer toutes les images d'un diagnostic
         
         Args:
             diagnostic_id: ID du diagnostic
+            since: Borne inférieure de création (par défaut la création du diagnostic)
+            until: Borne supérieure de création exclue
             
         Returns:
             List[Dict]: Liste des images avec métadonnées
@@ -84,14 +303,27 @@ class DatabaseManager:
         try:
             with self._get_connection() as conn:
                 with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    if since is None:
+                        since = self._diagnostic_created_at(cursor, diagnostic_id)
+                    
                     sql = """
-                        SELECT id, image_created_at, capture_duration, status
+                        SELECT id, image_created_at, capture_duration, status, image_format,
+                               first_sample_index, last_sample_index, sample_rate
                         FROM ecg_data 
                         WHERE diagnostic_id = %s 
-                        ORDER BY image_created_at DESC
                     """
+                    params = [diagnostic_id]
                     
-                    cursor.execute(sql, (diagnostic_id,))
+                    if since is not None:
+                        sql += " AND image_created_at >= %s"
+                        params.append(since)
+                    if until is not None:
+                        sql += " AND image_created_at < %s"
+                        params.append(until)
+                    
+                    sql += " ORDER BY image_created_at DESC"
+                    
+                    cursor.execute(sql, params)
                     results = cursor.fetchall()
                     
                     # Convertir les timestamps en string
@@ -105,12 +337,14 @@ class DatabaseManager:
             logger.error(f"Error getting diagnostic images: {e}")
             return []
     
-    def get_image_blob(self, image_id: int) -> Optional[Dict[str, Any]]:
+    @timed_query
+    def get_image_blob(self, image_id: int, created_at: datetime = None) -> Optional[Dict[str, Any]]:
         """
         Récupérer les données blob d'une image
         
         Args:
             image_id: ID de l'image
+            created_at: Date de création connue (limite la recherche à une partition)
             
         Returns:
             Dict: Données de l'image en base64
@@ -119,16 +353,33 @@ class DatabaseManager:
             with self._get_connection() as conn:
                 with conn.cursor(pymysql.cursors.DictCursor) as cursor:
                     sql = """
-                        SELECT image_blob, image_created_at
+                        SELECT image_blob, blob_ref, image_format, image_created_at
                         FROM ecg_data 
                         WHERE id = %s
                     """
+                    params = [image_id]
+                    
+                    if created_at is not None:
+                        sql += " AND image_created_at = %s"
+                        params.append(created_at)
                     
-                    cursor.execute(sql, (image_id,))
+                    cursor.execute(sql, params)
                     result = cursor.fetchone()
                     
                     if result:
+                        # Image déplacée vers le stockage disque
+                        blob_ref = result.pop('blob_ref')
+                        if result['image_blob'] is None and blob_ref:
+                            result['image_blob'] = self.blob_store.get(blob_ref)
+                            if result['image_blob'] is None:
+                                return None
+                        
+                        # Fenêtre sans image (profil sans rendu)
+                        if result['image_blob'] is None:
+                            return None
+                        
                         # Encoder l'image en base64 pour transmission
+                        result['image_format'] = result['image_format'] or 'png'
                         result['image_blob'] = base64.b64encode(result['image_blob']).decode('utf-8')
                         result['image_created_at'] = result['image_created_at'].isoformat()
                         return result
@@ -139,16 +390,139 @@ class DatabaseManager:
             logger.error(f"Error getting image blob: {e}")
             return None
     
-    def init_capture_session(self, diagnostic_id: int) -> bool:
+    @timed_query
+    def get_image_blobs(self, diagnostic_id: int, image_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Récupérer plusieurs images d'un diagnostic en une seule requête
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            image_ids: IDs des images
+            
+        Returns:
+            List[Dict]: Images trouvées (id, image_blob en bytes, image_format, image_created_at),
+                        les IDs inconnus ou sans image sont ignorés
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'images introuvables)
+        """
+        if not image_ids:
+            return []
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    since = self._diagnostic_created_at(cursor, diagnostic_id)
+                    placeholders = ', '.join(['%s'] * len(image_ids))
+                    
+                    sql = f"""
+                        SELECT id, image_blob, blob_ref, image_format, image_created_at
+                        FROM ecg_data
+                        WHERE diagnostic_id = %s AND id IN ({placeholders})
+                    """
+                    params = [diagnostic_id, *image_ids]
+                    
+                    if since is not None:
+                        sql += " AND image_created_at >= %s"
+                        params.append(since)
+                    
+                    cursor.execute(sql, params)
+                    
+                    images = []
+                    for result in cursor.fetchall():
+                        # Image déplacée vers le stockage disque
+                        blob_ref = result.pop('blob_ref')
+                        if result['image_blob'] is None and blob_ref:
+                            result['image_blob'] = self.blob_store.get(blob_ref)
+                        
+                        if result['image_blob'] is None:
+                            continue
+                        
+                        result['image_format'] = result['image_format'] or 'png'
+                        result['image_created_at'] = result['image_created_at'].isoformat()
+                        images.append(result)
+                    
+                    return images
+                    
+        except Exception as e:
+            logger.error(f"Error getting image blobs: {e}")
+            raise
+    
+    @timed_query
+    def migrate_blobs_to_store(self, older_than_days: Optional[int] = None, batch_size: int = 100) -> int:
+        """
+        Déplacer un lot d'images de MySQL vers le stockage disque
+        
+        Le blob est écrit sur disque avant que la ligne ne soit mise à jour,
+        une interruption laisse donc l'image lisible depuis MySQL.
+        
+        Args:
+            older_than_days: Âge minimal des images en jours (None pour toutes)
+            batch_size: Nombre maximum d'images à déplacer
+            
+        Returns:
+            int: Nombre d'images déplacées
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        SELECT id, image_created_at FROM ecg_data
+                        WHERE image_blob IS NOT NULL
+                    """
+                    params = []
+                    
+                    if older_than_days is not None:
+                        sql += " AND image_created_at < %s"
+                        params.append(datetime.now() - timedelta(days=older_than_days))
+                    
+                    sql += " ORDER BY id LIMIT %s"
+                    params.append(batch_size)
+                    
+                    cursor.execute(sql, params)
+                    rows = cursor.fetchall()
+                    
+                    migrated = 0
+                    for image_id, created_at in rows:
+                        # Lire les blobs un par un pour limiter la mémoire
+                        cursor.execute("""
+                            SELECT image_blob FROM ecg_data
+                            WHERE id = %s AND image_created_at = %s
+                        """, (image_id, created_at))
+                        row = cursor.fetchone()
+                        if not row or row[0] is None:
+                            continue
+                        
+                        blob_ref = self.blob_store.put(row[0])
+                        
+                        cursor.execute("""
+                            UPDATE ecg_data
+                            SET blob_ref = %s, blob_size = %s, image_blob = NULL
+                            WHERE id = %s AND image_created_at = %s AND image_blob IS NOT NULL
+                        """, (blob_ref, len(row[0]), image_id, created_at))
+                        conn.commit()
+                        migrated += 1
+                    
+                    return migrated
+                    
+        except Exception as e:
+            logger.error(f"Error migrating blobs to store: {e}")
+            return 0
+    
+    @timed_query
+    def init_capture_session(self, diagnostic_id: int, profile: Dict[str, Any] = None) -> bool:
         """
         Initialiser une session de capture
         
         Args:
             diagnostic_id: ID du diagnostic
+            profile: Profil de capture de la session
             
         Returns:
             bool: True si initialisé avec succès
         """
+        profile_json = json.dumps(profile) if profile else None
+        
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -164,18 +538,28 @@ class DatabaseManager:
                         # Mettre à jour la session existante
                         update_sql = """
                             UPDATE ecg_capture_sessions 
-                            SET status = %s, started_at = %s, stopped_at = NULL, last_error = NULL
+                            SET status = %s, started_at = %s, stopped_at = NULL, last_error = NULL,
+                                total_images = 0, profile = %s, signal_issue = NULL,
+                                signal_issue_since = NULL, signal_events = 0, suppressed_windows = 0
                             WHERE diagnostic_id = %s
                         """
-                        cursor.execute(update_sql, ('running', datetime.now(), diagnostic_id))
+                        cursor.execute(update_sql, ('running', datetime.now(), profile_json, diagnostic_id))
                     else:
                         # Créer une nouvelle session
                         insert_sql = """
                             INSERT INTO ecg_capture_sessions 
-                            (diagnostic_id, status, started_at)
-                            VALUES (%s, %s, %s)
+                            (diagnostic_id, status, started_at, profile)
+                            VALUES (%s, %s, %s, %s)
                         """
-                        cursor.execute(insert_sql, (diagnostic_id, 'running', datetime.now()))
+                        cursor.execute(insert_sql, (diagnostic_id, 'running', datetime.now(), profile_json))
+                    
+                    cursor.execute("""
+                        INSERT INTO ecg_diagnostic_summary (diagnostic_id, session_count, last_session_started_at)
+                        VALUES (%s, 1, %s)
+                        ON DUPLICATE KEY UPDATE
+                            session_count = session_count + 1,
+                            last_session_started_at = VALUES(last_session_started_at)
+                    """, (diagnostic_id, datetime.now()))
                     
                     conn.commit()
                     return True
@@ -184,6 +568,7 @@ class DatabaseManager:
             logger.error(f"Error initializing capture session: {e}")
             return False
     
+    @timed_query
     def update_capture_status(self, diagnostic_id: int, status: str, error_message: str = None) -> bool:
         """
         Mettre à jour le statut d'une capture
@@ -211,7 +596,9 @@ class DatabaseManager:
                             SET status = %s, stopped_at = %s, last_error = %s
                             WHERE diagnostic_id = %s
                         """
-                        cursor.execute(sql, (status, datetime.now(), error_message, diagnostic_id))
+                        stopped_at = datetime.now()
+                        self._close_session_summary(cursor, diagnostic_id, stopped_at)
+                        cursor.execute(sql, (status, stopped_at, error_message, diagnostic_id))
                     else:
                         cursor.execute(sql, (status, error_message, diagnostic_id))
                     
@@ -222,6 +609,7 @@ class DatabaseManager:
             logger.error(f"Error updating capture status: {e}")
             return False
     
+    @timed_query
     def update_capture_session_count(self, diagnostic_id: int, total_images: int) -> bool:
         """
         Mettre à jour le compteur d'images d'une session
@@ -250,6 +638,41 @@ class DatabaseManager:
             logger.error(f"Error updating capture session count: {e}")
             return False
     
+    @timed_query
+    def update_signal_quality(self, diagnostic_id: int, issue: Optional[str], issue_since: Optional[datetime],
+                              suppressed_windows: int, new_event: bool = False) -> bool:
+        """
+        Enregistrer l'état de qualité du signal de la session
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            issue: Problème en cours ('saturation', 'flatline', 'noise'), None si le signal est correct
+            issue_since: Début du problème en cours
+            suppressed_windows: Fenêtres non rendues depuis le début de la session
+            new_event: Compter un nouvel épisode
+            
+        Returns:
+            bool: True si mis à jour avec succès
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        UPDATE ecg_capture_sessions
+                        SET signal_issue = %s, signal_issue_since = %s, suppressed_windows = %s,
+                            signal_events = signal_events + %s
+                        WHERE diagnostic_id = %s
+                    """
+                    
+                    cursor.execute(sql, (issue, issue_since, suppressed_windows, int(new_event), diagnostic_id))
+                    conn.commit()
+                    return True
+                    
+        except Exception as e:
+            logger.error(f"Error updating signal quality: {e}")
+            return False
+    
+    @timed_query
     def get_capture_session(self, diagnostic_id: int) -> Optional[Dict[str, Any]]:
         """
         Récupérer les informations d'une session de capture
@@ -273,9 +696,12 @@ class DatabaseManager:
                     
                     if result:
                         # Convertir les timestamps
-                        for field in ['started_at', 'stopped_at']:
-                            if result[field]:
+                        for field in ['started_at', 'stopped_at', 'signal_issue_since']:
+                            if result.get(field):
                                 result[field] = result[field].isoformat()
+                        
+                        if result.get('profile'):
+                            result['profile'] = json.loads(result['profile'])
                     
                     return result
                     
@@ -283,6 +709,7 @@ class DatabaseManager:
             logger.error(f"Error getting capture session: {e}")
             return None
     
+    @timed_query
     def finalize_capture_session(self, diagnostic_id: int, final_count: int) -> bool:
         """
         Finaliser une session de capture
@@ -303,7 +730,9 @@ class DatabaseManager:
                         WHERE diagnostic_id = %s
                     """
                     
-                    cursor.execute(sql, ('stopped', datetime.now(), final_count, diagnostic_id))
+                    stopped_at = datetime.now()
+                    self._close_session_summary(cursor, diagnostic_id, stopped_at)
+                    cursor.execute(sql, ('stopped', stopped_at, final_count, diagnostic_id))
                     conn.commit()
                     return True
                     
@@ -311,6 +740,7 @@ class DatabaseManager:
             logger.error(f"Error finalizing capture session: {e}")
             return False
     
+    @timed_query
     def get_latest_images(self, diagnostic_id: int, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Récupérer les dernières images d'un diagnostic
@@ -326,16 +756,25 @@ class DatabaseManager:
             with self._get_connection() as conn:
                 with conn.cursor(pymysql.cursors.DictCursor) as cursor:
                     sql = """
-                        SELECT id, image_created_at, capture_duration, status
+                        SELECT id, image_created_at, capture_duration, status, image_format,
+                               first_sample_index, last_sample_index, sample_rate
                         FROM ecg_data 
-                        WHERE diagnostic_id = %s 
+                        WHERE diagnostic_id = %s AND image_created_at >= %s
                         ORDER BY image_created_at DESC
                         LIMIT %s
                     """
                     
-                    cursor.execute(sql, (diagnostic_id, limit))
+                    # Pendant une capture les dernières images sont dans la partition courante
+                    recent = datetime.now() - LATEST_IMAGES_LOOKBACK
+                    cursor.execute(sql, (diagnostic_id, recent, limit))
                     results = cursor.fetchall()
                     
+                    if len(results) < limit:
+                        created_at = self._diagnostic_created_at(cursor, diagnostic_id)
+                        if created_at is None or created_at < recent:
+                            cursor.execute(sql, (diagnostic_id, created_at or datetime.min, limit))
+                            results = cursor.fetchall()
+                    
                     # Convertir les timestamps
                     for result in results:
                         if result['image_created_at']:
@@ -345,4 +784,766 @@ class DatabaseManager:
                     
         except Exception as e:
             logger.error(f"Error getting latest images: {e}")
-            return [] 
\ No newline at end of file
+            return []
+    
+    @timed_query
+    def get_diagnostic_summaries(self, diagnostic_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Récupérer les résumés de plusieurs diagnostics
+        
+        Args:
+            diagnostic_ids: IDs des diagnostics
+            
+        Returns:
+            Dict: Résumés par ID de diagnostic (absents si aucune capture)
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'un diagnostic sans capture)
+        """
+        if not diagnostic_ids:
+            return {}
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    placeholders = ', '.join(['%s'] * len(diagnostic_ids))
+                    cursor.execute(f"""
+                        SELECT * FROM ecg_diagnostic_summary
+                        WHERE diagnostic_id IN ({placeholders})
+                    """, list(diagnostic_ids))
+                    
+                    summaries = {}
+                    for result in cursor.fetchall():
+                        # Convertir les timestamps
+                        for field in SUMMARY_FIELDS:
+                            if result[field]:
+                                result[field] = result[field].isoformat()
+                        summaries[result['diagnostic_id']] = result
+                    
+                    return summaries
+                    
+        except Exception as e:
+            logger.error(f"Error getting diagnostic summaries: {e}")
+            raise
+    
+    def get_diagnostic_summary(self, diagnostic_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer le résumé d'un diagnostic
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            
+        Returns:
+            Dict: Résumé, None si aucune capture
+            
+        Raises:
+            Exception: Erreur de base de données
+        """
+        return self.get_diagnostic_summaries([diagnostic_id]).get(diagnostic_id)
+    
+    @timed_query
+    def search_window_features(self, filters: Dict[str, tuple] = None, match_any: bool = False,
+                               since: datetime = None, until: datetime = None,
+                               diagnostic_ids: List[int] = None, after: tuple = None,
+                               limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Rechercher des fenêtres par caractéristiques, de la plus récente à la plus ancienne
+        
+        La pagination se fait par clé (image_created_at, ecg_data_id) : chaque page
+        reprend après la dernière fenêtre de la précédente, sans OFFSET.
+        
+        Args:
+            filters: Bornes (minimum, maximum) par colonne de WINDOW_FEATURE_COLUMNS, None pour ouverte
+            match_any: Retenir les fenêtres satisfaisant au moins un filtre (au lieu de tous)
+            since: Début de la période
+            until: Fin de la période (exclue)
+            diagnostic_ids: Restreindre à ces diagnostics
+            after: (image_created_at, ecg_data_id) de la dernière fenêtre de la page précédente
+            limit: Nombre maximal de fenêtres
+            
+        Returns:
+            List[Dict]: Fenêtres (ecg_data_id, diagnostic_id, image_created_at et caractéristiques)
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'une recherche sans résultat)
+        """
+        conditions = []
+        params = []
+        
+        if diagnostic_ids:
+            conditions.append(f"diagnostic_id IN ({', '.join(['%s'] * len(diagnostic_ids))})")
+            params.extend(diagnostic_ids)
+        if since is not None:
+            conditions.append('image_created_at >= %s')
+            params.append(since)
+        if until is not None:
+            conditions.append('image_created_at < %s')
+            params.append(until)
+        
+        feature_conditions = []
+        for column, (minimum, maximum) in (filters or {}).items():
+            if column not in WINDOW_FEATURE_COLUMNS:
+                raise ValueError(f"Unknown feature: {column}")
+            bounds = []
+            if minimum is not None:
+                bounds.append(f'{column} >= %s')
+                params.append(minimum)
+            if maximum is not None:
+                bounds.append(f'{column} <= %s')
+                params.append(maximum)
+            if bounds:
+                feature_conditions.append(f"({' AND '.join(bounds)})")
+        
+        if feature_conditions:
+            conditions.append(f"({(' OR ' if match_any else ' AND ').join(feature_conditions)})")
+        
+        if after is not None:
+            conditions.append('(image_created_at < %s OR (image_created_at = %s AND ecg_data_id < %s))')
+            params.extend((after[0], after[0], after[1]))
+        
+        sql = f"""
+            SELECT ecg_data_id, diagnostic_id, image_created_at, {', '.join(WINDOW_FEATURE_COLUMNS)}
+            FROM ecg_window_features
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY image_created_at DESC, ecg_data_id DESC
+            LIMIT %s
+        """
+        params.append(limit)
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    cursor.execute(sql, params)
+                    
+                    windows = cursor.fetchall()
+                    for window in windows:
+                        window['image_created_at'] = window['image_created_at'].isoformat()
+                    
+                    return windows
+                    
+        except Exception as e:
+            logger.error(f"Error searching window features: {e}")
+            raise
+    
+    @timed_query
+    def get_ecg_partitions(self) -> List[Dict[str, Any]]:
+        """
+        Lister les partitions de ecg_data
+        
+        Returns:
+            List[Dict]: Partitions dans l'ordre (nom, borne supérieure exclue, lignes estimées),
+                        liste vide si la table n'est pas partitionnée
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+                        FROM information_schema.PARTITIONS
+                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ecg_data'
+                          AND PARTITION_NAME IS NOT NULL
+                        ORDER BY PARTITION_ORDINAL_POSITION
+                    """
+                    
+                    cursor.execute(sql)
+                    
+                    partitions = []
+                    for name, description, rows in cursor.fetchall():
+                        # RANGE COLUMNS : "'2026-01-01 00:00:00'" ou "MAXVALUE"
+                        bound = None if description == 'MAXVALUE' else datetime.fromisoformat(description.strip("'"))
+                        partitions.append({'name': name, 'upper_bound': bound, 'rows': rows})
+                    
+                    return partitions
+                    
+        except Exception as e:
+            logger.error(f"Error listing ecg_data partitions: {e}")
+            return []
+    
+    @timed_query
+    def ensure_ecg_partitions(self, months_ahead: int = 3) -> List[str]:
+        """
+        Créer les partitions mensuelles jusqu'à months_ahead mois après le mois courant
+        
+        Les nouvelles partitions sont découpées dans la partition ouverte (p_future),
+        vide en fonctionnement normal : l'opération ne déplace alors aucune ligne.
+        Si p_future est la seule partition (table tout juste partitionnée), p_history
+        reçoit d'abord les lignes antérieures au mois courant.
+        
+        Args:
+            months_ahead: Nombre de mois futurs à préparer
+            
+        Returns:
+            List[str]: Noms des partitions créées
+        """
+        partitions = self.get_ecg_partitions()
+        if not partitions:
+            logger.warning("ecg_data is not partitioned, skipping partition maintenance")
+            return []
+        
+        if partitions[-1]['name'] != FUTURE_PARTITION or partitions[-1]['upper_bound'] is not None:
+            logger.error(f"ecg_data has no {FUTURE_PARTITION} MAXVALUE partition, cannot add partitions")
+            return []
+        
+        bounded = [p['upper_bound'] for p in partitions if p['upper_bound'] is not None]
+        month = bounded[-1] if bounded else _month_start(datetime.now())
+        target = _month_start(datetime.now(), months_ahead + 1)
+        
+        # Table partitionnée sans mois (p_future seule) : l'historique existant reste dans p_history
+        created = [] if bounded else [(HISTORY_PARTITION, month)]
+        while month < target:
+            upper = _month_start(month, 1)
+            created.append((f"p{month:%Y%m}", upper))
+            month = upper
+        
+        if not created:
+            return []
+        
+        definitions = ', '.join(
+            f"PARTITION {name} VALUES LESS THAN ('{upper:%Y-%m-%d}')" for name, upper in created
+        )
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"""
+                        ALTER TABLE ecg_data REORGANIZE PARTITION {FUTURE_PARTITION} INTO (
+                            {definitions},
+                            PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)
+                        )
+                    """)
+                    
+                    names = [name for name, _ in created]
+                    logger.info(f"Created ecg_data partitions {', '.join(names)}")
+                    return names
+                    
+        except Exception as e:
+            logger.error(f"Error creating ecg_data partitions: {e}")
+            return []
+    
+    @timed_query
+    def drop_expired_ecg_partitions(self, retention_months: int) -> List[str]:
+        """
+        Supprimer les partitions entièrement antérieures à la période de rétention
+        
+        DROP PARTITION supprime les fichiers de la partition sans parcourir les lignes.
+        Le DDL validant implicitement la transaction, il vient en dernier : les résumés
+        des diagnostics concernés sont d'abord décrémentés (une seule fois par partition,
+        ecg_partition_drops gardant trace des ajustements faits), puis les caractéristiques
+        et les résultats d'analyse des fenêtres et les images du stockage disque référencées
+        uniquement par la partition sont supprimés. Une passe interrompue reprend sans double décompte.
+        
+        Args:
+            retention_months: Nombre de mois complets conservés avant le mois courant
+            
+        Returns:
+            List[str]: Noms des partitions supprimées
+        """
+        cutoff = _month_start(datetime.now(), -retention_months)
+        expired = [
+            (p['name'], p['upper_bound']) for p in self.get_ecg_partitions()
+            if p['upper_bound'] is not None and p['upper_bound'] <= cutoff
+        ]
+        
+        dropped = []
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    for name, upper_bound in expired:
+                        cursor.execute(f"""
+                            SELECT DISTINCT blob_ref FROM ecg_data PARTITION ({name})
+                            WHERE blob_ref IS NOT NULL
+                        """)
+                        blob_refs = [row[0] for row in cursor.fetchall()]
+                        
+                        cursor.execute(f"""
+                            SELECT diagnostic_id, COUNT(*), COUNT(blob_size),
+                                   COALESCE(SUM(COALESCE(blob_size, 0) + COALESCE(LENGTH(samples_blob), 0)), 0),
+                                   COALESCE(SUM(last_sample_index - first_sample_index + 1), 0)
+                            FROM ecg_data PARTITION ({name})
+                            GROUP BY diagnostic_id
+                        """)
+                        removed = cursor.fetchall()
+                        
+                        # Résumés : décomptés une seule fois, même si une passe précédente a échoué avant le DDL
+                        cursor.execute("""
+                            INSERT IGNORE INTO ecg_partition_drops (partition_name, upper_bound)
+                            VALUES (%s, %s)
+                        """, (name, upper_bound))
+                        
+                        if cursor.rowcount:
+                            for diagnostic_id, windows, images, size, samples in removed:
+                                cursor.execute("""
+                                    UPDATE ecg_diagnostic_summary
+                                    SET total_windows = GREATEST(total_windows - %s, 0),
+                                        total_images = GREATEST(total_images - %s, 0),
+                                        total_bytes = GREATEST(total_bytes - %s, 0),
+                                        total_samples = GREATEST(total_samples - %s, 0),
+                                        first_capture_at = (
+                                            SELECT MIN(image_created_at) FROM ecg_data
+                                            WHERE diagnostic_id = %s AND image_created_at >= %s
+                                        )
+                                    WHERE diagnostic_id = %s
+                                """, (windows, images, size, samples, diagnostic_id, upper_bound, diagnostic_id))
+                        
+                        # Caractéristiques : clé primaire ordonnée par date, suppression d'une plage contiguë
+                        cursor.execute("DELETE FROM ecg_window_features WHERE image_created_at < %s",
+                                       (upper_bound,))
+                        
+                        # Résultats d'analyse : index (diagnostic_id, analysis, image_created_at), par diagnostic
+                        for diagnostic_id, *_ in removed:
+                            cursor.execute("""
+                                DELETE FROM ecg_analysis_results
+                                WHERE diagnostic_id = %s AND image_created_at < %s
+                            """, (diagnostic_id, upper_bound))
+                        conn.commit()
+                        
+                        # Un même contenu peut être partagé avec des lignes plus récentes
+                        for blob_ref in blob_refs:
+                            cursor.execute("""
+                                SELECT 1 FROM ecg_data WHERE blob_ref = %s AND image_created_at >= %s LIMIT 1
+                            """, (blob_ref, upper_bound))
+                            if not cursor.fetchone():
+                                self.blob_store.delete(blob_ref)
+                        
+                        cursor.execute(f"ALTER TABLE ecg_data DROP PARTITION {name}")
+                        dropped.append(name)
+                        logger.info(f"Dropped ecg_data partition {name}")
+                    
+                    return dropped
+                    
+        except Exception as e:
+            logger.error(f"Error dropping expired ecg_data partitions: {e}")
+            return dropped
+    
+    @timed_query
+    def delete_orphan_ecg_data(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Supprimer les fenêtres des diagnostics supprimés
+        
+        ecg_data, partitionnée, n'a pas de clé étrangère vers diagnostics : la suppression
+        d'un diagnostic (ou d'un patient) ne s'y propage pas. Des triggers inscrivent les
+        diagnostics supprimés dans ecg_deleted_diagnostics ; pour chacun, les fenêtres, leurs
+        caractéristiques, leurs résultats d'analyse et les images du stockage disque qui ne
+        sont plus référencées sont supprimés par lots, puis l'entrée est retirée de la file.
+        
+        Args:
+            batch_size: Lignes supprimées par transaction
+            
+        Returns:
+            Dict: diagnostics, windows, features, results (lignes supprimées)
+        """
+        deleted = {'diagnostics': 0, 'windows': 0, 'features': 0, 'results': 0}
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT diagnostic_id FROM ecg_deleted_diagnostics ORDER BY deleted_at")
+                    orphans = [row[0] for row in cursor.fetchall()]
+                    
+                    for diagnostic_id in orphans:
+                        cursor.execute("""
+                            SELECT DISTINCT blob_ref FROM ecg_data
+                            WHERE diagnostic_id = %s AND blob_ref IS NOT NULL
+                        """, (diagnostic_id,))
+                        blob_refs = [row[0] for row in cursor.fetchall()]
+                        
+                        for table, key in (('ecg_window_features', 'features'),
+                                           ('ecg_analysis_results', 'results'),
+                                           ('ecg_data', 'windows')):
+                            while True:
+                                cursor.execute(f"DELETE FROM {table} WHERE diagnostic_id = %s LIMIT %s",
+                                               (diagnostic_id, batch_size))
+                                conn.commit()
+                                deleted[key] += cursor.rowcount
+                                if cursor.rowcount < batch_size:
+                                    break
+                        
+                        for blob_ref in blob_refs:
+                            cursor.execute("SELECT 1 FROM ecg_data WHERE blob_ref = %s LIMIT 1", (blob_ref,))
+                            if not cursor.fetchone():
+                                self.blob_store.delete(blob_ref)
+                        
+                        # Retiré de la file une fois tout supprimé : une passe interrompue reprend ce diagnostic
+                        cursor.execute("DELETE FROM ecg_deleted_diagnostics WHERE diagnostic_id = %s",
+                                       (diagnostic_id,))
+                        conn.commit()
+                        deleted['diagnostics'] += 1
+                    
+                    if orphans:
+                        logger.info(f"Deleted ECG data of {len(orphans)} removed diagnostics: {deleted}")
+                    return deleted
+                    
+        except Exception as e:
+            logger.error(f"Error deleting orphan ECG data: {e}")
+            return deleted
+    
+    def stream_ecg_windows(self, after_id: int = 0, limit: int = 1000, since: datetime = None,
+                           until: datetime = None, diagnostic_ids: List[int] = None) -> Iterator[tuple]:
+        """
+        Parcourir les fenêtres enregistrées dans l'ordre des id avec un curseur côté serveur
+        
+        Les lignes sont lues au fil de l'itération (SSCursor) au lieu d'être chargées
+        en mémoire ; limit borne la durée de la requête et de sa vue de lecture.
+        
+        Args:
+            after_id: Reprendre après cet id
+            limit: Nombre maximal de fenêtres lues
+            since: Début de la période (borne les partitions parcourues)
+            until: Fin de la période (exclue)
+            diagnostic_ids: Restreindre à ces diagnostics
+            
+        Yields:
+            tuple: (id, diagnostic_id, image_created_at, sample_rate, samples_blob)
+        """
+        conditions = ['id > %s', 'samples_blob IS NOT NULL']
+        params = [after_id]
+        
+        if since is not None:
+            conditions.append('image_created_at >= %s')
+            params.append(since)
+        if until is not None:
+            conditions.append('image_created_at < %s')
+            params.append(until)
+        if diagnostic_ids:
+            conditions.append(f"diagnostic_id IN ({', '.join(['%s'] * len(diagnostic_ids))})")
+            params.extend(diagnostic_ids)
+        
+        sql = f"""
+            SELECT id, diagnostic_id, image_created_at, sample_rate, samples_blob
+            FROM ecg_data
+            WHERE {' AND '.join(conditions)}
+            ORDER BY id
+            LIMIT %s
+        """
+        params.append(limit)
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+                    cursor.execute(sql, params)
+                    yield from cursor
+                    
+        except Exception as e:
+            logger.error(f"Error streaming ECG windows: {e}")
+            raise
+    
+    @timed_query
+    def get_window_samples(self, diagnostic_id: int, window_id: int,
+                           created_at: datetime = None) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer les échantillons d'une fenêtre
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            window_id: ID de la fenêtre (ecg_data)
+            created_at: Date de création connue (limite la recherche à une partition)
+            
+        Returns:
+            Dict: id, first_sample_index, sample_rate, samples_blob (bytes), image_created_at ;
+                  None si la fenêtre est inconnue ou sans échantillons
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'une fenêtre inconnue)
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    sql = """
+                        SELECT id, first_sample_index, sample_rate, samples_blob, image_created_at
+                        FROM ecg_data
+                        WHERE id = %s AND diagnostic_id = %s AND samples_blob IS NOT NULL
+                    """
+                    params = [window_id, diagnostic_id]
+                    
+                    if created_at is not None:
+                        sql += " AND image_created_at = %s"
+                        params.append(created_at)
+                    
+                    cursor.execute(sql, params)
+                    return cursor.fetchone()
+                    
+        except Exception as e:
+            logger.error(f"Error getting window samples: {e}")
+            raise
+    
+    def _select_recording_windows(self, cursor, columns: str, diagnostic_id: int, since: datetime,
+                                  until: datetime, after_id: int, limit: int) -> List[tuple]:
+        """Lire les colonnes demandées des fenêtres enregistrées d'une période"""
+        since = since or self._diagnostic_created_at(cursor, diagnostic_id)
+        
+        sql = f"""
+            SELECT {columns}
+            FROM ecg_data
+            WHERE diagnostic_id = %s AND id > %s AND samples_blob IS NOT NULL
+        """
+        params = [diagnostic_id, after_id]
+        
+        if since is not None:
+            sql += " AND image_created_at >= %s"
+            params.append(since)
+        if until is not None:
+            sql += " AND image_created_at < %s"
+            params.append(until)
+        
+        sql += " ORDER BY id LIMIT %s"
+        params.append(limit)
+        
+        cursor.execute(sql, params)
+        return list(cursor.fetchall())
+    
+    @timed_query
+    def get_recording_windows(self, diagnostic_id: int, since: datetime = None, until: datetime = None,
+                              after_id: int = 0, limit: int = 200) -> List[tuple]:
+        """
+        Lire une page des échantillons enregistrés d'un diagnostic, dans l'ordre d'enregistrement
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            since: Début de la période (création du diagnostic par défaut)
+            until: Fin de la période (exclue)
+            after_id: Reprendre après cet id (dernier id de la page précédente)
+            limit: Nombre maximal de fenêtres
+            
+        Returns:
+            List[tuple]: (id, first_sample_index, sample_rate, samples_blob, image_created_at)
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'une période sans fenêtre)
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    return self._select_recording_windows(
+                        cursor, 'id, first_sample_index, sample_rate, samples_blob, image_created_at',
+                        diagnostic_id, since, until, after_id, limit)
+                    
+        except Exception as e:
+            logger.error(f"Error getting recording windows: {e}")
+            raise
+    
+    @timed_query
+    def get_recording_window_ids(self, diagnostic_id: int, since: datetime = None, until: datetime = None,
+                                 limit: int = 200) -> List[int]:
+        """
+        Lister les ids des fenêtres enregistrées d'une période, sans lire les échantillons
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            since: Début de la période (création du diagnostic par défaut)
+            until: Fin de la période (exclue)
+            limit: Nombre maximal de fenêtres
+            
+        Returns:
+            List[int]: Ids dans l'ordre d'enregistrement
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'une période sans fenêtre)
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    rows = self._select_recording_windows(cursor, 'id', diagnostic_id, since, until, 0, limit)
+                    return [row[0] for row in rows]
+                    
+        except Exception as e:
+            logger.error(f"Error getting recording window ids: {e}")
+            raise
+    
+    @timed_query
+    def get_analysis_jobs(self, analysis: str, version: int) -> List[Dict[str, Any]]:
+        """
+        Récupérer les points de reprise d'une analyse par lots, toutes portées confondues
+        
+        Args:
+            analysis: Nom de l'analyse
+            version: Version de l'analyse
+            
+        Returns:
+            List[Dict]: États des jobs (scope, filters, last_ecg_data_id, processed, failed, status...)
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    sql = """
+                        SELECT analysis, version, scope, filters, last_ecg_data_id, processed, failed,
+                               status, started_at, updated_at
+                        FROM ecg_analysis_jobs
+                        WHERE analysis = %s AND version = %s
+                        ORDER BY scope
+                    """
+                    
+                    cursor.execute(sql, (analysis, version))
+                    return list(cursor.fetchall())
+                    
+        except Exception as e:
+            logger.error(f"Error getting analysis jobs: {e}")
+            return []
+    
+    @timed_query
+    def get_analysis_job(self, analysis: str, version: int, scope: str = '') -> Optional[Dict[str, Any]]:
+        """
+        Récupérer le point de reprise d'une analyse par lots
+        
+        Args:
+            analysis: Nom de l'analyse
+            version: Version de l'analyse
+            scope: Portée du job (empreinte des filtres, vide pour tout l'historique)
+            
+        Returns:
+            Dict: État du job (last_ecg_data_id, processed, failed, status...), None si jamais lancé
+            
+        Raises:
+            Exception: Erreur de base de données (distincte d'un job jamais lancé)
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    sql = """
+                        SELECT analysis, version, scope, filters, last_ecg_data_id, processed, failed,
+                               status, started_at, updated_at
+                        FROM ecg_analysis_jobs
+                        WHERE analysis = %s AND version = %s AND scope = %s
+                    """
+                    
+                    cursor.execute(sql, (analysis, version, scope))
+                    return cursor.fetchone()
+                    
+        except Exception as e:
+            logger.error(f"Error getting analysis job: {e}")
+            raise
+    
+    @timed_query
+    def reset_analysis_job(self, analysis: str, version: int, scope: str = '', filters: str = None) -> bool:
+        """
+        Repartir du début pour une analyse (les résultats existants sont écrasés au passage)
+        
+        Args:
+            analysis: Nom de l'analyse
+            version: Version de l'analyse
+            scope: Portée du job (empreinte des filtres, vide pour tout l'historique)
+            filters: Description lisible des filtres
+            
+        Returns:
+            bool: True si réinitialisé avec succès
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        INSERT INTO ecg_analysis_jobs (analysis, version, scope, filters, status, started_at)
+                        VALUES (%s, %s, %s, %s, 'running', NOW())
+                        ON DUPLICATE KEY UPDATE
+                            last_ecg_data_id = 0, processed = 0, failed = 0,
+                            status = 'running', started_at = NOW()
+                    """
+                    
+                    cursor.execute(sql, (analysis, version, scope, filters))
+                    conn.commit()
+                    return True
+                    
+        except Exception as e:
+            logger.error(f"Error resetting analysis job: {e}")
+            return False
+    
+    @timed_query
+    def save_analysis_results(self, analysis: str, version: int, results: List[tuple],
+                              scope: str = '', filters: str = None) -> bool:
+        """
+        Enregistrer un lot de résultats et avancer le point de reprise
+        
+        Résultats et point de reprise sont écrits dans la même transaction : un lot
+        interrompu est entièrement rejoué à la reprise, et le rejouer ne fait que
+        réécrire les mêmes lignes (clé (analysis, ecg_data_id)). Seul le point de reprise
+        de la portée du job avance : un job filtré ne fait sauter aucune fenêtre aux autres.
+        
+        Args:
+            analysis: Nom de l'analyse
+            version: Version de l'analyse
+            results: Tuples (ecg_data_id, diagnostic_id, image_created_at, result, error)
+                     dans l'ordre des id
+            scope: Portée du job (empreinte des filtres, vide pour tout l'historique)
+            filters: Description lisible des filtres
+            
+        Returns:
+            bool: True si enregistré avec succès
+        """
+        if not results:
+            return True
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        INSERT INTO ecg_analysis_results
+                        (analysis, ecg_data_id, version, diagnostic_id, image_created_at, result, error)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                            version = VALUES(version),
+                            result = VALUES(result),
+                            error = VALUES(error)
+                    """
+                    
+                    cursor.executemany(sql, [
+                        (analysis, ecg_data_id, version, diagnostic_id, created_at,
+                         json.dumps(result) if result is not None else None, error)
+                        for ecg_data_id, diagnostic_id, created_at, result, error in results
+                    ])
+                    
+                    # Rattrapage des caractéristiques des fenêtres antérieures à leur calcul à la capture
+                    if analysis == WINDOW_FEATURES_ANALYSIS:
+                        cursor.executemany(WINDOW_FEATURES_UPSERT_SQL, [
+                            self._window_feature_row(ecg_data_id, diagnostic_id, created_at, result)
+                            for ecg_data_id, diagnostic_id, created_at, result, _ in results
+                            if result is not None
+                        ])
+                    
+                    failed = sum(1 for result in results if result[4] is not None)
+                    cursor.execute("""
+                        INSERT INTO ecg_analysis_jobs
+                        (analysis, version, scope, filters, last_ecg_data_id, processed, failed, status)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, 'running')
+                        ON DUPLICATE KEY UPDATE
+                            last_ecg_data_id = GREATEST(last_ecg_data_id, VALUES(last_ecg_data_id)),
+                            processed = processed + VALUES(processed),
+                            failed = failed + VALUES(failed),
+                            status = 'running'
+                    """, (analysis, version, scope, filters, results[-1][0], len(results), failed))
+                    conn.commit()
+                    return True
+                    
+        except Exception as e:
+            logger.error(f"Error saving analysis results: {e}")
+            return False
+    
+    @timed_query
+    def update_analysis_job_status(self, analysis: str, version: int, status: str, scope: str = '',
+                                   filters: str = None) -> bool:
+        """
+        Mettre à jour le statut d'une analyse par lots
+        
+        Args:
+            analysis: Nom de l'analyse
+            version: Version de l'analyse
+            status: Nouveau statut ('running', 'completed', 'interrupted')
+            scope: Portée du job (empreinte des filtres, vide pour tout l'historique)
+            filters: Description lisible des filtres
+            
+        Returns:
+            bool: True si mis à jour avec succès
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    sql = """
+                        INSERT INTO ecg_analysis_jobs (analysis, version, scope, filters, status)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE status = VALUES(status)
+                    """
+                    
+                    cursor.execute(sql, (analysis, version, scope, filters, status))
+                    conn.commit()
+                    return True
+                    
+        except Exception as e:
+            logger.error(f"Error updating analysis job status: {e}")
+            return False
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Analyses des fenêtres ECG
+Fonctions appliquées aux échantillons ADC bruts (samples_blob) d'une fenêtre
+"""
+
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Référence du convertisseur (voir ECGCapture._convert_to_voltage)
+ADC_MAX = 1023
+ADC_VREF = 3.3
+
+# Période réfractaire entre deux battements (240 bpm maximum)
+REFRACTORY_SECONDS = 0.25
+
+# Seuils d'une fenêtre inexploitable (électrode débranchée, mauvais contact)
+QUALITY_THRESHOLDS = {
+    'max_saturation_ratio': 0.5,  # signal en butée à 0 ou 3.3 V
+    'min_amplitude': 0.05,  # volts crête à crête : ligne plate
+    'max_flatline_ratio': 0.95,
+    'max_noise_score': 0.5
+}
+
+def decode_samples(samples_blob: bytes) -> np.ndarray:
+    """
+    Décoder les échantillons d'une fenêtre
+
+    Args:
+        samples_blob: Échantillons ADC (uint16 little-endian)
+
+    Returns:
+        np.ndarray: Valeurs ADC
+    """
+    return np.frombuffer(samples_blob, dtype='<u2')
+
+def stitch_windows(windows: Iterable[tuple]) -> Iterator[np.ndarray]:
+    """
+    Échantillons consécutifs de fenêtres stockées, recouvrements retirés
+
+    Args:
+        windows: (first_sample_index, samples_blob) dans l'ordre d'enregistrement
+
+    Returns:
+        Iterator[np.ndarray]: Échantillons nouveaux de chaque fenêtre
+    """
+    previous_first = expected = None
+
+    for first_index, samples_blob in windows:
+        samples = decode_samples(samples_blob)
+
+        # Fenêtres recouvrantes : seuls les échantillons postérieurs à la fenêtre précédente
+        skip = 0
+        if first_index is not None and expected is not None and previous_first < first_index < expected:
+            skip = expected - first_index
+
+        yield samples[skip:]
+
+        if first_index is not None:
+            previous_first = first_index
+            expected = first_index + len(samples)
+
+def contiguous_segments(windows: Iterable[tuple]) -> Iterator[List[tuple]]:
+    """
+    Regrouper des fenêtres stockées en segments de signal continu
+
+    Une nouvelle session (indices repartis de zéro), des fenêtres absentes (contrôle qualité,
+    spool plein) ou un changement de fréquence ouvrent un segment ; une fenêtre sans indice
+    d'échantillon forme un segment à elle seule.
+
+    Args:
+        windows: Tuples (first_sample_index, sample_rate, samples_blob, ...) dans l'ordre d'enregistrement
+
+    Returns:
+        Iterator[List[tuple]]: Fenêtres de chaque segment
+    """
+    segment = []
+    previous_first = expected = rate = None
+
+    for window in windows:
+        first_index, sample_rate, samples_blob = window[:3]
+
+        # Continu : fenêtre suivante ou recouvrante de la même session, sans trou
+        continuous = (first_index is not None and previous_first is not None and sample_rate == rate
+                      and previous_first < first_index <= expected)
+        if segment and not continuous:
+            yield segment
+            segment = []
+
+        segment.append(window)
+        previous_first, rate = first_index, sample_rate
+        expected = first_index + len(samples_blob) // 2 if first_index is not None else None
+
+    if segment:
+        yield segment
+
+def to_voltage(samples: np.ndarray) -> np.ndarray:
+    """Convertir des valeurs ADC en volts"""
+    return samples.astype(np.float64) * ADC_VREF / (ADC_MAX + 1)
+
+def detect_r_peaks(voltage: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Détecter les pics R par seuil adaptatif et période réfractaire
+
+    Args:
+        voltage: Signal en volts
+        sample_rate: Fréquence d'échantillonnage en Hz
+
+    Returns:
+        np.ndarray: Indices des pics R
+    """
+    if len(voltage) < 3:
+        return np.array([], dtype=int)
+
+    signal = voltage - np.median(voltage)
+    peak = signal.max()
+    if peak <= 0:
+        return np.array([], dtype=int)
+
+    threshold = 0.5 * peak
+    is_peak = (signal[1:-1] > signal[:-2]) & (signal[1:-1] >= signal[2:]) & (signal[1:-1] > threshold)
+    candidates = np.flatnonzero(is_peak) + 1
+
+    # Garder le plus haut des candidats trop proches
+    refractory = max(1, int(REFRACTORY_SECONDS * sample_rate))
+    peaks = []
+    for index in candidates:
+        if peaks and index - peaks[-1] < refractory:
+            if signal[index] > signal[peaks[-1]]:
+                peaks[-1] = index
+        else:
+            peaks.append(index)
+
+    return np.array(peaks, dtype=int)
+
+def heart_rate_features(samples: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """
+    Fréquence cardiaque et variabilité RR d'une fenêtre
+
+    Args:
+        samples: Valeurs ADC
+        sample_rate: Fréquence d'échantillonnage en Hz
+
+    Returns:
+        dict: beats, heart_rate (bpm), rr_mean, rr_sdnn, rr_rmssd (secondes) ; None si moins de deux battements
+    """
+    peaks = detect_r_peaks(to_voltage(samples), sample_rate)
+    rr = np.diff(peaks) / sample_rate
+
+    if len(rr) == 0:
+        return {'beats': int(len(peaks)), 'heart_rate': None, 'rr_mean': None, 'rr_sdnn': None, 'rr_rmssd': None}
+
+    rr_mean = float(rr.mean())
+    return {
+        'beats': int(len(peaks)),
+        'heart_rate': 60.0 / rr_mean,
+        'rr_mean': rr_mean,
+        'rr_sdnn': float(rr.std()),
+        'rr_rmssd': float(np.sqrt(np.mean(np.diff(rr) ** 2))) if len(rr) > 1 else None
+    }
+
+def signal_quality(samples: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """
+    Indicateurs de qualité du signal d'une fenêtre
+
+    Args:
+        samples: Valeurs ADC
+        sample_rate: Fréquence d'échantillonnage en Hz
+
+    Returns:
+        dict: amplitude_range (V), flatline_ratio, saturation_ratio, noise_score (0 à 1)
+    """
+    if len(samples) < 3:
+        return {'amplitude_range': 0.0, 'flatline_ratio': 1.0, 'saturation_ratio': 0.0, 'noise_score': None}
+
+    voltage = to_voltage(samples)
+    amplitude = float(np.ptp(voltage))
+    steps = np.diff(samples.astype(np.int32))
+
+    # Bruit : énergie de la dérivée seconde rapportée à l'amplitude du signal
+    noise = float(np.std(np.diff(steps)) * ADC_VREF / (ADC_MAX + 1) / amplitude) if amplitude > 0 else None
+
+    return {
+        'amplitude_range': amplitude,
+        'flatline_ratio': float(np.mean(steps == 0)),
+        'saturation_ratio': float(np.mean((samples == 0) | (samples >= ADC_MAX))),
+        'noise_score': min(1.0, noise) if noise is not None else None
+    }
+
+def classify_signal_quality(quality: Dict[str, Any], thresholds: Dict[str, float] = None) -> Optional[str]:
+    """
+    Qualifier une fenêtre à partir de ses indicateurs de qualité
+
+    Args:
+        quality: Résultat de signal_quality
+        thresholds: Seuils (QUALITY_THRESHOLDS par défaut)
+
+    Returns:
+        str: 'saturation', 'flatline' ou 'noise' si la fenêtre est inexploitable, None sinon
+    """
+    thresholds = thresholds or QUALITY_THRESHOLDS
+
+    if quality['saturation_ratio'] >= thresholds['max_saturation_ratio']:
+        return 'saturation'
+    if (quality['amplitude_range'] < thresholds['min_amplitude']
+            or quality['flatline_ratio'] >= thresholds['max_flatline_ratio']):
+        return 'flatline'
+    if quality['noise_score'] is not None and quality['noise_score'] >= thresholds['max_noise_score']:
+        return 'noise'
+    return None
+
+def window_features(samples: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """Fréquence cardiaque, variabilité RR et qualité du signal"""
+    return {**heart_rate_features(samples, sample_rate), **signal_quality(samples, sample_rate)}
+
+# Analyses disponibles : incrémenter la version pour recalculer l'historique
+ANALYSES = {
+    'heart_rate': {'version': 1, 'function': heart_rate_features},
+    'signal_quality': {'version': 1, 'function': signal_quality},
+    'features': {'version': 1, 'function': window_features}
+}
+
+def run_analysis(name: str, samples_blob: bytes, sample_rate: Optional[int]) -> Dict[str, Any]:
+    """
+    Appliquer une analyse aux échantillons d'une fenêtre
+
+    Args:
+        name: Nom de l'analyse (clé de ANALYSES)
+        samples_blob: Échantillons ADC (uint16 little-endian)
+        sample_rate: Fréquence d'échantillonnage en Hz
+
+    Returns:
+        dict: Résultat de l'analyse
+    """
+    return ANALYSES[name]['function'](decode_samples(samples_blob), sample_rate or 100)
@@ -8,13 +8,24 @@ import RPi.GPIO as GPIO
 import spidev
 import matplotlib.pyplot as plt
 import numpy as np
+from PIL import Image
 from collections import deque
 import io
+import os
 import time
 import logging
 import multiprocessing
+import queue
 from datetime import datetime
 from database_manager import DatabaseManager
+from metrics import (
+    REGISTRY, SAMPLES_TOTAL, MISSED_SAMPLES_TOTAL, SAMPLE_JITTER, RENDER_SECONDS,
+    IMAGES_SAVED_TOTAL, IMAGES_FAILED_TOTAL, BUFFER_FILL, SPOOL_PENDING, WINDOWS_SUPPRESSED_TOTAL
+)
+from profiler import ProfileSession
+from window_spool import WindowSpool, SpoolReplayer
+from capture_profile import CaptureProfile
+from ecg_analysis import signal_quality, heart_rate_features, classify_signal_quality
 
 logger = logging.getLogger(__name__)
 
@@ -26,24 +37,59 @@ class ECGCapture:
     SPI_DEVICE = 0
     CS_GPIO_PIN = 4
     SAMPLE_RATE = 100  # Hz
-    SAVE_INTERVAL = 5  # secondes
-    BUFFER_SIZE = 500  # échantillons
+    WINDOW_SIZE = 500  # échantillons par fenêtre (5 s à 100 Hz)
+    WINDOW_OVERLAP = 0  # échantillons communs à deux fenêtres consécutives
+    METRICS_FLUSH_INTERVAL = 1.0  # secondes
+    SPOOL_DIR = os.getenv('SPOOL_DIR', '/data/ecg_spool')
+    QUALITY_CHECK = os.getenv('ECG_QUALITY_CHECK', '1') != '0'
+    # Fenêtres inexploitables : échantillons conservés pour une sur N (0 : aucune), jamais de rendu
+    BAD_WINDOW_KEEP_EVERY = int(os.getenv('ECG_BAD_WINDOW_KEEP_EVERY', 12))
     
-    def __init__(self, diagnostic_id: int, stop_event: multiprocessing.Event):
+    def __init__(self, diagnostic_id: int, stop_event: multiprocessing.Event,
+                 stats_queue: multiprocessing.Queue = None,
+                 control_queue: multiprocessing.Queue = None,
+                 profile: CaptureProfile = None, db_manager=None):
         """
         Initialiser la capture ECG
         
         Args:
             diagnostic_id: ID du diagnostic
             stop_event: Événement pour arrêter la capture
+            stats_queue: File vers le processus parent pour les métriques
+            control_queue: File de commandes envoyées par le processus parent
+            profile: Profil de capture (configuration par défaut de la classe sinon)
+            db_manager: Gestionnaire de base de données (DatabaseManager par défaut)
         """
+        self.profile = profile or CaptureProfile(
+            sample_rate=self.SAMPLE_RATE,
+            window_size=self.WINDOW_SIZE,
+            window_overlap=self.WINDOW_OVERLAP,
+            name='default'
+        )
+        self.SAMPLE_RATE = self.profile.sample_rate
+        self.window_size = self.profile.window_size
+        self.window_overlap = self.profile.window_overlap
+        
+        # Pas entre les débuts de deux fenêtres consécutives
+        self.window_hop = self.window_size - self.window_overlap
+        
         self.diagnostic_id = diagnostic_id
         self.stop_event = stop_event
-        self.db_manager = DatabaseManager()
+        self.stats_queue = stats_queue
+        self.control_queue = control_queue
+        self.profile_session = None
+        self.db_manager = db_manager or DatabaseManager()
+        
+        # Horloge de cadencement (remplacée par une horloge virtuelle pour le rejeu)
+        self.clock = time
+        
+        # Spool disque entre la capture et la base
+        self.spool = WindowSpool(os.path.join(self.SPOOL_DIR, f'diagnostic_{diagnostic_id}'))
+        self.replayer = SpoolReplayer(self.spool, self.db_manager, on_saved=self._on_windows_saved)
         
         # Buffers pour les données
-        self.voltage_buffer = deque(maxlen=self.BUFFER_SIZE)
-        self.time_buffer = deque(maxlen=self.BUFFER_SIZE)
+        self.voltage_buffer = deque(maxlen=self.window_size)
+        self.adc_buffer = deque(maxlen=self.window_size)
         
         # Configuration GPIO et SPI
         self.spi = None
@@ -52,7 +98,21 @@ class ECGCapture:
         # Compteurs
         self.sample_count = 0
         self.save_count = 0
+        self.next_window_start = 0
+        self.last_emitted_index = -1
         self.start_time = time.time()
+        self.last_sample_time = None
+        self.last_metrics_flush = time.time()
+        self.last_flush_sample_count = 0
+        self.missed_samples = 0
+        self.last_error = None
+        
+        # Qualité du signal (électrode débranchée, saturation, bruit)
+        self.signal_issue = None
+        self.signal_issue_since = None
+        self.signal_events = 0
+        self.suppressed_windows = 0
+        self.issue_windows = 0
         
     def _setup_hardware(self):
         """Configurer le matériel GPIO et SPI"""
@@ -109,11 +169,16 @@ class ECGCapture:
             time_data: Données temporelles
             
         Returns:
-            bytes: Image PNG en bytes
+            bytes: Image encodée selon le profil (vide si le profil n'a pas d'image)
         """
+        if self.profile.image_format == 'none':
+            return b''
+        
         try:
+            render_start = time.perf_counter()
+            
             # Créer le graphique
-            fig, ax = plt.subplots(figsize=(12, 6))
+            fig, ax = plt.subplots(figsize=(self.profile.width, self.profile.height))
             ax.plot(time_data, voltage_data, 'b-', linewidth=1)
             
             # Configuration du graphique
@@ -125,39 +190,347 @@ class ECGCapture:
             
             # Sauvegarder en buffer
             buffer = io.BytesIO()
-            fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+            fig.savefig(buffer, format='png', dpi=self.profile.dpi, bbox_inches='tight')
             plt.close(fig)
             
-            buffer.seek(0)
-            return buffer.getvalue()
+            image_data = self._encode_image(buffer.getvalue())
+            RENDER_SECONDS.observe(time.perf_counter() - render_start, diagnostic_id=self.diagnostic_id)
+            return image_data
             
         except Exception as e:
             logger.error(f"Error generating plot: {e}")
             return b''
     
-    def _save_to_database(self, image_data: bytes):
+    def _encode_image(self, png_data: bytes) -> bytes:
+        """
+        Réencoder le rendu PNG selon le format du profil
+        
+        Args:
+            png_data: Image PNG produite par matplotlib
+            
+        Returns:
+            bytes: Image encodée
+        """
+        if self.profile.image_format == 'png':
+            return png_data
+        
+        image = Image.open(io.BytesIO(png_data)).convert('RGB')
+        buffer = io.BytesIO()
+        
+        if self.profile.image_format == 'png_palette':
+            # Tracé au trait : une petite palette suffit
+            image.quantize(colors=16).save(buffer, format='PNG', optimize=True)
+        else:
+            image.save(buffer, format='WEBP', lossless=True, method=4)
+        
+        return buffer.getvalue()
+    
+    def _emit_window(self, first_index: int, last_index: int):
+        """
+        Rendre et sauvegarder la fenêtre [first_index, last_index]
+        
+        Les échantillons de la fenêtre sont les derniers du buffer.
+        
+        Args:
+            first_index: Indice du premier échantillon de la fenêtre
+            last_index: Indice du dernier échantillon de la fenêtre
+        """
+        self.last_emitted_index = last_index
+        length = last_index - first_index + 1
+        adc_samples = np.asarray(list(self.adc_buffer)[-length:], dtype='<u2')
+        window = {
+            'first_sample_index': first_index,
+            'last_sample_index': last_index,
+            'sample_rate': self.SAMPLE_RATE
+        }
+        
+        # Contrôle de qualité avant le rendu : une fenêtre inexploitable n'est pas dessinée
+        quality = self._check_signal_quality(adc_samples)
+        if self.signal_issue:
+            self.suppressed_windows += 1
+            self.issue_windows += 1
+            WINDOWS_SUPPRESSED_TOTAL.inc(diagnostic_id=self.diagnostic_id, reason=self.signal_issue)
+            
+            # Garder une trace espacée des échantillons (première fenêtre de l'épisode puis une sur N)
+            keep_every = self.BAD_WINDOW_KEEP_EVERY
+            if keep_every > 0 and (self.issue_windows - 1) % keep_every == 0:
+                self._save_to_database(b'', dict(window, features=quality), adc_samples.tobytes(),
+                                       rendered=False)
+            return
+        
+        voltage_data = list(self.voltage_buffer)[-length:]
+        
+        # Axe temporel dérivé des indices : les fenêtres se raccordent exactement
+        time_data = [(first_index + i) / self.SAMPLE_RATE for i in range(length)]
+        image_data = self._generate_plot(voltage_data, time_data)
+        
+        window['features'] = self._compute_features(adc_samples, quality)
+        self._save_to_database(image_data, window, adc_samples.tobytes())
+    
+    def _check_signal_quality(self, adc_samples: np.ndarray) -> dict:
         """
-        Sauvegarder l'image en base de données
+        Mesurer la qualité d'une fenêtre et suivre les épisodes de signal inexploitable
         
         Args:
-            image_data: Données de l'image PNG
+            adc_samples: Échantillons ADC de la fenêtre
+            
+        Returns:
+            dict: Indicateurs de qualité, None en cas d'erreur (fenêtre traitée normalement)
         """
         try:
-            if image_data:
-                success = self.db_manager.save_ecg_image(
-                    diagnostic_id=self.diagnostic_id,
-                    image_blob=image_data,
-                    capture_duration=self.SAVE_INTERVAL
-                )
-                
-                if success:
-                    self.save_count += 1
-                    logger.info(f"Saved ECG image {self.save_count} for diagnostic {self.diagnostic_id}")
-                else:
-                    logger.error(f"Failed to save ECG image for diagnostic {self.diagnostic_id}")
+            quality = signal_quality(adc_samples, self.SAMPLE_RATE)
+        except Exception as e:
+            logger.error(f"Error checking signal quality: {e}")
+            return None
+        
+        # Fenêtre partielle de fin de session : pas assez d'échantillons pour conclure
+        if len(adc_samples) < self.window_size // 2:
+            return quality
+        
+        issue = classify_signal_quality(quality) if self.QUALITY_CHECK else None
+        if issue != self.signal_issue:
+            self._set_signal_issue(issue)
+        
+        return quality
+    
+    def _set_signal_issue(self, issue: str = None):
+        """
+        Changer l'état de qualité du signal et l'enregistrer sur la session
+        
+        Args:
+            issue: 'saturation', 'flatline', 'noise' ou None si le signal est rétabli
+        """
+        self.signal_issue = issue
+        self.signal_issue_since = self.clock.time() if issue else None
+        self.issue_windows = 0
+        
+        if issue:
+            self.signal_events += 1
+            logger.warning(f"Signal quality issue for diagnostic {self.diagnostic_id}: {issue}, "
+                           f"rendering suspended")
+        else:
+            logger.info(f"Signal quality restored for diagnostic {self.diagnostic_id}")
+        
+        self._record_signal_quality(new_event=issue is not None)
+        self._flush_metrics(force=True)
+    
+    def _record_signal_quality(self, new_event: bool = False):
+        """
+        Enregistrer l'état de qualité du signal sur la session de capture
+        
+        Sous le gestionnaire de processus, l'état part par la file des statistiques et le
+        processus parent l'écrit en base : la boucle d'acquisition n'attend pas la base.
+        
+        Args:
+            new_event: Compter un nouvel épisode
+        """
+        quality = {
+            'issue': self.signal_issue,
+            'issue_since': datetime.fromtimestamp(self.signal_issue_since) if self.signal_issue_since else None,
+            'suppressed_windows': self.suppressed_windows,
+            'new_event': new_event
+        }
+        
+        if self.stats_queue is not None:
+            self._send_stats('signal', quality)
+        else:
+            self.db_manager.update_signal_quality(self.diagnostic_id, **quality)
+    
+    def _compute_features(self, adc_samples: np.ndarray, quality: dict = None) -> dict:
+        """
+        Calculer les caractéristiques d'une fenêtre (fréquence cardiaque, variabilité RR, qualité)
+        
+        Args:
+            adc_samples: Échantillons ADC de la fenêtre
+            quality: Indicateurs de qualité déjà calculés
             
+        Returns:
+            dict: Caractéristiques, None en cas d'erreur (rattrapées par batch_analysis.py)
+        """
+        try:
+            return {
+                **heart_rate_features(adc_samples, self.SAMPLE_RATE),
+                **(quality or signal_quality(adc_samples, self.SAMPLE_RATE))
+            }
         except Exception as e:
-            logger.error(f"Error saving to database: {e}")
+            logger.error(f"Error computing window features: {e}")
+            return None
+    
+    def _save_to_database(self, image_data: bytes, window: dict = None, samples: bytes = b'',
+                          rendered: bool = True):
+        """
+        Placer la fenêtre dans le spool disque, vidé vers la base en arrière-plan
+        
+        Args:
+            image_data: Données de l'image (vide si le profil n'en produit pas)
+            window: Indices du premier et du dernier échantillon, fréquence, caractéristiques
+            samples: Échantillons ADC bruts (uint16 little-endian)
+            rendered: False si le rendu a été volontairement omis (signal inexploitable)
+        """
+        try:
+            if rendered and not image_data and self.profile.image_format != 'none':
+                # Échec du rendu
+                IMAGES_FAILED_TOTAL.inc(diagnostic_id=self.diagnostic_id)
+                return
+            
+            meta = {
+                'diagnostic_id': self.diagnostic_id,
+                'capture_duration': max(1, round(self.window_size / self.SAMPLE_RATE)),
+                'created_at': self.clock.time(),
+                'image_size': len(image_data),
+                'image_format': self.profile.image_format if image_data else None
+            }
+            meta.update(window or {})
+            
+            success = self.spool.append(meta, image_data + samples)
+            
+            if not success:
+                IMAGES_FAILED_TOTAL.inc(diagnostic_id=self.diagnostic_id)
+                logger.error(f"Failed to spool ECG window for diagnostic {self.diagnostic_id}")
+            
+        except Exception as e:
+            IMAGES_FAILED_TOTAL.inc(diagnostic_id=self.diagnostic_id)
+            logger.error(f"Error spooling ECG image: {e}")
+    
+    def _on_windows_saved(self, windows: list):
+        """
+        Comptabiliser les fenêtres enregistrées en base par le spool
+        
+        Args:
+            windows: Métadonnées des fenêtres enregistrées
+        """
+        self.save_count += len(windows)
+        IMAGES_SAVED_TOTAL.inc(len(windows), diagnostic_id=self.diagnostic_id)
+        logger.info(f"Saved {len(windows)} ECG image(s) for diagnostic {self.diagnostic_id} (total {self.save_count})")
+    
+    def _record_sample_timing(self, now: float):
+        """
+        Mesurer la gigue d'échantillonnage et les échantillons manqués
+        
+        Args:
+            now: Horodatage de l'échantillon courant
+        """
+        SAMPLES_TOTAL.inc(diagnostic_id=self.diagnostic_id)
+        
+        if self.last_sample_time is not None:
+            expected = 1.0 / self.SAMPLE_RATE
+            interval = now - self.last_sample_time
+            SAMPLE_JITTER.observe(abs(interval - expected), diagnostic_id=self.diagnostic_id)
+            
+            missed = int(interval / expected + 0.5) - 1
+            if missed > 0:
+                self.missed_samples += missed
+                MISSED_SAMPLES_TOTAL.inc(missed, diagnostic_id=self.diagnostic_id)
+        
+        self.last_sample_time = now
+    
+    def _flush_metrics(self, force: bool = False):
+        """
+        Envoyer les métriques et l'état courant au processus parent
+        
+        Args:
+            force: Envoyer même si l'intervalle n'est pas écoulé
+        """
+        now = time.time()
+        if self.stats_queue is None or (not force and now - self.last_metrics_flush < self.METRICS_FLUSH_INTERVAL):
+            return
+        
+        elapsed = now - self.last_metrics_flush
+        rate = (self.sample_count - self.last_flush_sample_count) / elapsed if elapsed > 0 else 0.0
+        self.last_metrics_flush = now
+        self.last_flush_sample_count = self.sample_count
+        
+        buffer_fill = len(self.voltage_buffer) / self.window_size
+        BUFFER_FILL.set(buffer_fill, diagnostic_id=self.diagnostic_id)
+        SPOOL_PENDING.set(self.spool.pending_windows, diagnostic_id=self.diagnostic_id)
+        self._send_stats('metrics', REGISTRY.collect_deltas())
+        self._send_stats('stats', {
+            'sample_count': self.sample_count,
+            'save_count': self.save_count,
+            'last_error': self.last_error or self.replayer.last_error,
+            'rate': rate,
+            'buffer_fill': buffer_fill,
+            'spool': self.spool.status(),
+            'signal': {
+                'issue': self.signal_issue,
+                'since': datetime.fromtimestamp(self.signal_issue_since).isoformat() if self.signal_issue_since else None,
+                'events': self.signal_events,
+                'suppressed_windows': self.suppressed_windows
+            }
+        })
+    
+    def _send_stats(self, kind: str, payload):
+        """
+        Envoyer un message au processus parent
+        
+        Args:
+            kind: Type du message
+            payload: Contenu du message
+        """
+        if self.stats_queue is None:
+            return
+        
+        try:
+            self.stats_queue.put_nowait((kind, self.diagnostic_id, payload))
+        except Exception as e:
+            logger.debug(f"Could not send {kind} for diagnostic {self.diagnostic_id}: {e}")
+    
+    def _poll_control(self):
+        """Traiter les commandes du processus parent sans bloquer la capture"""
+        # Terminer un profilage arrivé à échéance
+        if self.profile_session and self.profile_session.expired():
+            self._finish_profile()
+        
+        if self.control_queue is None:
+            return
+        
+        while True:
+            try:
+                command, args = self.control_queue.get_nowait()
+            except queue.Empty:
+                return
+            except Exception as e:
+                logger.debug(f"Could not read control queue for diagnostic {self.diagnostic_id}: {e}")
+                return
+            
+            if command == 'profile':
+                self._start_profile(**args)
+            else:
+                logger.warning(f"Unknown control command for diagnostic {self.diagnostic_id}: {command}")
+    
+    def _start_profile(self, path: str, duration: float, mode: str = 'sampling', interval: float = 0.005):
+        """
+        Démarrer un profilage de la boucle de capture
+        
+        Args:
+            path: Fichier de sortie
+            duration: Durée en secondes
+            mode: 'sampling' ou 'cprofile'
+            interval: Période d'échantillonnage
+        """
+        if self.profile_session:
+            self._send_stats('profile', {'path': path, 'status': 'rejected', 'error': 'Profile already running'})
+            return
+        
+        try:
+            self.profile_session = ProfileSession(path, duration, mode, interval)
+            self.profile_session.start()
+            self._send_stats('profile', {'path': path, 'status': 'running'})
+            logger.info(f"Profiling diagnostic {self.diagnostic_id} for {duration}s ({mode})")
+        except Exception as e:
+            self.profile_session = None
+            self._send_stats('profile', {'path': path, 'status': 'error', 'error': str(e)})
+    
+    def _finish_profile(self):
+        """Arrêter le profilage en cours et signaler le fichier produit"""
+        session = self.profile_session
+        self.profile_session = None
+        
+        written = session.finish()
+        self._send_stats('profile', {
+            'path': session.path,
+            'status': 'completed' if written else 'error'
+        })
     
     def run(self):
         """
@@ -167,53 +540,62 @@ class ECGCapture:
         
         try:
             # Initialiser la session de capture
-            self.db_manager.init_capture_session(self.diagnostic_id)
+            self.db_manager.init_capture_session(self.diagnostic_id, self.profile.to_dict())
+            
+            # Vider le spool en arrière-plan (y compris l'arriéré d'une session précédente)
+            self.replayer.start()
             
-            last_save_time = time.time()
+            period = 1.0 / self.SAMPLE_RATE
+            next_sample_time = self.clock.time()
             
             while not self.stop_event.is_set():
                 try:
                     # Lire une valeur
                     raw_value = self._analog_read()
                     voltage = self._convert_to_voltage(raw_value)
-                    current_time = time.time() - self.start_time
+                    self._record_sample_timing(self.clock.time())
                     
                     # Ajouter aux buffers
                     self.voltage_buffer.append(voltage)
-                    self.time_buffer.append(current_time)
+                    self.adc_buffer.append(raw_value)
                     
+                    sample_index = self.sample_count
                     self.sample_count += 1
                     
-                    # Vérifier s'il faut sauvegarder
-                    if time.time() - last_save_time >= self.SAVE_INTERVAL:
-                        # Créer et sauvegarder le graphique
-                        if len(self.voltage_buffer) > 0:
-                            image_data = self._generate_plot(
-                                list(self.voltage_buffer),
-                                list(self.time_buffer)
-                            )
-                            self._save_to_database(image_data)
-                        
-                        last_save_time = time.time()
-                        
-                        # Mettre à jour le compteur d'images
-                        self.db_manager.update_capture_session_count(
-                            self.diagnostic_id, 
-                            self.save_count
-                        )
+                    # Fenêtre complète : découpage par indice d'échantillon
+                    if sample_index == self.next_window_start + self.window_size - 1:
+                        self._emit_window(self.next_window_start, sample_index)
+                        self.next_window_start += self.window_hop
                     
-                    # Respecter la fréquence d'échantillonnage
-                    time.sleep(1.0 / self.SAMPLE_RATE)
+                    self._flush_metrics()
+                    self._poll_control()
+                    
+                    # Cadence absolue : la durée du traitement n'allonge pas la période
+                    next_sample_time += period
+                    delay = next_sample_time - self.clock.time()
+                    if delay > 0:
+                        self.clock.sleep(delay)
+                    elif delay < -1.0:
+                        # Retard important (blocage) : repartir de maintenant
+                        next_sample_time = self.clock.time()
                     
                 except Exception as e:
                     logger.error(f"Error in capture loop: {e}")
+                    self.last_error = str(e)
                     time.sleep(0.1)  # Pause courte avant de continuer
             
+            # Fenêtre finale partielle : aucun échantillon n'est perdu à l'arrêt, aucun n'est émis deux fois
+            # (avec recouvrement, next_window_start précède la fin de la dernière fenêtre)
+            if self.sample_count - 1 > self.last_emitted_index:
+                first_index = max(self.next_window_start, self.sample_count - self.window_size)
+                self._emit_window(first_index, self.sample_count - 1)
+            
             logger.info(f"ECG capture stopped for diagnostic {self.diagnostic_id}")
             logger.info(f"Total samples: {self.sample_count}, Images saved: {self.save_count}")
             
         except Exception as e:
             logger.error(f"Critical error in ECG capture: {e}")
+            self.last_error = str(e)
             self.db_manager.update_capture_status(self.diagnostic_id, 'error', str(e))
             
         finally:
@@ -227,9 +609,22 @@ class ECGCapture:
             
             GPIO.cleanup()
             
+            # Laisser le spool se vider brièvement ; le reste sera repris au prochain démarrage
+            self.replayer.stop()
+            self.spool.close()
+            
             # Finaliser la session de capture
+            if self.suppressed_windows:
+                self._record_signal_quality()
             self.db_manager.finalize_capture_session(self.diagnostic_id, self.save_count)
             
+            # Écrire un profilage interrompu par l'arrêt
+            if self.profile_session:
+                self._finish_profile()
+            
+            # Dernier envoi des métriques
+            self._flush_metrics(force=True)
+            
             logger.info(f"Cleanup completed for diagnostic {self.diagnostic_id}")
             
         except Exception as e:
@@ -4,15 +4,33 @@ Service ECG Flask
 API REST pour contrôler les captures ECG
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import logging
 import threading
 import time
+import re
+import json
+import hashlib
+import struct
 from datetime import datetime
+from functools import wraps
+
+# Matériel simulé (poste de développement, nœuds de test sur localhost)
+if os.getenv('ECG_SIMULATED_HARDWARE') == '1':
+    import simulated_hardware
+    simulated_hardware.install()
+
 from process_manager import ECGProcessManager
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, WINDOW_FEATURE_COLUMNS
+from blob_store import BlobMigrationWorker
+from partition_maintenance import PartitionMaintenanceWorker
+from metrics import REGISTRY
+from profiler import PROFILE_MODES, MAX_PROFILE_DURATION
+from capture_profile import CaptureProfile, PRESETS, IMAGE_FORMATS
+from federation import NodeRegistry, FORWARDED_HEADER
+from waveform_frame import encode_window_frames, FRAME_ENCODINGS, FRAME_VERSION
 
 # Configuration logging
 logging.basicConfig(level=logging.INFO)
@@ -22,41 +40,232 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Gestionnaire de processus ECG
-process_manager = ECGProcessManager()
+# Gestionnaire de processus ECG (écrit en base les états remontés par les captures)
 db_manager = DatabaseManager()
+process_manager = ECGProcessManager(db_manager)
+
+def _create_blob_migration_worker():
+    """
+    Créer la tâche de migration des blobs selon la configuration
+    
+    BLOB_MIGRATION_AGE_DAYS: âge minimal en jours, 'all' pour tout migrer,
+    non défini pour désactiver la tâche de fond.
+    """
+    age = os.getenv('BLOB_MIGRATION_AGE_DAYS')
+    if not age:
+        return None
+    
+    return BlobMigrationWorker(
+        db_manager,
+        older_than_days=None if age == 'all' else int(age),
+        interval=int(os.getenv('BLOB_MIGRATION_INTERVAL', 300))
+    )
+
+blob_migration_worker = _create_blob_migration_worker()
+
+def _create_partition_worker():
+    """
+    Créer la tâche de maintenance des partitions selon la configuration
+    
+    ECG_PARTITION_MONTHS_AHEAD: mois futurs préparés (défaut 3),
+    ECG_RETENTION_MONTHS: mois complets conservés, non défini pour tout conserver.
+    """
+    retention = os.getenv('ECG_RETENTION_MONTHS')
+    
+    return PartitionMaintenanceWorker(
+        db_manager,
+        months_ahead=int(os.getenv('ECG_PARTITION_MONTHS_AHEAD', 3)),
+        retention_months=int(retention) if retention else None,
+        interval=int(os.getenv('ECG_PARTITION_INTERVAL', 86400))
+    )
+
+partition_worker = _create_partition_worker()
+
+def _parse_datetime_arg(name: str):
+    """
+    Lire un paramètre de requête au format ISO 8601
+    
+    Args:
+        name: Nom du paramètre
+        
+    Returns:
+        datetime: Valeur lue, None si absente
+    """
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+# Lot d'images : pour chaque image, en-tête (id, taille des métadonnées, taille de l'image),
+# métadonnées JSON puis contenu de l'image
+IMAGE_BATCH_RECORD = struct.Struct('<III')
+IMAGE_BATCH_MAX = int(os.getenv('IMAGE_BATCH_MAX', 100))
+
+# Trames de forme d'onde : nombre maximal de fenêtres réunies sur une période
+FRAME_MAX_WINDOWS = int(os.getenv('FRAME_MAX_WINDOWS', 720))
+
+# Taille maximale d'une page de recherche par caractéristiques
+FEATURE_SEARCH_MAX = int(os.getenv('FEATURE_SEARCH_MAX', 1000))
+
+# Enregistrements rejouables par fichier (voir replay.py)
+RECORDINGS_DIR = os.getenv('ECG_RECORDINGS_DIR', '/data/recordings')
+
+# Registre des nœuds de capture (fédération active si ECG_NODES déclare des nœuds distants)
+NODE_CAPACITY = int(os.getenv('ECG_NODE_CAPACITY', 4))
+node_registry = NodeRegistry()
+
+def _proxy_response(response):
+    """Convertir la réponse d'un nœud en réponse Flask"""
+    return Response(response.content, status=response.status_code,
+                    content_type=response.headers.get('Content-Type'))
+
+def routed(placement: bool = False, release: bool = False):
+    """
+    Relayer un appel de capture vers le nœud propriétaire du diagnostic
+    
+    Sans fédération, ou pour une requête déjà relayée, la vue est exécutée localement.
+    
+    Args:
+        placement: Choisir le nœud le moins chargé (démarrage d'une session)
+        release: Oublier le nœud propriétaire une fois l'appel traité (arrêt d'une session)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(diagnostic_id, *args, **kwargs):
+            if not node_registry.enabled or request.headers.get(FORWARDED_HEADER):
+                return view(diagnostic_id, *args, **kwargs)
+            
+            if placement:
+                node = node_registry.place(diagnostic_id)
+                if node is None:
+                    return jsonify({
+                        'error': 'No capture node available',
+                        'diagnostic_id': diagnostic_id
+                    }), 503
+            else:
+                node = node_registry.owner(diagnostic_id)
+                if node is None:
+                    # Aucune capture connue : l'état local fait foi
+                    return view(diagnostic_id, *args, **kwargs)
+            
+            if node.is_local:
+                result = view(diagnostic_id, *args, **kwargs)
+            else:
+                try:
+                    result = _proxy_response(node_registry.forward(
+                        node, request.method, request.full_path.rstrip('?'),
+                        request.get_data(), request.content_type
+                    ))
+                except Exception as e:
+                    logger.error(f"Error forwarding to node {node.name}: {e}")
+                    node.healthy = False
+                    if placement:
+                        node_registry.cancel_placement(diagnostic_id, node)
+                    node_registry.unassign(diagnostic_id)
+                    return jsonify({
+                        'error': f'Capture node {node.name} unreachable',
+                        'diagnostic_id': diagnostic_id
+                    }), 502
+            
+            status = result[1] if isinstance(result, tuple) else result.status_code
+            if placement:
+                if status == 200:
+                    node_registry.assign(diagnostic_id, node)
+                else:
+                    node_registry.cancel_placement(diagnostic_id, node)
+            elif release and status < 500:
+                # Session arrêtée, ou déjà absente du nœud : l'assignation est périmée
+                node_registry.unassign(diagnostic_id)
+            
+            return result
+        return wrapper
+    return decorator
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Point de santé du service"""
-    return jsonify({
+    """Point de santé du service (agrégé sur les nœuds si la fédération est active)"""
+    captures_running = len(process_manager.get_running_processes())
+    node_registry.update_local(captures_running, NODE_CAPACITY)
+    
+    health = {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'service': 'ECG Capture Service'
-    })
+        'service': 'ECG Capture Service',
+        'node': node_registry.local_name,
+        'captures_running': captures_running,
+        'capacity': NODE_CAPACITY
+    }
+    
+    if node_registry.enabled and not request.headers.get(FORWARDED_HEADER):
+        federation = node_registry.status()
+        health['status'] = federation['status']
+        health['federation'] = federation
+    
+    return jsonify(health), 200 if health['status'] != 'unhealthy' else 503
+
+@app.route('/nodes', methods=['GET'])
+def list_nodes():
+    """Lister les nœuds de capture et leur charge"""
+    return jsonify(node_registry.status())
+
+@app.route('/nodes', methods=['POST'])
+def register_node():
+    """Enregistrer un nœud de capture"""
+    data = request.get_json(silent=True) or {}
+    
+    if not data.get('name') or not data.get('url'):
+        return jsonify({'error': 'name and url are required'}), 400
+    
+    node = node_registry.register(data['name'], data['url'])
+    node_registry.refresh()
+    node_registry.start()
+    
+    return jsonify({'message': 'Node registered', 'node': node.to_dict()})
+
+@app.route('/nodes/<name>', methods=['DELETE'])
+def unregister_node(name):
+    """Retirer un nœud de capture"""
+    if not node_registry.unregister(name):
+        return jsonify({'error': 'Node not found', 'node': name}), 404
+    
+    return jsonify({'message': 'Node removed', 'node': name})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus"""
+    process_manager.update_gauges()
+    
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/capture/start/<int:diagnostic_id>', methods=['POST'])
+@routed(placement=True)
 def start_capture(diagnostic_id):
-    """Démarrer la capture ECG pour un diagnostic"""
+    """Démarrer la capture ECG pour un diagnostic (profil optionnel dans le corps JSON)"""
     try:
-        # Vérifier si une capture est déjà en cours
-        if process_manager.is_running(diagnostic_id):
+        # Valider le profil de capture
+        try:
+            profile = CaptureProfile.from_dict(request.get_json(silent=True))
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'error': f'Invalid capture profile: {e}',
+                'diagnostic_id': diagnostic_id
+            }), 400
+        
+        # Vérifier si une capture est déjà en cours (un arrêt en cours est attendu par start_capture)
+        if process_manager.is_running(diagnostic_id) and not process_manager.is_stopping(diagnostic_id):
             return jsonify({
                 'error': 'Capture already running for this diagnostic',
                 'diagnostic_id': diagnostic_id
             }), 400
         
         # Démarrer la capture
-        success = process_manager.start_capture(diagnostic_id)
+        success = process_manager.start_capture(diagnostic_id, profile)
         
         if success:
-            # Mettre à jour le statut en base
-            db_manager.update_capture_status(diagnostic_id, 'running')
-            
+            # La session est initialisée en base par le processus de capture
             return jsonify({
                 'message': 'Capture started successfully',
                 'diagnostic_id': diagnostic_id,
-                'status': 'running'
+                'status': 'running',
+                'profile': profile.to_dict()
             })
         else:
             return jsonify({
@@ -71,21 +280,29 @@ def start_capture(diagnostic_id):
             'diagnostic_id': diagnostic_id
         }), 500
 
+@app.route('/capture/profiles', methods=['GET'])
+def list_capture_profiles():
+    """Lister les préréglages de profil de capture"""
+    return jsonify({
+        'presets': {name: CaptureProfile.from_dict({'preset': name}).to_dict() for name in PRESETS}
+    })
+
 @app.route('/capture/stop/<int:diagnostic_id>', methods=['POST'])
+@routed(release=True)
 def stop_capture(diagnostic_id):
     """Arrêter la capture ECG pour un diagnostic"""
     try:
-        # Arrêter la capture
-        success = process_manager.stop_capture(diagnostic_id)
+        # Engager l'arrêt ; le processus termine en arrière-plan puis le statut est écrit en base
+        success = process_manager.stop_capture(
+            diagnostic_id,
+            on_stopped=lambda: db_manager.update_capture_status(diagnostic_id, 'stopped')
+        )
         
         if success:
-            # Mettre à jour le statut en base
-            db_manager.update_capture_status(diagnostic_id, 'stopped')
-            
             return jsonify({
-                'message': 'Capture stopped successfully',
+                'message': 'Capture stopping',
                 'diagnostic_id': diagnostic_id,
-                'status': 'stopped'
+                'status': 'stopping'
             })
         else:
             return jsonify({
@@ -101,19 +318,40 @@ def stop_capture(diagnostic_id):
         }), 500
 
 @app.route('/capture/status/<int:diagnostic_id>', methods=['GET'])
+@routed()
 def get_capture_status(diagnostic_id):
     """Obtenir le statut de capture d'un diagnostic"""
     try:
-        # Vérifier le statut du processus
-        is_running = process_manager.is_running(diagnostic_id)
+        # Vérifier le statut du processus (une capture en cours d'arrêt n'est plus considérée en cours)
+        is_stopping = process_manager.is_stopping(diagnostic_id)
+        is_running = process_manager.is_running(diagnostic_id) and not is_stopping
+        
+        # État en direct remonté par le processus de capture
+        live = process_manager.get_live_stats(diagnostic_id)
         
-        # Récupérer les informations de la base
-        session_info = db_manager.get_capture_session(diagnostic_id)
+        if live:
+            session_info = {
+                'diagnostic_id': diagnostic_id,
+                'status': live.get('status'),
+                'started_at': live.get('started_at'),
+                'stopped_at': live.get('stopped_at'),
+                'total_images': live.get('save_count', 0),
+                'last_error': live.get('last_error'),
+                'profile': live.get('profile'),
+                'signal': live.get('signal')
+            }
+        else:
+            # Diagnostic inconnu depuis le démarrage du service : lire une seule fois la dernière session
+            session_info = db_manager.get_capture_session(diagnostic_id)
+            if session_info:
+                process_manager.seed_live_stats(diagnostic_id, session_info)
         
         return jsonify({
             'diagnostic_id': diagnostic_id,
             'is_running': is_running,
+            'is_stopping': is_stopping,
             'session_info': session_info,
+            'live': live,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -124,11 +362,176 @@ def get_capture_status(diagnostic_id):
             'diagnostic_id': diagnostic_id
         }), 500
 
+@app.route('/capture/profile/<int:diagnostic_id>', methods=['POST'])
+@routed()
+def start_profile(diagnostic_id):
+    """Profiler le processus de capture d'un diagnostic pendant N secondes"""
+    try:
+        data = request.get_json(silent=True) or {}
+        duration = float(data.get('duration', 10))
+        mode = data.get('mode', 'sampling')
+        interval = float(data.get('interval', 0.005))
+        
+        if mode not in PROFILE_MODES or not 0 < duration <= MAX_PROFILE_DURATION or interval <= 0:
+            return jsonify({
+                'error': f'Invalid profile parameters (mode in {PROFILE_MODES}, 0 < duration <= {MAX_PROFILE_DURATION})',
+                'diagnostic_id': diagnostic_id
+            }), 400
+        
+        profile = process_manager.request_profile(diagnostic_id, duration, mode, interval)
+        
+        if not profile:
+            return jsonify({
+                'error': 'No capture running for this diagnostic',
+                'diagnostic_id': diagnostic_id
+            }), 404
+        
+        return jsonify({
+            'message': 'Profiling requested',
+            'diagnostic_id': diagnostic_id,
+            'profile': profile,
+            'download_url': f"/profiles/{profile['name']}"
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error starting profile: {e}")
+        return jsonify({
+            'error': str(e),
+            'diagnostic_id': diagnostic_id
+        }), 500
+
+@app.route('/capture/profile/<int:diagnostic_id>', methods=['GET'])
+@routed()
+def list_profiles(diagnostic_id):
+    """Lister les profilages d'un diagnostic"""
+    return jsonify({
+        'diagnostic_id': diagnostic_id,
+        'profiles': process_manager.get_profiles(diagnostic_id)
+    })
+
+@app.route('/replay/<int:diagnostic_id>', methods=['POST'])
+@routed(placement=True)
+def start_replay(diagnostic_id):
+    """Rejouer un enregistrement (diagnostic stocké ou fichier) à travers le pipeline de capture"""
+    try:
+        data = request.get_json(silent=True) or {}
+        source = data.get('source') or {}
+        speed = float(data.get('speed', 0))
+        persist = bool(data.get('persist', False))
+        
+        if source.get('file'):
+            # Fichiers limités au répertoire des enregistrements
+            name = str(source['file'])
+            if os.path.isabs(name) or '..' in name.split('/'):
+                return jsonify({'error': 'Invalid recording file', 'diagnostic_id': diagnostic_id}), 400
+            path = os.path.join(RECORDINGS_DIR, name)
+            if not os.path.isfile(path):
+                return jsonify({'error': f'Recording not found: {name}', 'diagnostic_id': diagnostic_id}), 404
+            source = {'file': path, 'sample_rate': int(source.get('sample_rate', 100))}
+        elif source.get('diagnostic_id') is not None:
+            source = {
+                'diagnostic_id': int(source['diagnostic_id']),
+                'since': source.get('since'),
+                'until': source.get('until')
+            }
+            for key in ('since', 'until'):
+                if source[key]:
+                    datetime.fromisoformat(source[key])
+            if persist and source['diagnostic_id'] == diagnostic_id:
+                return jsonify({
+                    'error': 'A diagnostic cannot be replayed into itself with persist',
+                    'diagnostic_id': diagnostic_id
+                }), 400
+        else:
+            return jsonify({
+                'error': "Replay source needs 'diagnostic_id' or 'file'",
+                'diagnostic_id': diagnostic_id
+            }), 400
+        
+        if speed < 0:
+            return jsonify({'error': 'Invalid replay speed', 'diagnostic_id': diagnostic_id}), 400
+        
+        # Profil optionnel (préréglage, valeurs explicites), complété dans le processus par la
+        # fréquence de l'enregistrement : validé ici pour répondre 400 plutôt qu'échouer au démarrage
+        profile = data.get('profile') or None
+        if profile is not None:
+            CaptureProfile.from_dict(dict({'sample_rate': 100}, **profile))
+        
+        if process_manager.is_running(diagnostic_id):
+            return jsonify({
+                'error': 'Capture already running for this diagnostic',
+                'diagnostic_id': diagnostic_id
+            }), 409
+        
+        replay = {'source': source, 'speed': speed, 'persist': persist, 'profile': profile}
+        if not process_manager.start_capture(diagnostic_id, replay=replay):
+            return jsonify({
+                'error': 'Failed to start replay',
+                'diagnostic_id': diagnostic_id
+            }), 500
+        
+        return jsonify({
+            'message': 'Replay started',
+            'diagnostic_id': diagnostic_id,
+            'status': 'running',
+            'replay': replay
+        })
+        
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            'error': f'Invalid replay parameters: {e}',
+            'diagnostic_id': diagnostic_id
+        }), 400
+    except Exception as e:
+        logger.error(f"Error starting replay: {e}")
+        return jsonify({
+            'error': str(e),
+            'diagnostic_id': diagnostic_id
+        }), 500
+
+@app.route('/replay/<int:diagnostic_id>', methods=['GET'])
+@routed()
+def get_replay(diagnostic_id):
+    """Obtenir l'avancement ou le bilan (durées par étape) du dernier rejeu d'un diagnostic"""
+    live = process_manager.get_live_stats(diagnostic_id) or {}
+    if not live.get('replay'):
+        return jsonify({
+            'error': 'No replay for this diagnostic',
+            'diagnostic_id': diagnostic_id
+        }), 404
+    
+    return jsonify({
+        'diagnostic_id': diagnostic_id,
+        'is_running': process_manager.is_running(diagnostic_id),
+        'sample_count': live.get('sample_count', 0),
+        'save_count': live.get('save_count', 0),
+        'rate': live.get('rate', 0.0),
+        'replay': live['replay']
+    })
+
+@app.route('/profiles/<path:name>', methods=['GET'])
+def download_profile(name):
+    """Télécharger un fichier de profilage"""
+    # Le fichier est sur le nœud qui exécute la capture
+    match = re.match(r'diagnostic_(\d+)_', name)
+    if match and node_registry.enabled and not request.headers.get(FORWARDED_HEADER):
+        node = node_registry.owner(int(match.group(1)))
+        if node and not node.is_local:
+            return _proxy_response(node_registry.forward(node, 'GET', f'/profiles/{name}'))
+    
+    return send_from_directory(process_manager.profile_dir, name, as_attachment=True)
+
 @app.route('/images/<int:diagnostic_id>', methods=['GET'])
 def get_diagnostic_images(diagnostic_id):
     """Récupérer toutes les images d'un diagnostic"""
     try:
-        images = db_manager.get_diagnostic_images(diagnostic_id)
+        since = _parse_datetime_arg('since')
+        until = _parse_datetime_arg('until')
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}', 'diagnostic_id': diagnostic_id}), 400
+    
+    try:
+        images = db_manager.get_diagnostic_images(diagnostic_id, since=since, until=until)
         
         return jsonify({
             'diagnostic_id': diagnostic_id,
@@ -147,12 +550,19 @@ def get_diagnostic_images(diagnostic_id):
 def get_image(image_id):
     """Récupérer une image spécifique"""
     try:
-        image_data = db_manager.get_image_blob(image_id)
+        created_at = _parse_datetime_arg('created_at')
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}', 'image_id': image_id}), 400
+    
+    try:
+        image_data = db_manager.get_image_blob(image_id, created_at=created_at)
         
         if image_data:
             return jsonify({
                 'image_id': image_id,
                 'image_data': image_data['image_blob'],
+                'image_format': image_data['image_format'],
+                'mime_type': IMAGE_FORMATS.get(image_data['image_format'], 'image/png'),
                 'created_at': image_data['image_created_at']
             })
         else:
@@ -168,6 +578,252 @@ def get_image(image_id):
             'image_id': image_id
         }), 500
 
+@app.route('/images/<int:diagnostic_id>/batch', methods=['GET'])
+def get_images_batch(diagnostic_id):
+    """
+    Récupérer plusieurs images d'un diagnostic en une réponse binaire
+    
+    Paramètre ids : liste d'IDs séparés par des virgules. La réponse est une suite
+    d'enregistrements préfixés par leur longueur (voir IMAGE_BATCH_RECORD) ;
+    les images introuvables sont absentes.
+    """
+    try:
+        image_ids = [int(value) for value in request.args.get('ids', '').split(',') if value]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    
+    if not image_ids or len(image_ids) > IMAGE_BATCH_MAX:
+        return jsonify({'error': f'Between 1 and {IMAGE_BATCH_MAX} image ids are required'}), 400
+    
+    try:
+        images = db_manager.get_image_blobs(diagnostic_id, image_ids)
+        
+        chunks = []
+        for image in images:
+            meta = json.dumps({
+                'image_format': image['image_format'],
+                'mime_type': IMAGE_FORMATS.get(image['image_format']) or 'image/png',
+                'created_at': image['image_created_at']
+            }).encode('utf-8')
+            chunks.append(IMAGE_BATCH_RECORD.pack(image['id'], len(meta), len(image['image_blob'])))
+            chunks.append(meta)
+            chunks.append(image['image_blob'])
+        
+        return Response(b''.join(chunks), mimetype='application/octet-stream',
+                        headers={'X-Image-Count': str(len(images))})
+        
+    except Exception as e:
+        logger.error(f"Error getting image batch: {e}")
+        return jsonify({
+            'error': str(e),
+            'diagnostic_id': diagnostic_id
+        }), 500
+
+def _period_etag(window_ids, encoding: str) -> str:
+    """ETag d'une période : fenêtres réunies, encodage et version du format"""
+    ids = ','.join(str(window_id) for window_id in window_ids)
+    return hashlib.sha1(f'{ids}-{encoding}-{FRAME_VERSION}'.encode()).hexdigest()[:24]
+
+@app.route('/frames/<int:diagnostic_id>', methods=['GET'])
+def get_waveform_frame(diagnostic_id):
+    """
+    Récupérer une fenêtre ou une période en trames binaires (voir waveform_frame.FRAME_HEADER)
+    
+    Paramètres : window (ID de fenêtre, created_at optionnel) ou since/until (période,
+    recouvrements retirés) ; encoding 'delta' (défaut) ou 'int16'. Une période renvoie une trame
+    par segment continu (X-Frame-Count) : nouvelle session ou fenêtres absentes ouvrent une trame.
+    Les fenêtres enregistrées ne changent plus : l'ETag dépend des fenêtres réunies et de
+    l'encodage, et est vérifié avant toute lecture des échantillons.
+    """
+    encoding = request.args.get('encoding', 'delta')
+    if encoding not in FRAME_ENCODINGS:
+        return jsonify({'error': f'encoding must be one of {sorted(FRAME_ENCODINGS)}'}), 400
+    
+    try:
+        window_id = request.args.get('window', type=int)
+        created_at = _parse_datetime_arg('created_at')
+        since = _parse_datetime_arg('since')
+        until = _parse_datetime_arg('until')
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}', 'diagnostic_id': diagnostic_id}), 400
+    
+    if window_id is None and since is None:
+        return jsonify({'error': 'window or since is required', 'diagnostic_id': diagnostic_id}), 400
+    
+    try:
+        if window_id is not None:
+            etag = f'w{window_id}-{encoding}-{FRAME_VERSION}'
+            headers = {'Cache-Control': 'private, max-age=86400, immutable', 'X-Window-Count': '1'}
+            
+            if etag in request.if_none_match:
+                response = Response(status=304, headers=headers)
+                response.set_etag(etag)
+                return response
+            
+            window = db_manager.get_window_samples(diagnostic_id, window_id, created_at=created_at)
+            windows = [(window['id'], window['first_sample_index'], window['sample_rate'],
+                        window['samples_blob'], window['image_created_at'])] if window else []
+        else:
+            # Une période ouverte peut encore s'allonger : revalidation à chaque affichage
+            headers = {'Cache-Control': 'private, no-cache'}
+            
+            window_ids = db_manager.get_recording_window_ids(diagnostic_id, since, until,
+                                                             limit=FRAME_MAX_WINDOWS + 1)
+            if len(window_ids) > FRAME_MAX_WINDOWS:
+                return jsonify({
+                    'error': f'Period longer than {FRAME_MAX_WINDOWS} windows',
+                    'diagnostic_id': diagnostic_id
+                }), 400
+            
+            etag = _period_etag(window_ids, encoding)
+            if window_ids and etag in request.if_none_match:
+                headers['X-Window-Count'] = str(len(window_ids))
+                response = Response(status=304, headers=headers)
+                response.set_etag(etag)
+                return response
+            
+            windows = db_manager.get_recording_windows(diagnostic_id, since, until, limit=FRAME_MAX_WINDOWS)
+            # Des fenêtres ont pu s'ajouter depuis la liste : l'ETag suit ce qui est renvoyé
+            etag = _period_etag((row[0] for row in windows), encoding)
+        
+        if not windows:
+            return jsonify({
+                'error': 'No samples for this window or period',
+                'diagnostic_id': diagnostic_id
+            }), 404
+        
+        frames = encode_window_frames((row[1:] for row in windows), encoding)
+        headers['X-Window-Count'] = str(len(windows))
+        headers['X-Frame-Count'] = str(len(frames))
+        
+        response = Response(b''.join(frames), mimetype='application/octet-stream', headers=headers)
+        response.set_etag(etag)
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error getting waveform frame: {e}")
+        return jsonify({
+            'error': str(e),
+            'diagnostic_id': diagnostic_id
+        }), 500
+
+@app.route('/summary/<int:diagnostic_id>', methods=['GET'])
+def get_diagnostic_summary(diagnostic_id):
+    """Récupérer le résumé des captures d'un diagnostic"""
+    try:
+        summary = db_manager.get_diagnostic_summary(diagnostic_id)
+        
+        if summary is None:
+            return jsonify({
+                'error': 'No capture recorded for this diagnostic',
+                'diagnostic_id': diagnostic_id
+            }), 404
+        
+        return jsonify(summary)
+        
+    except Exception as e:
+        logger.error(f"Error getting diagnostic summary: {e}")
+        return jsonify({
+            'error': str(e),
+            'diagnostic_id': diagnostic_id
+        }), 500
+
+@app.route('/summaries', methods=['GET'])
+def get_diagnostic_summaries():
+    """Récupérer les résumés de plusieurs diagnostics (paramètre ids séparés par des virgules)"""
+    try:
+        diagnostic_ids = [int(value) for value in request.args.get('ids', '').split(',') if value]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    
+    try:
+        summaries = db_manager.get_diagnostic_summaries(diagnostic_ids)
+        
+        return jsonify({
+            'summaries': {str(diagnostic_id): summary for diagnostic_id, summary in summaries.items()}
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting diagnostic summaries: {e}")
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+def _parse_feature_cursor(value: str):
+    """
+    Lire un curseur de recherche par caractéristiques
+    
+    Args:
+        value: next_cursor d'une page précédente ('<image_created_at ISO 8601>,<ecg_data_id>')
+        
+    Returns:
+        tuple: (image_created_at, ecg_data_id), None si absent
+        
+    Raises:
+        ValueError: Curseur mal formé
+    """
+    if not value:
+        return None
+    
+    created_at, separator, window_id = value.rpartition(',')
+    if not separator:
+        raise ValueError(f"cursor must be '<created_at>,<id>': {value!r}")
+    
+    return datetime.fromisoformat(created_at), int(window_id)
+
+def _format_feature_cursor(window: dict) -> str:
+    """Curseur reprenant après une fenêtre (voir _parse_feature_cursor)"""
+    return f"{window['image_created_at']},{window['ecg_data_id']}"
+
+@app.route('/features', methods=['GET'])
+def search_window_features():
+    """
+    Rechercher des fenêtres par caractéristiques
+    
+    Paramètres : <caractéristique>_min / <caractéristique>_max (heart_rate, rr_sdnn, noise_score...),
+    match=any pour combiner les filtres par OU, diagnostic_ids, since, until, limit,
+    cursor (next_cursor de la page précédente).
+    """
+    try:
+        filters = {}
+        for column in WINDOW_FEATURE_COLUMNS:
+            minimum = request.args.get(f'{column}_min', type=float)
+            maximum = request.args.get(f'{column}_max', type=float)
+            if minimum is not None or maximum is not None:
+                filters[column] = (minimum, maximum)
+        
+        diagnostic_ids = [int(value) for value in request.args.get('diagnostic_ids', '').split(',') if value]
+        since = _parse_datetime_arg('since')
+        until = _parse_datetime_arg('until')
+        limit = min(max(request.args.get('limit', 100, type=int), 1), FEATURE_SEARCH_MAX)
+        after = _parse_feature_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    
+    try:
+        # Une fenêtre de plus que demandé : indique s'il reste une page
+        windows = db_manager.search_window_features(
+            filters, match_any=request.args.get('match') == 'any', since=since, until=until,
+            diagnostic_ids=diagnostic_ids, after=after, limit=limit + 1
+        )
+        
+        next_cursor = None
+        if len(windows) > limit:
+            windows = windows[:limit]
+            next_cursor = _format_feature_cursor(windows[-1])
+        
+        return jsonify({
+            'windows': windows,
+            'count': len(windows),
+            'next_cursor': next_cursor
+        })
+        
+    except Exception as e:
+        logger.error(f"Error searching window features: {e}")
+        return jsonify({
+            'error': str(e)
+        }), 500
+
 @app.route('/capture/cleanup', methods=['POST'])
 def cleanup_processes():
     """Nettoyer tous les processus de capture"""
@@ -185,6 +841,64 @@ def cleanup_processes():
             'error': str(e)
         }), 500
 
+@app.route('/storage/migrate', methods=['POST'])
+def migrate_blobs():
+    """Déplacer des images de MySQL vers le stockage disque"""
+    try:
+        data = request.get_json(silent=True) or {}
+        older_than_days = data.get('older_than_days')
+        batch_size = int(data.get('batch_size', 100))
+        
+        migrated = db_manager.migrate_blobs_to_store(
+            older_than_days=int(older_than_days) if older_than_days is not None else None,
+            batch_size=batch_size
+        )
+        
+        return jsonify({
+            'message': 'Migration batch completed',
+            'images_migrated': migrated
+        })
+        
+    except Exception as e:
+        logger.error(f"Error migrating blobs: {e}")
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+@app.route('/storage/partitions', methods=['GET'])
+def list_partitions():
+    """Lister les partitions mensuelles de ecg_data"""
+    partitions = db_manager.get_ecg_partitions()
+    
+    for partition in partitions:
+        if partition['upper_bound']:
+            partition['upper_bound'] = partition['upper_bound'].isoformat()
+    
+    return jsonify({
+        'partitioned': bool(partitions),
+        'retention_months': partition_worker.retention_months,
+        'partitions': partitions
+    })
+
+@app.route('/storage/partitions', methods=['POST'])
+def maintain_partitions():
+    """Créer les partitions à venir et supprimer les partitions expirées"""
+    try:
+        result = partition_worker.run_once()
+        
+        return jsonify({
+            'message': 'Partition maintenance completed',
+            'partitions_created': result['created'],
+            'partitions_dropped': result['dropped'],
+            'orphans_deleted': result['orphans']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error maintaining partitions: {e}")
+        return jsonify({
+            'error': str(e)
+        }), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -199,10 +913,24 @@ if __name__ == '__main__':
     # Nettoyer les processus au démarrage
     process_manager.cleanup_all()
     
+    # Reprendre les fenêtres restées dans les spools
+    process_manager.drain_orphan_spools(db_manager)
+    
+    # Démarrer la migration des anciennes images
+    if blob_migration_worker:
+        blob_migration_worker.start()
+    
+    # Partitions mensuelles à venir et rétention
+    partition_worker.start()
+    
+    # Surveiller les nœuds de capture
+    node_registry.refresh()
+    node_registry.start()
+    
     # Démarrer le serveur Flask
     app.run(
         host='0.0.0.0',
-        port=5000,
+        port=int(os.getenv('ECG_SERVICE_PORT', 5000)),
         debug=False,
         threaded=True
     ) 
\ No newline at end of file
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Fédération des nœuds de capture ECG
+Registre des nœuds, placement des sessions et relais des requêtes vers le nœud propriétaire
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# En-tête marquant une requête déjà relayée (traitée localement par le nœud qui la reçoit)
+FORWARDED_HEADER = 'X-ECG-Forwarded'
+
+class Node:
+    """Nœud de capture connu du registre"""
+
+    def __init__(self, name: str, url: str, is_local: bool = False):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.is_local = is_local
+        self.healthy = is_local
+        self.captures_running = 0
+        self.capacity = None
+        self.last_seen = None
+        self.last_error = None
+
+    @property
+    def load(self) -> float:
+        """Charge relative du nœud (captures / capacité)"""
+        if not self.capacity:
+            return float(self.captures_running)
+        return self.captures_running / self.capacity
+
+    @property
+    def has_capacity(self) -> bool:
+        return not self.capacity or self.captures_running < self.capacity
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'url': self.url,
+            'local': self.is_local,
+            'healthy': self.healthy,
+            'captures_running': self.captures_running,
+            'capacity': self.capacity,
+            'load': self.load,
+            'last_seen': self.last_seen,
+            'last_error': self.last_error
+        }
+
+class NodeRegistry:
+    """Registre des nœuds et routage des sessions"""
+
+    def __init__(self, local_name: str = None, nodes: str = None, timeout: float = 5.0,
+                 health_interval: float = 5.0, unowned_ttl: float = None):
+        """
+        Initialiser le registre
+
+        Args:
+            local_name: Nom du nœud courant (ECG_NODE_NAME)
+            nodes: Liste 'nom=url,nom=url' (ECG_NODES)
+            timeout: Délai des requêtes vers les nœuds
+            health_interval: Période de vérification de santé en secondes
+            unowned_ttl: Durée en secondes pendant laquelle un diagnostic sans capture distante
+                         n'est pas recherché à nouveau (ECG_UNOWNED_TTL, 10 par défaut)
+        """
+        self.local_name = local_name or os.getenv('ECG_NODE_NAME', 'local')
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.unowned_ttl = unowned_ttl if unowned_ttl is not None else float(os.getenv('ECG_UNOWNED_TTL', 10))
+        self.nodes: Dict[str, Node] = {}
+        self.assignments: Dict[int, str] = {}
+        # Diagnostics sans capture distante connue : échéance de la prochaine recherche
+        self.unowned: Dict[int, float] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.session = requests.Session()
+
+        for entry in filter(None, (nodes if nodes is not None else os.getenv('ECG_NODES', '')).split(',')):
+            name, _, url = entry.strip().partition('=')
+            self.register(name, url)
+
+    @property
+    def enabled(self) -> bool:
+        """La fédération est active dès qu'un nœud distant est déclaré"""
+        return any(not node.is_local for node in self.nodes.values())
+
+    def register(self, name: str, url: str) -> Node:
+        """
+        Ajouter ou mettre à jour un nœud
+
+        Args:
+            name: Nom du nœud
+            url: URL de base du service du nœud
+
+        Returns:
+            Node: Nœud enregistré
+        """
+        with self.lock:
+            node = Node(name, url, is_local=(name == self.local_name))
+            self.nodes[name] = node
+            logger.info(f"Registered capture node {name} at {url}")
+            return node
+
+    def unregister(self, name: str) -> bool:
+        with self.lock:
+            if self.nodes.pop(name, None) is None:
+                return False
+
+            # Les sessions du nœud retiré seront recherchées à nouveau
+            for diagnostic_id in [d for d, owner in self.assignments.items() if owner == name]:
+                del self.assignments[diagnostic_id]
+            return True
+
+    def update_local(self, captures_running: int, capacity: int):
+        """Mettre à jour la charge du nœud courant sans requête HTTP"""
+        node = self.nodes.get(self.local_name)
+        if node:
+            node.captures_running = captures_running
+            node.capacity = capacity
+            node.healthy = True
+            node.last_seen = time.time()
+
+    def start(self):
+        """Démarrer la vérification périodique de santé"""
+        if self.thread or not self.enabled:
+            return
+
+        self.thread = threading.Thread(target=self._poll_health, name='node-health', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _poll_health(self):
+        """Boucle de vérification de santé des nœuds distants"""
+        while not self.stop_event.is_set():
+            self.refresh()
+            self.stop_event.wait(self.health_interval)
+
+    def refresh(self):
+        """Interroger /health sur tous les nœuds distants en parallèle"""
+        remote = [node for node in list(self.nodes.values()) if not node.is_local]
+        if not remote:
+            return
+
+        with ThreadPoolExecutor(max_workers=len(remote)) as pool:
+            list(pool.map(self._check_node, remote))
+
+    def _check_node(self, node: Node):
+        """Mettre à jour l'état d'un nœud depuis son /health"""
+        try:
+            response = self.session.get(f'{node.url}/health', headers={FORWARDED_HEADER: '1'},
+                                        timeout=self.timeout)
+            data = response.json()
+            node.healthy = response.status_code == 200 and data.get('status') == 'healthy'
+            node.captures_running = data.get('captures_running', 0)
+            node.capacity = data.get('capacity')
+            node.last_seen = time.time()
+            node.last_error = None if node.healthy else data.get('error')
+        except Exception as e:
+            node.healthy = False
+            node.last_error = str(e)
+
+    def healthy_nodes(self) -> List[Node]:
+        return [node for node in self.nodes.values() if node.healthy]
+
+    def place(self, diagnostic_id: int) -> Optional[Node]:
+        """
+        Choisir le nœud d'une nouvelle session (le moins chargé)
+
+        Args:
+            diagnostic_id: ID du diagnostic
+
+        Returns:
+            Node: Nœud choisi, None si aucun nœud disponible
+        """
+        with self.lock:
+            owner = self.nodes.get(self.assignments.get(diagnostic_id))
+            if owner and owner.healthy:
+                return owner
+
+            candidates = [node for node in self.nodes.values() if node.healthy and node.has_capacity]
+            if not candidates:
+                return None
+
+            node = min(candidates, key=lambda n: (n.load, not n.is_local, n.name))
+
+            # Compter la session tout de suite pour ne pas surcharger le nœud avant le prochain /health
+            node.captures_running += 1
+            return node
+
+    def cancel_placement(self, diagnostic_id: int, node: Node):
+        """
+        Annuler le décompte anticipé de place() quand le démarrage échoue
+
+        Args:
+            diagnostic_id: ID du diagnostic
+            node: Nœud renvoyé par place()
+        """
+        with self.lock:
+            # Propriétaire déjà assigné : place() l'a renvoyé sans compter de session
+            if self.assignments.get(diagnostic_id) != node.name:
+                node.captures_running = max(node.captures_running - 1, 0)
+
+    def assign(self, diagnostic_id: int, node: Node):
+        with self.lock:
+            self.assignments[diagnostic_id] = node.name
+            self.unowned.pop(diagnostic_id, None)
+
+    def unassign(self, diagnostic_id: int):
+        """Oublier le nœud d'une session arrêtée ou injoignable"""
+        with self.lock:
+            self.assignments.pop(diagnostic_id, None)
+            self.unowned.pop(diagnostic_id, None)
+
+    def owner(self, diagnostic_id: int) -> Optional[Node]:
+        """
+        Trouver le nœud propriétaire d'une session
+
+        Interroge les nœuds en parallèle si la session n'a pas été placée par ce
+        routeur (redémarrage, autre point d'entrée). Un diagnostic trouvé sur aucun
+        nœud n'est pas recherché à nouveau avant unowned_ttl secondes : le suivi
+        d'un diagnostic sans capture ne coûte pas une requête par nœud à chaque appel.
+
+        Args:
+            diagnostic_id: ID du diagnostic
+
+        Returns:
+            Node: Nœud propriétaire, None si aucune capture connue
+        """
+        node = self.nodes.get(self.assignments.get(diagnostic_id))
+        if node:
+            return node
+
+        if self.unowned.get(diagnostic_id, 0) > time.monotonic():
+            return None
+
+        remote = [node for node in self.healthy_nodes() if not node.is_local]
+        if remote:
+            with ThreadPoolExecutor(max_workers=len(remote)) as pool:
+                running = list(pool.map(lambda n: self._is_running_on(n, diagnostic_id), remote))
+
+            for node, is_running in zip(remote, running):
+                if is_running:
+                    self.assign(diagnostic_id, node)
+                    return node
+
+        with self.lock:
+            self.unowned[diagnostic_id] = time.monotonic() + self.unowned_ttl
+            # Entrées échues : la table reste bornée aux diagnostics suivis récemment
+            now = time.monotonic()
+            for expired in [d for d, deadline in self.unowned.items() if deadline <= now]:
+                del self.unowned[expired]
+
+        return None
+
+    def _is_running_on(self, node: Node, diagnostic_id: int) -> bool:
+        """Vérifier si un nœud distant capture un diagnostic"""
+        try:
+            response = self.session.get(f'{node.url}/capture/status/{diagnostic_id}',
+                                        headers={FORWARDED_HEADER: '1'}, timeout=self.timeout)
+            return response.status_code == 200 and bool(response.json().get('is_running'))
+        except Exception as e:
+            logger.debug(f"Could not query node {node.name}: {e}")
+            return False
+
+    def forward(self, node: Node, method: str, path: str, body: bytes = None,
+                content_type: str = None) -> requests.Response:
+        """
+        Relayer une requête vers un nœud
+
+        Args:
+            node: Nœud cible
+            method: Méthode HTTP
+            path: Chemin et chaîne de requête
+            body: Corps de la requête
+            content_type: Type du corps
+
+        Returns:
+            requests.Response: Réponse du nœud
+        """
+        headers = {FORWARDED_HEADER: '1'}
+        if content_type:
+            headers['Content-Type'] = content_type
+
+        return self.session.request(method, f'{node.url}{path}', data=body, headers=headers,
+                                    timeout=self.timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        État agrégé de la fédération
+
+        Returns:
+            dict: Statut global ('healthy', 'degraded', 'unhealthy') et détail des nœuds
+        """
+        nodes = [node.to_dict() for node in self.nodes.values()]
+        healthy = sum(1 for node in nodes if node['healthy'])
+
+        if healthy == len(nodes):
+            overall = 'healthy'
+        elif healthy:
+            overall = 'degraded'
+        else:
+            overall = 'unhealthy'
+
+        return {
+            'status': overall,
+            'nodes_total': len(nodes),
+            'nodes_healthy': healthy,
+            'captures_running': sum(node['captures_running'] for node in nodes),
+            'nodes': nodes,
+            'assignments': dict(self.assignments)
+        }
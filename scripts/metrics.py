@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Métriques du service ECG
+Compteurs, jauges et histogrammes exposés au format texte Prometheus
+"""
+
+import bisect
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Tuple, Any
+
+# Bornes par défaut des histogrammes de durée (secondes)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Metric:
+    """Base commune des métriques"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Construire la clé des labels dans l'ordre déclaré"""
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Dict[str, str] = None) -> str:
+        """Formater les labels pour l'exposition texte"""
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.extend(extra.items())
+        if not pairs:
+            return ''
+        escaped = (v.replace('\\', '\\\\').replace('"', '\\"') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def remove(self, **labels):
+        """Supprimer une série"""
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def snapshot(self, reset: bool = False) -> Dict[Tuple[str, ...], Any]:
+        """
+        Copier les valeurs courantes
+
+        Args:
+            reset: Remettre les valeurs à zéro après la copie
+        """
+        with self._lock:
+            values = {key: self._copy(value) for key, value in self._values.items()}
+            if reset:
+                self._values.clear()
+            return values
+
+    def _copy(self, value):
+        return value
+
+    def render(self) -> List[str]:
+        """Générer les lignes d'exposition texte"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for key, value in sorted(self.snapshot().items()):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value) -> List[str]:
+        return [f'{self.name}{self._format_labels(key)} {value}']
+
+class Counter(_Metric):
+    """Compteur monotone"""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, values: Dict[Tuple[str, ...], float]):
+        """Ajouter des valeurs reçues d'un processus enfant"""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+class Gauge(_Metric):
+    """Valeur instantanée"""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def merge(self, values: Dict[Tuple[str, ...], float]):
+        """Remplacer par les valeurs reçues d'un processus enfant"""
+        with self._lock:
+            self._values.update(values)
+
+class Histogram(_Metric):
+    """Histogramme à bornes fixes"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _empty(self) -> list:
+        # [compteurs par borne (+Inf inclus), somme, nombre]
+        return [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = self._empty()
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Mesurer la durée d'un bloc `with`"""
+        return _Timer(self, labels)
+
+    def merge(self, values: Dict[Tuple[str, ...], list]):
+        """Ajouter des observations reçues d'un processus enfant"""
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                entry = self._values.get(key)
+                if entry is None:
+                    entry = self._values[key] = self._empty()
+                for i, c in enumerate(counts):
+                    entry[0][i] += c
+                entry[1] += total
+                entry[2] += count
+
+    def _render_value(self, key, value) -> List[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, c in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += c
+            le = bound if bound == '+Inf' else repr(float(bound))
+            lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": le})} {cumulative}')
+        lines.append(f'{self.name}_sum{self._format_labels(key)} {total}')
+        lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+class _Timer:
+    """Contexte de mesure de durée pour un histogramme"""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class MetricsRegistry:
+    """Registre des métriques d'un processus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect_deltas(self) -> Dict[str, Dict]:
+        """
+        Extraire les valeurs accumulées et remettre le registre à zéro
+
+        Utilisé par les processus de capture pour envoyer leurs métriques au parent.
+
+        Returns:
+            dict: Valeurs par nom de métrique
+        """
+        return {name: metric.snapshot(reset=True) for name, metric in self._metrics.items()}
+
+    def reset(self):
+        """Remettre toutes les métriques à zéro (après un fork)"""
+        for metric in self._metrics.values():
+            metric.snapshot(reset=True)
+
+    def merge(self, deltas: Dict[str, Dict]):
+        """Intégrer les valeurs envoyées par un processus enfant"""
+        for name, values in deltas.items():
+            metric = self._metrics.get(name)
+            if metric is not None and values:
+                metric.merge(values)
+
+    def render(self) -> str:
+        """Générer l'exposition texte complète"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Registre global et métriques du service
+REGISTRY = MetricsRegistry()
+
+SAMPLES_TOTAL = REGISTRY.counter(
+    'ecg_samples_total', 'Samples acquired', ('diagnostic_id',))
+MISSED_SAMPLES_TOTAL = REGISTRY.counter(
+    'ecg_missed_samples_total', 'Samples missed because the loop fell behind', ('diagnostic_id',))
+SAMPLE_JITTER = REGISTRY.histogram(
+    'ecg_sample_jitter_seconds', 'Deviation of the sampling interval from the target',
+    ('diagnostic_id',), buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5))
+RENDER_SECONDS = REGISTRY.histogram(
+    'ecg_render_seconds', 'Time to render one window', ('diagnostic_id',))
+IMAGES_SAVED_TOTAL = REGISTRY.counter(
+    'ecg_images_saved_total', 'Windows persisted', ('diagnostic_id',))
+IMAGES_FAILED_TOTAL = REGISTRY.counter(
+    'ecg_images_failed_total', 'Windows that failed to persist', ('diagnostic_id',))
+WINDOWS_SUPPRESSED_TOTAL = REGISTRY.counter(
+    'ecg_windows_suppressed_total', 'Windows not rendered because of poor signal quality',
+    ('diagnostic_id', 'reason'))
+BUFFER_FILL = REGISTRY.gauge(
+    'ecg_buffer_fill_ratio', 'Capture buffer fill ratio', ('diagnostic_id',))
+SPOOL_PENDING = REGISTRY.gauge(
+    'ecg_spool_pending_windows', 'Windows waiting in the disk spool', ('diagnostic_id',))
+SPOOL_DEAD_LETTER_TOTAL = REGISTRY.counter(
+    'ecg_spool_dead_letter_total', 'Spooled windows rejected by the database and set aside',
+    ('diagnostic_id',))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'ecg_db_query_seconds', 'DatabaseManager method latency', ('method',))
+STATS_QUEUE_DEPTH = REGISTRY.gauge(
+    'ecg_stats_queue_depth', 'Pending messages from capture processes')
+CAPTURE_PROCESSES = REGISTRY.gauge(
+    'ecg_capture_processes', 'Running capture processes')
+PROCESS_START_SECONDS = REGISTRY.histogram(
+    'ecg_process_start_seconds', 'Capture process start latency')
+PROCESS_STOP_SECONDS = REGISTRY.histogram(
+    'ecg_process_stop_seconds', 'Capture process stop latency')
+
+def timed_query(method):
+    """Décorateur mesurant la latence d'une méthode de DatabaseManager"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with DB_QUERY_SECONDS.time(method=method.__name__):
+            return method(*args, **kwargs)
+    return wrapper
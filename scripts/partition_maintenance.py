@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Maintenance des partitions de ecg_data
+Création des partitions mensuelles à venir, suppression des mois expirés
+et des fenêtres des diagnostics supprimés
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+from database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+class PartitionMaintenanceWorker:
+    """Tâche de fond maintenant les partitions mensuelles de ecg_data"""
+
+    def __init__(self, db_manager, months_ahead: int = 3, retention_months: Optional[int] = None,
+                 interval: int = 86400):
+        """
+        Initialiser la tâche de maintenance
+
+        Args:
+            db_manager: Gestionnaire de base de données
+            months_ahead: Nombre de mois futurs à préparer
+            retention_months: Mois complets conservés (None pour tout conserver)
+            interval: Délai entre deux passes en secondes
+        """
+        self.db_manager = db_manager
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Démarrer la tâche en arrière-plan"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='partition-maintenance', daemon=True)
+        self.thread.start()
+        logger.info(f"Partition maintenance worker started (months_ahead={self.months_ahead}, "
+                    f"retention_months={self.retention_months})")
+
+    def stop(self):
+        """Arrêter la tâche"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Créer les partitions manquantes, supprimer les partitions expirées
+        puis les fenêtres des diagnostics supprimés (sans clé étrangère sur ecg_data)
+
+        Returns:
+            dict: Partitions créées et supprimées, lignes orphelines supprimées
+        """
+        created = self.db_manager.ensure_ecg_partitions(self.months_ahead)
+        dropped = []
+
+        if self.retention_months is not None:
+            dropped = self.db_manager.drop_expired_ecg_partitions(self.retention_months)
+
+        orphans = self.db_manager.delete_orphan_ecg_data()
+
+        return {'created': created, 'dropped': dropped, 'orphans': orphans}
+
+    def _run(self):
+        """Boucle de la tâche de fond"""
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in partition maintenance worker: {e}")
+
+            self.stop_event.wait(self.interval)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    retention = os.getenv('ECG_RETENTION_MONTHS')
+
+    parser = argparse.ArgumentParser(description='ecg_data partition maintenance')
+    parser.add_argument('--months-ahead', type=int, default=int(os.getenv('ECG_PARTITION_MONTHS_AHEAD', 3)),
+                        help='Future monthly partitions to create')
+    parser.add_argument('--retention-months', type=int, default=int(retention) if retention else None,
+                        help='Full months kept before the current one (default: keep everything)')
+    parser.add_argument('--list', action='store_true', help='Only list the partitions')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager()
+
+    if not args.list:
+        result = PartitionMaintenanceWorker(db_manager, args.months_ahead, args.retention_months).run_once()
+        print(f"Created: {', '.join(result['created']) or '-'}")
+        print(f"Dropped: {', '.join(result['dropped']) or '-'}")
+        print(f"Orphan windows deleted: {result['orphans']['windows']} "
+              f"({result['orphans']['diagnostics']} removed diagnostics)")
+
+    partitions = db_manager.get_ecg_partitions()
+    if not partitions:
+        print('ecg_data is not partitioned')
+        return 1
+
+    for partition in partitions:
+        bound = partition['upper_bound'].date() if partition['upper_bound'] else 'MAXVALUE'
+        print(f"{partition['name']:12s} < {bound!s:10s} {partition['rows']:>12} rows")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,52 +10,195 @@ import time
 import logging
 import signal
 import os
-from typing import Dict, Optional
+import queue
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
 from ecg_capture import ECGCapture
+from capture_profile import CaptureProfile
+from window_spool import WindowSpool, SpoolReplayer
+from metrics import REGISTRY, STATS_QUEUE_DEPTH, CAPTURE_PROCESSES, PROCESS_START_SECONDS, PROCESS_STOP_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# Attente maximale de la fin d'une écriture d'un vidage orphelin avant une reprise de capture
+ORPHAN_STOP_TIMEOUT = 30.0
+
+# Profilages conservés par diagnostic à la fin d'une session (les fichiers restent sur disque)
+PROFILE_HISTORY = 10
+
 class ECGProcessManager:
     """Gestionnaire des processus de capture ECG"""
     
-    def __init__(self):
+    def __init__(self, db_manager=None):
         self.processes: Dict[int, multiprocessing.Process] = {}
         self.stop_events: Dict[int, multiprocessing.Event] = {}
+        self.control_queues: Dict[int, multiprocessing.Queue] = {}
+        
+        # self.lock protège uniquement les dictionnaires (jamais tenu pendant une attente) ;
+        # les démarrages et arrêts d'un même diagnostic sont sérialisés par son propre verrou
         self.lock = threading.Lock()
+        self.diagnostic_locks: Dict[int, threading.Lock] = {}
+        
+        # Arrêts en cours, terminés en arrière-plan
+        self.stop_threads: Dict[int, threading.Thread] = {}
+        
+        # Profilages demandés, par nom de fichier
+        self.profile_dir = os.getenv('PROFILE_DIR', '/tmp/ecg_profiles')
+        self.profiles: Dict[str, dict] = {}
+        # Mis à jour par le thread des statistiques pendant les lectures des requêtes
+        self.profiles_lock = threading.Lock()
+        
+        # Écritures en base remontées par les processus de capture (qualité du signal)
+        self.db_manager = db_manager
+        
+        # État en direct remonté par les processus de capture
+        self.live_stats: Dict[int, dict] = {}
+        self.stats_lock = threading.Lock()
+        # Vidages des spools orphelins, par répertoire de spool
+        self.spool_replayers: Dict[str, SpoolReplayer] = {}
+        
+        # File de remontée des statistiques des processus de capture
+        self.stats_queue = multiprocessing.Queue()
+        self.stats_thread = threading.Thread(target=self._consume_stats, name='capture-stats', daemon=True)
+        self.stats_thread.start()
+        
+    def _consume_stats(self):
+        """Recevoir en continu les messages des processus de capture"""
+        while True:
+            try:
+                message = self.stats_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            
+            try:
+                self._handle_stats_message(message)
+            except Exception as e:
+                logger.error(f"Error handling stats message: {e}")
+    
+    def _handle_stats_message(self, message: tuple):
+        """
+        Traiter un message reçu d'un processus de capture
+        
+        Args:
+            message: Tuple (type, diagnostic_id, contenu)
+        """
+        kind, diagnostic_id, payload = message
+        
+        if kind == 'metrics':
+            REGISTRY.merge(payload)
+        elif kind == 'stats':
+            with self.stats_lock:
+                self.live_stats.setdefault(diagnostic_id, {}).update(payload)
+        elif kind == 'replay':
+            # Bilan de fin de rejeu : le processus s'arrête de lui-même en fin d'enregistrement
+            with self.stats_lock:
+                live = self.live_stats.setdefault(diagnostic_id, {})
+                live.update(replay=payload, status='stopped', stopped_at=datetime.now().isoformat())
+        elif kind == 'signal':
+            # Qualité du signal : écrite ici plutôt que dans la boucle d'acquisition
+            if self.db_manager is not None:
+                self.db_manager.update_signal_quality(diagnostic_id, **payload)
+        elif kind == 'profile':
+            name = os.path.basename(payload['path'])
+            with self.profiles_lock:
+                if name in self.profiles:
+                    self.profiles[name].update(status=payload['status'], error=payload.get('error'))
+    
+    def _diagnostic_lock(self, diagnostic_id: int) -> threading.Lock:
+        """
+        Verrou propre à un diagnostic
         
-    def start_capture(self, diagnostic_id: int) -> bool:
+        Args:
+            diagnostic_id: ID du diagnostic
+            
+        Returns:
+            threading.Lock: Verrou du diagnostic
+        """
+        with self.lock:
+            return self.diagnostic_locks.setdefault(diagnostic_id, threading.Lock())
+    
+    def update_gauges(self):
+        """Mettre à jour les jauges du gestionnaire avant exposition"""
+        try:
+            STATS_QUEUE_DEPTH.set(self.stats_queue.qsize())
+        except NotImplementedError:
+            pass
+        
+        CAPTURE_PROCESSES.set(len(self.get_running_processes()))
+        
+    def start_capture(self, diagnostic_id: int, profile: CaptureProfile = None,
+                      replay: dict = None) -> bool:
         """
         Démarrer une capture ECG pour un diagnostic
         
         Args:
             diagnostic_id: ID du diagnostic
+            profile: Profil de capture (préréglage 'diagnostic' par défaut)
+            replay: Rejeu d'un enregistrement au lieu du capteur (voir replay.ReplayCapture)
             
         Returns:
             bool: True si démarré avec succès
         """
-        with self.lock:
+        with self._diagnostic_lock(diagnostic_id):
+            # Laisser se terminer un arrêt en cours (seul ce diagnostic attend)
+            self._wait_for_stop(diagnostic_id)
+            
             try:
-                # Vérifier si déjà en cours
-                if diagnostic_id in self.processes:
-                    if self.processes[diagnostic_id].is_alive():
-                        logger.warning(f"Capture already running for diagnostic {diagnostic_id}")
-                        return False
-                    else:
-                        # Nettoyer le processus mort
-                        self._cleanup_process(diagnostic_id)
+                start = time.perf_counter()
+                
+                with self.lock:
+                    # Vérifier si déjà en cours
+                    if diagnostic_id in self.processes:
+                        if self.processes[diagnostic_id].is_alive():
+                            logger.warning(f"Capture already running for diagnostic {diagnostic_id}")
+                            return False
+                        else:
+                            # Nettoyer le processus mort
+                            self._cleanup_process(diagnostic_id)
+                
+                # Le spool du diagnostic revient au lecteur de la nouvelle capture
+                self._stop_orphan_replayer(diagnostic_id)
                 
                 # Créer un événement d'arrêt
                 stop_event = multiprocessing.Event()
-                self.stop_events[diagnostic_id] = stop_event
+                
+                # Créer la file de commandes
+                control_queue = multiprocessing.Queue()
+                
+                # Rejeu sans profil : fréquence de l'enregistrement, déterminée dans le processus
+                if replay is None:
+                    profile = profile or CaptureProfile.from_dict()
                 
                 # Créer et démarrer le processus
                 process = multiprocessing.Process(
                     target=self._run_capture,
-                    args=(diagnostic_id, stop_event)
+                    args=(diagnostic_id, stop_event, self.stats_queue, control_queue, profile, replay)
                 )
                 
                 process.start()
-                self.processes[diagnostic_id] = process
+                
+                with self.lock:
+                    self.processes[diagnostic_id] = process
+                    self.stop_events[diagnostic_id] = stop_event
+                    self.control_queues[diagnostic_id] = control_queue
+                
+                PROCESS_START_SECONDS.observe(time.perf_counter() - start)
+                
+                self._set_live_state(
+                    diagnostic_id,
+                    status='running',
+                    started_at=datetime.now().isoformat(),
+                    stopped_at=None,
+                    sample_count=0,
+                    save_count=0,
+                    last_error=None,
+                    rate=0.0,
+                    buffer_fill=0.0,
+                    profile=profile.to_dict() if profile else None,
+                    replay=dict(replay, status='running') if replay is not None else None
+                )
                 
                 logger.info(f"Started capture process for diagnostic {diagnostic_id} (PID: {process.pid})")
                 return True
@@ -64,56 +207,136 @@ class ECGProcessManager:
                 logger.error(f"Failed to start capture for diagnostic {diagnostic_id}: {e}")
                 return False
     
-    def stop_capture(self, diagnostic_id: int) -> bool:
+    def stop_capture(self, diagnostic_id: int, wait: bool = False,
+                     on_stopped: Callable[[], None] = None) -> bool:
         """
         Arrêter une capture ECG
         
+        L'arrêt est signalé immédiatement (état 'stopping') puis terminé en arrière-plan :
+        attente de l'arrêt gracieux, puis terminate et kill si nécessaire.
+        
         Args:
             diagnostic_id: ID du diagnostic
+            wait: Attendre la fin de l'arrêt
+            on_stopped: Fonction appelée une fois le processus arrêté
             
         Returns:
-            bool: True si arrêté avec succès
+            bool: True si l'arrêt est engagé (ou déjà en cours)
         """
-        with self.lock:
+        with self._diagnostic_lock(diagnostic_id):
             try:
-                if diagnostic_id not in self.processes:
-                    logger.warning(f"No capture process found for diagnostic {diagnostic_id}")
-                    return False
-                
-                process = self.processes[diagnostic_id]
-                
-                if not process.is_alive():
-                    logger.warning(f"Process for diagnostic {diagnostic_id} is already dead")
-                    self._cleanup_process(diagnostic_id)
-                    return True
-                
-                # Signaler l'arrêt
-                if diagnostic_id in self.stop_events:
-                    self.stop_events[diagnostic_id].set()
-                
-                # Attendre l'arrêt gracieux
-                process.join(timeout=5)
-                
-                if process.is_alive():
-                    # Forcer l'arrêt si nécessaire
-                    logger.warning(f"Forcing termination of process for diagnostic {diagnostic_id}")
-                    process.terminate()
-                    process.join(timeout=2)
+                with self.lock:
+                    process = self.processes.get(diagnostic_id)
+                    stop_event = self.stop_events.get(diagnostic_id)
+                    thread = self.stop_threads.get(diagnostic_id)
                     
-                    if process.is_alive():
-                        # Dernier recours
-                        logger.error(f"Killing process for diagnostic {diagnostic_id}")
-                        process.kill()
-                        process.join()
+                    if process is None:
+                        logger.warning(f"No capture process found for diagnostic {diagnostic_id}")
+                        return False
+                    
+                    already_dead = thread is None and not process.is_alive()
+                    
+                    if already_dead:
+                        logger.warning(f"Process for diagnostic {diagnostic_id} is already dead")
+                        self._cleanup_process(diagnostic_id)
+                    elif thread is None:
+                        # Signaler l'arrêt
+                        if stop_event:
+                            stop_event.set()
+                        
+                        thread = threading.Thread(
+                            target=self._finish_stop,
+                            args=(diagnostic_id, process, time.perf_counter(), on_stopped),
+                            name=f'capture-stop-{diagnostic_id}',
+                            daemon=True
+                        )
+                        self.stop_threads[diagnostic_id] = thread
+                        self._set_live_state(diagnostic_id, status='stopping')
+                        thread.start()
+                        logger.info(f"Stopping capture process for diagnostic {diagnostic_id}")
+                
+                if already_dead:
+                    if on_stopped:
+                        on_stopped()
+                elif wait:
+                    thread.join()
                 
-                self._cleanup_process(diagnostic_id)
-                logger.info(f"Stopped capture process for diagnostic {diagnostic_id}")
                 return True
                 
             except Exception as e:
                 logger.error(f"Failed to stop capture for diagnostic {diagnostic_id}: {e}")
                 return False
     
+    def _finish_stop(self, diagnostic_id: int, process: multiprocessing.Process, start: float,
+                     on_stopped: Callable[[], None] = None):
+        """
+        Terminer l'arrêt d'un processus de capture (thread d'arrière-plan)
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            process: Processus à arrêter
+            start: Début de l'arrêt (perf_counter)
+            on_stopped: Fonction appelée une fois le processus arrêté
+        """
+        try:
+            # Attendre l'arrêt gracieux
+            process.join(timeout=5)
+            
+            if process.is_alive():
+                # Forcer l'arrêt si nécessaire
+                logger.warning(f"Forcing termination of process for diagnostic {diagnostic_id}")
+                process.terminate()
+                process.join(timeout=2)
+                
+                if process.is_alive():
+                    # Dernier recours
+                    logger.error(f"Killing process for diagnostic {diagnostic_id}")
+                    process.kill()
+                    process.join()
+            
+            with self.lock:
+                if self.processes.get(diagnostic_id) is process:
+                    self._cleanup_process(diagnostic_id)
+            
+            PROCESS_STOP_SECONDS.observe(time.perf_counter() - start)
+            logger.info(f"Stopped capture process for diagnostic {diagnostic_id}")
+            
+            if on_stopped:
+                on_stopped()
+                
+        except Exception as e:
+            logger.error(f"Failed to stop capture for diagnostic {diagnostic_id}: {e}")
+        finally:
+            with self.lock:
+                self.stop_threads.pop(diagnostic_id, None)
+    
+    def _wait_for_stop(self, diagnostic_id: int, timeout: float = None):
+        """
+        Attendre la fin d'un arrêt en cours
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            timeout: Délai maximal en secondes
+        """
+        with self.lock:
+            thread = self.stop_threads.get(diagnostic_id)
+        
+        if thread:
+            thread.join(timeout)
+    
+    def is_stopping(self, diagnostic_id: int) -> bool:
+        """
+        Vérifier si un arrêt est en cours
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            
+        Returns:
+            bool: True si l'arrêt est engagé mais pas terminé
+        """
+        with self.lock:
+            return diagnostic_id in self.stop_threads
+    
     def is_running(self, diagnostic_id: int) -> bool:
         """
         Vérifier si une capture est en cours
@@ -137,6 +360,186 @@ class ECGProcessManager:
             
             return is_alive
     
+    def request_profile(self, diagnostic_id: int, duration: float, mode: str = 'sampling',
+                        interval: float = 0.005) -> Optional[dict]:
+        """
+        Demander le profilage d'un processus de capture en cours
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            duration: Durée en secondes
+            mode: 'sampling' ou 'cprofile'
+            interval: Période d'échantillonnage (mode 'sampling')
+            
+        Returns:
+            dict: Description du profilage, None si aucune capture en cours
+        """
+        with self.lock:
+            process = self.processes.get(diagnostic_id)
+            control_queue = self.control_queues.get(diagnostic_id)
+            
+            if not process or not process.is_alive() or control_queue is None:
+                return None
+            
+            extension = 'prof' if mode == 'cprofile' else 'folded'
+            name = f"diagnostic_{diagnostic_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+            
+            profile = {
+                'name': name,
+                'diagnostic_id': diagnostic_id,
+                'mode': mode,
+                'duration': duration,
+                'requested_at': datetime.now().isoformat(),
+                'status': 'requested',
+                'error': None
+            }
+            with self.profiles_lock:
+                self.profiles[name] = profile
+            
+            control_queue.put(('profile', {
+                'path': os.path.join(self.profile_dir, name),
+                'duration': duration,
+                'mode': mode,
+                'interval': interval
+            }))
+            
+            logger.info(f"Requested {mode} profile of diagnostic {diagnostic_id} for {duration}s")
+            return dict(profile)
+    
+    def get_profiles(self, diagnostic_id: int = None) -> List[dict]:
+        """
+        Lister les profilages demandés
+        
+        Args:
+            diagnostic_id: Filtrer sur un diagnostic
+            
+        Returns:
+            list: Profilages, du plus récent au plus ancien
+        """
+        with self.profiles_lock:
+            profiles = [
+                dict(p) for p in self.profiles.values()
+                if diagnostic_id is None or p['diagnostic_id'] == diagnostic_id
+            ]
+        return sorted(profiles, key=lambda p: p['requested_at'], reverse=True)
+    
+    def _prune_profiles(self, diagnostic_id: int):
+        """
+        Ne garder que les PROFILE_HISTORY profilages les plus récents d'un diagnostic
+        
+        Args:
+            diagnostic_id: ID du diagnostic dont la session se termine
+        """
+        with self.profiles_lock:
+            names = sorted(
+                (name for name, p in self.profiles.items() if p['diagnostic_id'] == diagnostic_id),
+                key=lambda name: self.profiles[name]['requested_at'], reverse=True
+            )
+            for name in names[PROFILE_HISTORY:]:
+                del self.profiles[name]
+    
+    def _set_live_state(self, diagnostic_id: int, **fields):
+        """
+        Mettre à jour l'état en direct d'un diagnostic
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            fields: Champs à mettre à jour
+        """
+        with self.stats_lock:
+            self.live_stats.setdefault(diagnostic_id, {}).update(fields)
+    
+    def seed_live_stats(self, diagnostic_id: int, session: dict):
+        """
+        Initialiser l'état en direct depuis la dernière session connue en base
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            session: Ligne de ecg_capture_sessions
+        """
+        with self.stats_lock:
+            self.live_stats.setdefault(diagnostic_id, {
+                'status': session.get('status'),
+                'started_at': session.get('started_at'),
+                'stopped_at': session.get('stopped_at'),
+                'save_count': session.get('total_images') or 0,
+                'last_error': session.get('last_error'),
+                'profile': session.get('profile'),
+                'signal': {
+                    'issue': session.get('signal_issue'),
+                    'since': session.get('signal_issue_since'),
+                    'events': session.get('signal_events') or 0,
+                    'suppressed_windows': session.get('suppressed_windows') or 0
+                }
+            })
+    
+    def get_live_stats(self, diagnostic_id: int) -> Optional[dict]:
+        """
+        Récupérer l'état en direct d'une capture
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+            
+        Returns:
+            dict: Statut, compteurs, débit, remplissage du buffer et du spool, qualité du signal ; None si inconnu
+        """
+        with self.stats_lock:
+            stats = self.live_stats.get(diagnostic_id)
+            return dict(stats) if stats else None
+    
+    def drain_orphan_spools(self, db_manager) -> int:
+        """
+        Vider en arrière-plan les spools laissés par des captures arrêtées
+        
+        Args:
+            db_manager: Gestionnaire de base de données
+            
+        Returns:
+            int: Nombre de spools pris en charge
+        """
+        spool_dir = ECGCapture.SPOOL_DIR
+        if not os.path.isdir(spool_dir):
+            return 0
+        
+        started = 0
+        for name in os.listdir(spool_dir):
+            spool = WindowSpool(os.path.join(spool_dir, name))
+            if not spool.pending_windows:
+                continue
+            
+            # Vidage ponctuel : le verrou est rendu une fois le spool vide ou à la reprise de la capture
+            replayer = SpoolReplayer(spool, db_manager, exit_when_empty=True)
+            replayer.start()
+            with self.lock:
+                self.spool_replayers[name] = replayer
+            started += 1
+            logger.info(f"Draining {spool.pending_windows} spooled windows from {name}")
+        
+        return started
+    
+    def _stop_orphan_replayer(self, diagnostic_id: int):
+        """
+        Arrêter le vidage orphelin du spool d'un diagnostic avant qu'une capture le reprenne
+        
+        Sans cela, le lecteur de la capture n'obtient pas le verrou du spool : ses fenêtres
+        ne sont jamais comptées et le spool se remplit.
+        
+        Args:
+            diagnostic_id: ID du diagnostic
+        """
+        with self.lock:
+            replayer = self.spool_replayers.pop(f'diagnostic_{diagnostic_id}', None)
+        
+        if replayer is None:
+            return
+        
+        replayer.stop(drain_timeout=0)
+        if replayer.thread and replayer.thread.is_alive():
+            # Écriture en cours : attendre sa fin, le verrou est libéré en sortie de boucle
+            replayer.thread.join(timeout=ORPHAN_STOP_TIMEOUT)
+        replayer.spool.close()
+        logger.info(f"Stopped orphan spool drain for diagnostic {diagnostic_id}")
+    
     def get_running_processes(self) -> Dict[int, dict]:
         """
         Récupérer la liste des processus en cours
@@ -163,40 +566,70 @@ class ECGProcessManager:
         """
         Nettoyer tous les processus
         
+        Les arrêts sont lancés en parallèle puis attendus.
+        
         Returns:
             int: Nombre de processus nettoyés
         """
         with self.lock:
-            cleaned_count = 0
-            
-            for diagnostic_id in list(self.processes.keys()):
-                if self.stop_capture(diagnostic_id):
-                    cleaned_count += 1
-            
-            logger.info(f"Cleaned up {cleaned_count} processes")
-            return cleaned_count
+            diagnostic_ids = list(self.processes.keys())
+        
+        cleaned_count = 0
+        for diagnostic_id in diagnostic_ids:
+            if self.stop_capture(diagnostic_id):
+                cleaned_count += 1
+        
+        for diagnostic_id in diagnostic_ids:
+            self._wait_for_stop(diagnostic_id)
+        
+        logger.info(f"Cleaned up {cleaned_count} processes")
+        return cleaned_count
     
     def _cleanup_process(self, diagnostic_id: int):
-        """Nettoyer les ressources d'un processus"""
+        """Nettoyer les ressources d'un processus (appelé avec self.lock)"""
         if diagnostic_id in self.processes:
-            del self.processes[diagnostic_id]
+            process = self.processes.pop(diagnostic_id)
+            
+            # Transition vers l'état arrêté (ou erreur si le processus a échoué)
+            fields = {'status': 'stopped', 'stopped_at': datetime.now().isoformat(), 'rate': 0.0}
+            if process.exitcode:
+                fields.update(status='error', last_error=f'Capture process exited with code {process.exitcode}')
+            self._set_live_state(diagnostic_id, **fields)
         
         if diagnostic_id in self.stop_events:
             del self.stop_events[diagnostic_id]
+        
+        if diagnostic_id in self.control_queues:
+            del self.control_queues[diagnostic_id]
+        
+        self._prune_profiles(diagnostic_id)
     
-    def _run_capture(self, diagnostic_id: int, stop_event: multiprocessing.Event):
+    def _run_capture(self, diagnostic_id: int, stop_event: multiprocessing.Event,
+                     stats_queue: multiprocessing.Queue, control_queue: multiprocessing.Queue,
+                     profile: CaptureProfile, replay: dict = None):
         """
         Fonction exécutée dans le processus de capture
         
         Args:
             diagnostic_id: ID du diagnostic
             stop_event: Événement d'arrêt
+            stats_queue: File de remontée des statistiques
+            control_queue: File de commandes du parent
+            profile: Profil de capture
+            replay: Rejeu d'un enregistrement (None pour le capteur)
         """
         try:
             logger.info(f"Starting ECG capture process for diagnostic {diagnostic_id}")
             
+            # Repartir de zéro : les valeurs héritées du parent ne doivent pas être renvoyées
+            REGISTRY.reset()
+            
             # Créer l'instance de capture
-            ecg_capture = ECGCapture(diagnostic_id, stop_event)
+            if replay is not None:
+                from replay import ReplayCapture
+                ecg_capture = ReplayCapture(diagnostic_id, stop_event, stats_queue, control_queue, profile, replay)
+            else:
+                ecg_capture = ECGCapture(diagnostic_id, stop_event, stats_queue, control_queue, profile)
             
             # Démarrer la capture
             ecg_capture.run()
@@ -205,6 +638,8 @@ class ECGProcessManager:
             
         except Exception as e:
             logger.error(f"Error in capture process for diagnostic {diagnostic_id}: {e}")
+            if replay is not None:
+                stats_queue.put_nowait(('replay', diagnostic_id, dict(replay, status='error', error=str(e))))
         finally:
             # Nettoyer les ressources GPIO
             try:
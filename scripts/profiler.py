@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Profilage des processus de capture
+Profileur par échantillonnage (surcoût borné) ou cProfile, activable à chaud
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sampling', 'cprofile')
+MAX_PROFILE_DURATION = 300  # secondes
+
+class SamplingProfiler:
+    """Échantillonne périodiquement la pile d'un thread cible"""
+
+    def __init__(self, interval: float = 0.005, thread_id: int = None):
+        """
+        Initialiser le profileur
+
+        Args:
+            interval: Période d'échantillonnage en secondes
+            thread_id: Thread à observer (thread courant par défaut)
+        """
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Démarrer l'échantillonnage"""
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrêter l'échantillonnage"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _sample(self):
+        """Boucle d'échantillonnage"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self, path: str):
+        """
+        Écrire les piles au format « collapsed » (flamegraph.pl, speedscope)
+
+        Args:
+            path: Fichier de sortie
+        """
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+class ProfileSession:
+    """Session de profilage d'une durée limitée dans le processus courant"""
+
+    def __init__(self, path: str, duration: float, mode: str = 'sampling', interval: float = 0.005):
+        """
+        Initialiser la session
+
+        Args:
+            path: Fichier de sortie
+            duration: Durée en secondes
+            mode: 'sampling' ou 'cprofile'
+            interval: Période d'échantillonnage (mode 'sampling')
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.duration = min(duration, MAX_PROFILE_DURATION)
+        self.interval = interval
+        self.deadline = None
+        self._profiler = None
+
+    def start(self):
+        """Démarrer le profilage"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(self.interval)
+            self._profiler.start()
+
+        self.deadline = time.time() + self.duration
+
+    def expired(self) -> bool:
+        """Vérifier si la durée demandée est écoulée"""
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def finish(self) -> Optional[str]:
+        """
+        Arrêter le profilage et écrire le fichier
+
+        Returns:
+            str: Chemin du fichier écrit, None en cas d'erreur
+        """
+        try:
+            if self.mode == 'cprofile':
+                self._profiler.disable()
+                self._profiler.dump_stats(self.path)
+            else:
+                self._profiler.stop()
+                self._profiler.dump(self.path)
+
+            return self.path
+
+        except Exception as e:
+            logger.error(f"Error writing profile {self.path}: {e}")
+            return None
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Rejeu accéléré d'enregistrements ECG
+Alimente ECGCapture avec un enregistrement (base ou fichier) cadencé par une horloge virtuelle
+et mesure la durée de chaque étape du pipeline
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+import numpy as np
+
+# Le rejeu n'utilise pas le capteur : matériel simulé si les modules du Raspberry Pi sont absents
+try:
+    import RPi.GPIO  # noqa: F401
+    import spidev  # noqa: F401
+except ImportError:
+    import simulated_hardware
+    simulated_hardware.install()
+
+from ecg_capture import ECGCapture
+from ecg_analysis import ADC_MAX, decode_samples, stitch_windows
+from capture_profile import CaptureProfile
+from database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+class VirtualClock:
+    """
+    Horloge de cadencement du rejeu
+
+    Avec une vitesse N, le temps virtuel avance N fois plus vite que le temps réel ;
+    sans vitesse (au plus vite), il n'avance que par les attentes, sans dormir.
+    """
+
+    def __init__(self, speed: Optional[float] = None, start: float = None):
+        """
+        Initialiser l'horloge
+
+        Args:
+            speed: Facteur d'accélération (None ou 0 pour aller au plus vite)
+            start: Temps virtuel initial (maintenant par défaut)
+        """
+        self.speed = speed or None
+        self.origin = start if start is not None else time.time()
+        self.real_origin = time.perf_counter()
+        self.offset = 0.0
+
+    def time(self) -> float:
+        if self.speed:
+            return self.origin + (time.perf_counter() - self.real_origin) * self.speed
+        return self.origin + self.offset
+
+    def sleep(self, delay: float):
+        if delay <= 0:
+            return
+        if self.speed:
+            time.sleep(delay / self.speed)
+        else:
+            self.offset += delay
+
+class StageTimings:
+    """Durées mesurées par étape du pipeline (réservoir borné pour les percentiles)"""
+
+    RESERVOIR_SIZE = 100000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages: Dict[str, dict] = {}
+
+    def record(self, stage: str, seconds: float):
+        """
+        Enregistrer une durée
+
+        Args:
+            stage: Nom de l'étape
+            seconds: Durée en secondes
+        """
+        with self.lock:
+            entry = self.stages.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0, 'values': array('d')})
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+
+            if len(entry['values']) < self.RESERVOIR_SIZE:
+                entry['values'].append(seconds)
+            else:
+                index = random.randrange(entry['count'])
+                if index < self.RESERVOIR_SIZE:
+                    entry['values'][index] = seconds
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Résumer les durées par étape
+
+        Returns:
+            dict: Nombre, total (s), moyenne, p50, p95, p99 et maximum (ms) par étape
+        """
+        with self.lock:
+            report = {}
+            for stage, entry in self.stages.items():
+                values = sorted(entry['values'])
+
+                def percentile(q):
+                    return values[int(q * (len(values) - 1))] * 1000 if values else 0.0
+
+                report[stage] = {
+                    'count': entry['count'],
+                    'total_seconds': entry['total'],
+                    'mean_ms': entry['total'] / entry['count'] * 1000 if entry['count'] else 0.0,
+                    'p50_ms': percentile(0.5),
+                    'p95_ms': percentile(0.95),
+                    'p99_ms': percentile(0.99),
+                    'max_ms': entry['max'] * 1000
+                }
+            return report
+
+class DatabaseRecording:
+    """Enregistrement lu depuis ecg_data : fenêtres d'un diagnostic, recouvrements retirés"""
+
+    PAGE_SIZE = 200
+
+    def __init__(self, db_manager, diagnostic_id: int, since: datetime = None, until: datetime = None):
+        """
+        Ouvrir l'enregistrement
+
+        Args:
+            db_manager: Gestionnaire de base de données
+            diagnostic_id: Diagnostic enregistré
+            since: Début de la période
+            until: Fin de la période (exclue)
+        """
+        self.db_manager = db_manager
+        self.diagnostic_id = diagnostic_id
+        self.since = since
+        self.until = until
+
+        self.first_page = self._page(0)
+        if not self.first_page:
+            raise ValueError(f"No stored samples for diagnostic {diagnostic_id}")
+        self.sample_rate = self.first_page[0][2] or 100
+
+    def _page(self, after_id: int) -> List[tuple]:
+        return self.db_manager.get_recording_windows(self.diagnostic_id, self.since, self.until,
+                                                     after_id, self.PAGE_SIZE)
+
+    def _windows(self) -> Iterator[tuple]:
+        page = self.first_page
+        while page:
+            for row in page:
+                yield row[1], row[3]
+            if len(page) < self.PAGE_SIZE:
+                break
+            page = self._page(page[-1][0])
+
+    def __iter__(self) -> Iterator[int]:
+        for samples in stitch_windows(self._windows()):
+            yield from samples.tolist()
+
+class FileRecording:
+    """
+    Enregistrement lu depuis un fichier
+
+    Texte (.csv, .txt) : une valeur ADC par ligne (première colonne, en-tête ignoré) ;
+    autre extension : échantillons uint16 little-endian, comme samples_blob.
+    """
+
+    TEXT_EXTENSIONS = ('.csv', '.txt')
+
+    def __init__(self, path: str, sample_rate: int = 100):
+        """
+        Charger l'enregistrement
+
+        Args:
+            path: Chemin du fichier
+            sample_rate: Fréquence d'échantillonnage de l'enregistrement en Hz
+        """
+        self.path = path
+        self.sample_rate = int(sample_rate)
+
+        if path.lower().endswith(self.TEXT_EXTENSIONS):
+            values = []
+            with open(path, 'r') as f:
+                for line in f:
+                    field = line.replace(';', ',').split(',')[0].strip()
+                    try:
+                        values.append(int(float(field)))
+                    except ValueError:
+                        continue
+            self.samples = np.clip(np.array(values, dtype=np.int64), 0, ADC_MAX).astype('<u2')
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.samples = decode_samples(data[:len(data) - len(data) % 2])
+
+        if not len(self.samples):
+            raise ValueError(f"No samples in {path}")
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.samples.tolist())
+
+def open_recording(source: Dict[str, Any], db_manager=None):
+    """
+    Ouvrir l'enregistrement décrit par une source de rejeu
+
+    Args:
+        source: {'diagnostic_id', 'since', 'until'} ou {'file', 'sample_rate'}
+        db_manager: Gestionnaire de base de données (source 'diagnostic_id')
+
+    Returns:
+        DatabaseRecording ou FileRecording
+    """
+    if source.get('file'):
+        return FileRecording(source['file'], source.get('sample_rate', 100))
+
+    if source.get('diagnostic_id') is not None:
+        since = source.get('since')
+        until = source.get('until')
+        return DatabaseRecording(
+            db_manager or DatabaseManager(),
+            int(source['diagnostic_id']),
+            datetime.fromisoformat(since) if isinstance(since, str) else since,
+            datetime.fromisoformat(until) if isinstance(until, str) else until
+        )
+
+    raise ValueError("Replay source needs 'diagnostic_id' or 'file'")
+
+class NullDatabase:
+    """Base factice : sans persistance, les fenêtres traversent le spool mais ne sont pas écrites"""
+
+    def save_ecg_images(self, windows: List[Dict[str, Any]]) -> bool:
+        return True
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+class TimedDatabase:
+    """Mesure de l'étape d'écriture en base (thread de vidage du spool)"""
+
+    def __init__(self, db_manager, timings: StageTimings):
+        self.db_manager = db_manager
+        self.timings = timings
+
+    def save_ecg_images(self, windows: List[Dict[str, Any]]) -> bool:
+        start = time.perf_counter()
+        try:
+            return self.db_manager.save_ecg_images(windows)
+        finally:
+            self.timings.record('persist', time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.db_manager, name)
+
+class ReplayCapture(ECGCapture):
+    """Capture alimentée par un enregistrement et cadencée par une horloge virtuelle"""
+
+    # Attente maximale du vidage du spool en fin de rejeu
+    DRAIN_TIMEOUT = 120.0
+
+    def __init__(self, diagnostic_id: int, stop_event, stats_queue=None, control_queue=None,
+                 profile: CaptureProfile = None, replay: Dict[str, Any] = None):
+        """
+        Préparer le rejeu
+
+        Args:
+            diagnostic_id: Diagnostic cible des fenêtres produites
+            stop_event: Événement d'arrêt (positionné aussi en fin d'enregistrement)
+            stats_queue: File vers le processus parent
+            control_queue: File de commandes du parent
+            profile: Profil de capture (sinon replay['profile'] à la fréquence de l'enregistrement)
+            replay: source (voir open_recording), speed (0 pour aller au plus vite), persist, profile
+        """
+        replay = dict(replay or {})
+        self.source = replay.get('source') or {}
+        self.speed = float(replay.get('speed') or 0)
+        self.persist = bool(replay.get('persist'))
+        self.timings = StageTimings()
+
+        self.recording = open_recording(self.source)
+        self.samples = iter(self.recording)
+        self.next_value = next(self.samples, None)
+
+        # Préréglage et valeurs explicites éventuels, fréquence de l'enregistrement par défaut
+        profile = profile or CaptureProfile.from_dict(
+            dict({'sample_rate': self.recording.sample_rate}, **(replay.get('profile') or {}))
+        )
+
+        # Sans persistance : spool temporaire, jamais repris par drain_orphan_spools
+        self.temp_spool_dir = None
+        if not self.persist:
+            self.temp_spool_dir = tempfile.mkdtemp(prefix='ecg_replay_')
+            self.SPOOL_DIR = self.temp_spool_dir
+
+        db_manager = DatabaseManager() if self.persist else NullDatabase()
+        super().__init__(diagnostic_id, stop_event, stats_queue, control_queue, profile,
+                         db_manager=TimedDatabase(db_manager, self.timings))
+
+        self.clock = VirtualClock(self.speed)
+        self.started = None
+        self.finished = False
+
+    def _record_signal_quality(self, new_event: bool = False):
+        """Sans persistance, la session du diagnostic cible n'est pas modifiée"""
+        if self.persist:
+            super()._record_signal_quality(new_event)
+
+    def _setup_hardware(self):
+        """Aucun matériel : les échantillons viennent de l'enregistrement"""
+        self.spi = None
+
+    def _timed(self, stage: str, method, *args, **kwargs):
+        """Exécuter une étape du pipeline en mesurant sa durée"""
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self.timings.record(stage, time.perf_counter() - start)
+
+    def _analog_read(self) -> int:
+        start = time.perf_counter()
+        value = self.next_value
+        self.next_value = next(self.samples, None)
+
+        # Fin de l'enregistrement : la capture s'arrête après cet échantillon
+        if self.next_value is None:
+            self.stop_event.set()
+
+        self.timings.record('acquisition', time.perf_counter() - start)
+        return value
+
+    def _emit_window(self, first_index: int, last_index: int):
+        return self._timed('window', super()._emit_window, first_index, last_index)
+
+    def _check_signal_quality(self, adc_samples):
+        return self._timed('quality', super()._check_signal_quality, adc_samples)
+
+    def _compute_features(self, adc_samples, quality: dict = None):
+        return self._timed('features', super()._compute_features, adc_samples, quality)
+
+    def _generate_plot(self, voltage_data: list, time_data: list) -> bytes:
+        return self._timed('render', super()._generate_plot, voltage_data, time_data)
+
+    def _save_to_database(self, image_data: bytes, window: dict = None, samples: bytes = b'',
+                          rendered: bool = True):
+        return self._timed('spool', super()._save_to_database, image_data, window, samples, rendered)
+
+    def run(self):
+        self.started = time.perf_counter()
+        self._send_stats('stats', {'profile': self.profile.to_dict()})
+        logger.info(f"Replaying {self.source} into diagnostic {self.diagnostic_id} "
+                    f"at {'max speed' if not self.speed else f'{self.speed:g}x'}")
+        super().run()
+
+    def _cleanup(self):
+        """Attendre le vidage du spool (étape mesurée), nettoyer puis envoyer le rapport"""
+        if self.finished:
+            return
+        self.finished = True
+
+        deadline = time.time() + self.DRAIN_TIMEOUT
+        while self.spool.pending_windows and time.time() < deadline and self.replayer.last_error is None:
+            time.sleep(0.05)
+
+        super()._cleanup()
+
+        report = self.report()
+        self._send_stats('replay', report)
+        logger.info(f"Replay into diagnostic {self.diagnostic_id} {report['status']}: "
+                    f"{report['recording_seconds']:.1f}s of signal in {report['elapsed_seconds']:.1f}s "
+                    f"({report['speedup']:.1f}x)")
+
+        if self.temp_spool_dir:
+            shutil.rmtree(self.temp_spool_dir, ignore_errors=True)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Bilan du rejeu
+
+        Returns:
+            dict: Source, vitesse, volumes, durée réelle et durée de signal, durées par étape
+        """
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        recorded = self.sample_count / self.SAMPLE_RATE
+
+        return {
+            'status': 'completed' if self.next_value is None else 'stopped',
+            'source': self.source,
+            'speed': self.speed or 'max',
+            'persist': self.persist,
+            'profile': self.profile.to_dict(),
+            'samples': self.sample_count,
+            'missed_samples': self.missed_samples,
+            'windows_saved': self.save_count,
+            'windows_suppressed': self.suppressed_windows,
+            'recording_seconds': recorded,
+            'elapsed_seconds': elapsed,
+            'speedup': recorded / elapsed if elapsed > 0 else 0.0,
+            'stages': self.timings.report()
+        }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay a recording through the capture pipeline')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--diagnostic', type=int, help='Replay the stored windows of this diagnostic')
+    source.add_argument('--file', help='Replay a recording file (.csv/.txt values or raw uint16)')
+    parser.add_argument('--since', help='Start of the stored period (ISO 8601)')
+    parser.add_argument('--until', help='End of the stored period (ISO 8601)')
+    parser.add_argument('--sample-rate', type=int, default=100, help='Sample rate of a recording file')
+    parser.add_argument('--speed', type=float, default=0, help='Times real time (0: as fast as possible)')
+    parser.add_argument('--preset', help='Capture profile preset (default: diagnostic at the recording rate)')
+    parser.add_argument('--target', type=int, default=0, help='Diagnostic receiving the windows')
+    parser.add_argument('--persist', action='store_true', help='Write the windows to the database')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.persist and not args.target:
+        parser.error('--persist needs --target')
+
+    if args.file:
+        replay_source = {'file': args.file, 'sample_rate': args.sample_rate}
+    else:
+        replay_source = {'diagnostic_id': args.diagnostic, 'since': args.since, 'until': args.until}
+
+    capture = ReplayCapture(args.target, threading.Event(), replay={
+        'source': replay_source, 'speed': args.speed, 'persist': args.persist,
+        'profile': {'preset': args.preset} if args.preset else None
+    })
+
+    capture.run()
+    report = capture.report()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
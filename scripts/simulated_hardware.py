@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Matériel simulé pour la capture ECG
+Remplace RPi.GPIO et spidev par des équivalents logiciels (benchmarks, tests de charge)
+"""
+
+import math
+import sys
+import types
+from typing import List
+
+def synthetic_ecg_value(index: int, sample_rate: int = 100, heart_rate: float = 72.0) -> int:
+    """
+    Générer une valeur ADC 10 bits d'un signal ECG synthétique
+
+    Args:
+        index: Indice de l'échantillon
+        sample_rate: Fréquence d'échantillonnage en Hz
+        heart_rate: Fréquence cardiaque simulée en bpm
+
+    Returns:
+        int: Valeur ADC (0-1023)
+    """
+    t = index / sample_rate
+    phase = (t * heart_rate / 60.0) % 1.0
+
+    # Ligne de base, onde P, complexe QRS et onde T
+    value = 1.5
+    value += 0.1 * math.exp(-((phase - 0.2) / 0.025) ** 2)
+    value += 1.2 * math.exp(-((phase - 0.4) / 0.008) ** 2)
+    value -= 0.15 * math.exp(-((phase - 0.43) / 0.01) ** 2)
+    value += 0.25 * math.exp(-((phase - 0.65) / 0.04) ** 2)
+
+    return max(0, min(1023, int(value * 1024 / 3.3)))
+
+def encode_adc_value(adc_value: int) -> List[int]:
+    """
+    Encoder une valeur ADC dans les deux octets lus sur le bus SPI
+
+    Inverse du décodage de ECGCapture._analog_read.
+
+    Args:
+        adc_value: Valeur ADC (0-1023)
+
+    Returns:
+        list: Deux octets
+    """
+    raw = adc_value << 3
+    return [(raw >> 8) & 0x1F, raw & 0xFE]
+
+class SimulatedSpiDev:
+    """Équivalent logiciel de spidev.SpiDev produisant un ECG synthétique"""
+
+    sample_rate = 100
+    heart_rate = 72.0
+
+    def __init__(self):
+        self.max_speed_hz = 0
+        self.index = 0
+
+    def open(self, bus: int, device: int):
+        pass
+
+    def readbytes(self, count: int) -> List[int]:
+        value = synthetic_ecg_value(self.index, self.sample_rate, self.heart_rate)
+        self.index += 1
+        return encode_adc_value(value)[:count]
+
+    def close(self):
+        pass
+
+def _make_gpio_module() -> types.ModuleType:
+    """Construire un module RPi.GPIO sans effet"""
+    gpio = types.ModuleType('RPi.GPIO')
+    gpio.BCM = 11
+    gpio.OUT = 0
+    gpio.IN = 1
+    gpio.HIGH = 1
+    gpio.LOW = 0
+    gpio.setmode = lambda mode: None
+    gpio.setup = lambda pin, mode: None
+    gpio.output = lambda pin, value: None
+    gpio.cleanup = lambda *args: None
+    return gpio
+
+def install():
+    """
+    Enregistrer les modules simulés dans sys.modules
+
+    Doit être appelé avant l'import de ecg_capture.
+    """
+    gpio = _make_gpio_module()
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+
+    spidev = types.ModuleType('spidev')
+    spidev.SpiDev = SimulatedSpiDev
+
+    sys.modules['RPi'] = rpi
+    sys.modules['RPi.GPIO'] = gpio
+    sys.modules['spidev'] = spidev
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Trames binaires de forme d'onde ECG
+Échantillons bruts compacts pour un tracé côté navigateur (canvas) au lieu d'une image rendue
+"""
+
+import struct
+from typing import Dict, Any, Iterable, List
+
+import numpy as np
+
+from ecg_analysis import ADC_MAX, ADC_VREF, contiguous_segments, stitch_windows
+
+# En-tête (little-endian) : signature, version, encodage, fréquence (Hz), gain (volts par unité),
+# ligne de base (unités ADC), horodatage du premier échantillon (secondes epoch), nombre d'échantillons,
+# taille des échantillons codés en octets (trames successives d'une même réponse).
+# Tension d'un échantillon : (valeur + ligne de base) * gain
+FRAME_HEADER = struct.Struct('<4sBBHfhdII')
+FRAME_MAGIC = b'ECGF'
+FRAME_VERSION = 1
+
+# int16 : valeurs int16 little-endian ; delta : première valeur en int16 puis écarts en int8,
+# l'octet -128 annonçant une valeur complète en int16 (écart hors de [-127, 127])
+FRAME_ENCODINGS = {'int16': 0, 'delta': 1}
+DELTA_ESCAPE = -128
+
+# Milieu de l'échelle ADC : valeurs centrées sur zéro
+ADC_BASELINE = (ADC_MAX + 1) // 2
+ADC_GAIN = ADC_VREF / (ADC_MAX + 1)
+
+def _encode_deltas(values: np.ndarray) -> bytes:
+    """Coder les valeurs en écarts int8 avec échappement"""
+    deltas = np.diff(values)
+    escaped = (deltas < -127) | (deltas > 127)
+
+    # Position de chaque écart : 1 octet, 3 pour un échappement
+    lengths = np.where(escaped, 3, 1)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    body = np.empty(int(lengths.sum()), dtype=np.uint8)
+    body[offsets[~escaped]] = deltas[~escaped].astype(np.int8).view(np.uint8)
+
+    if escaped.any():
+        full = values[1:][escaped].astype('<i2').view(np.uint8).reshape(-1, 2)
+        body[offsets[escaped]] = np.uint8(DELTA_ESCAPE & 0xFF)
+        body[offsets[escaped] + 1] = full[:, 0]
+        body[offsets[escaped] + 2] = full[:, 1]
+
+    return values[:1].astype('<i2').tobytes() + body.tobytes()
+
+def encode_frame(samples: np.ndarray, sample_rate: int, start: float, encoding: str = 'delta') -> bytes:
+    """
+    Construire une trame
+
+    Args:
+        samples: Valeurs ADC
+        sample_rate: Fréquence d'échantillonnage en Hz
+        start: Horodatage du premier échantillon (secondes epoch)
+        encoding: 'int16' ou 'delta'
+
+    Returns:
+        bytes: En-tête puis échantillons codés
+    """
+    if encoding not in FRAME_ENCODINGS:
+        raise ValueError(f"Unknown frame encoding: {encoding}")
+
+    values = np.asarray(samples, dtype=np.int32) - ADC_BASELINE
+
+    if not len(values):
+        body = b''
+    elif encoding == 'int16':
+        body = values.astype('<i2').tobytes()
+    else:
+        body = _encode_deltas(values)
+
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, FRAME_ENCODINGS[encoding], int(sample_rate),
+                               ADC_GAIN, ADC_BASELINE, float(start), len(values), len(body))
+    return header + body
+
+def encode_window_frames(windows: Iterable[tuple], encoding: str = 'delta') -> List[bytes]:
+    """
+    Construire une trame par segment de signal continu
+
+    Les fenêtres recouvrantes sont raccordées ; une nouvelle session ou des fenêtres absentes
+    ouvrent une nouvelle trame, dont l'horodatage reste exact.
+
+    Args:
+        windows: (first_sample_index, sample_rate, samples_blob, image_created_at) dans l'ordre d'enregistrement
+        encoding: 'int16' ou 'delta'
+
+    Returns:
+        List[bytes]: Trames, à concaténer dans la réponse
+    """
+    frames = []
+    for segment in contiguous_segments(windows):
+        _, sample_rate, samples_blob, created_at = segment[0]
+        sample_rate = sample_rate or 100
+        samples = np.concatenate(list(stitch_windows((window[0], window[2]) for window in segment)))
+
+        # image_created_at marque la fin de la première fenêtre du segment
+        start = created_at.timestamp() - (len(samples_blob) // 2) / sample_rate
+        frames.append(encode_frame(samples, sample_rate, start, encoding))
+
+    return frames
+
+def decode_frame(data: bytes, offset: int = 0) -> Dict[str, Any]:
+    """
+    Décoder une trame (référence du décodeur JavaScript)
+
+    Args:
+        data: Réponse contenant la trame
+        offset: Position de la trame dans la réponse
+
+    Returns:
+        dict: encoding, sample_rate, gain, baseline, start, samples (valeurs ADC), size (octets de la trame)
+    """
+    magic, version, encoding, sample_rate, gain, baseline, start, count, body_size = \
+        FRAME_HEADER.unpack_from(data, offset)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError('Not an ECG frame')
+
+    body_start = offset + FRAME_HEADER.size
+    body = memoryview(data)[body_start:body_start + body_size]
+    if len(body) < body_size:
+        raise ValueError('Truncated ECG frame')
+
+    if encoding == FRAME_ENCODINGS['int16']:
+        values = np.frombuffer(body, dtype='<i2', count=count).astype(np.int32)
+    else:
+        values = np.empty(count, dtype=np.int32)
+        position = 0
+        for i in range(count):
+            if i == 0:
+                values[0] = int.from_bytes(body[0:2], 'little', signed=True)
+                position = 2
+                continue
+            delta = int.from_bytes(body[position:position + 1], 'little', signed=True)
+            if delta == DELTA_ESCAPE:
+                values[i] = int.from_bytes(body[position + 1:position + 3], 'little', signed=True)
+                position += 3
+            else:
+                values[i] = values[i - 1] + delta
+                position += 1
+
+    return {
+        'encoding': 'int16' if encoding == FRAME_ENCODINGS['int16'] else 'delta',
+        'sample_rate': sample_rate,
+        'gain': gain,
+        'baseline': baseline,
+        'start': start,
+        'samples': values + baseline,
+        'size': FRAME_HEADER.size + body_size
+    }
+
+def decode_frames(data: bytes) -> List[Dict[str, Any]]:
+    """
+    Décoder toutes les trames d'une réponse
+
+    Args:
+        data: Trames concaténées
+
+    Returns:
+        List[dict]: Trames décodées (voir decode_frame)
+    """
+    frames = []
+    offset = 0
+    while offset < len(data):
+        frame = decode_frame(data, offset)
+        frames.append(frame)
+        offset += frame['size']
+    return frames
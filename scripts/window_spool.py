@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Spool disque des fenêtres ECG
+File append-only bornée entre la capture et la base, vidée en arrière-plan
+"""
+
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from metrics import SPOOL_DEAD_LETTER_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# En-tête d'un enregistrement : magic, taille des métadonnées, taille des données
+RECORD_HEADER = struct.Struct('<4sII')
+RECORD_MAGIC = b'ECGW'
+SEGMENT_SUFFIX = '.seg'
+
+# Fenêtres refusées définitivement par la base, hors du flux de lecture
+DEAD_LETTER_DIR = 'dead_letter'
+
+class PermanentWriteError(Exception):
+    """Lot refusé par la base pour son contenu : une nouvelle tentative échouerait de la même façon"""
+
+class WindowSpool:
+    """Spool append-only découpé en segments avec point de reprise"""
+
+    def __init__(self, directory: str, max_bytes: int = None, segment_bytes: int = 8 * 1024 * 1024):
+        """
+        Ouvrir (ou créer) un spool
+
+        Args:
+            directory: Répertoire du spool
+            max_bytes: Taille maximale en attente
+            segment_bytes: Taille d'un segment avant rotation
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes or int(os.getenv('SPOOL_MAX_BYTES', 256 * 1024 * 1024))
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        self.checkpoint_path = os.path.join(directory, 'checkpoint')
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Position de lecture : (segment, offset)
+        self.read_segment, self.read_offset = self._load_checkpoint()
+
+        # Toujours écrire dans un nouveau segment : la fin du précédent peut être tronquée
+        segments = self._segments()
+        self.write_seq = (self._seq(segments[-1]) + 1) if segments else 0
+        self.write_file = None
+        self.write_size = 0
+
+        self.pending_windows, self.pending_bytes = self._scan_pending()
+        self.dropped_windows = 0
+        self.dead_letter_windows = 0
+
+    @staticmethod
+    def _seq(segment: str) -> int:
+        return int(segment[:-len(SEGMENT_SUFFIX)])
+
+    def _segments(self) -> List[str]:
+        """Lister les segments par ordre d'écriture"""
+        return sorted(f for f in os.listdir(self.directory) if f.endswith(SEGMENT_SUFFIX))
+
+    def _load_checkpoint(self) -> Tuple[Optional[str], int]:
+        """Lire le point de reprise du lecteur"""
+        try:
+            with open(self.checkpoint_path) as f:
+                segment, offset = f.read().split()
+                return segment, int(offset)
+        except (FileNotFoundError, ValueError):
+            return None, 0
+
+    def _save_checkpoint(self):
+        """Écrire le point de reprise de manière atomique"""
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f'{self.read_segment or ""} {self.read_offset}')
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _iter_records(self, limit: int = None, with_data: bool = True):
+        """
+        Parcourir les enregistrements en attente depuis le point de reprise
+
+        Yields:
+            tuple: (métadonnées, données, segment, offset suivant)
+        """
+        count = 0
+        for segment in self._segments():
+            if self.read_segment and segment < self.read_segment:
+                continue
+
+            offset = self.read_offset if segment == self.read_segment else 0
+            path = os.path.join(self.directory, segment)
+
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(offset)
+                while limit is None or count < limit:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+
+                    magic, meta_len, data_len = RECORD_HEADER.unpack(header)
+                    if magic != RECORD_MAGIC:
+                        logger.error(f"Corrupted spool segment {path} at offset {offset}, skipping rest")
+                        break
+
+                    meta_raw = f.read(meta_len)
+                    if with_data:
+                        data = f.read(data_len)
+                        truncated = len(data) < data_len
+                    else:
+                        truncated = f.tell() + data_len > size
+                        f.seek(data_len, os.SEEK_CUR)
+                        data = None
+
+                    if len(meta_raw) < meta_len or truncated:
+                        # Enregistrement tronqué (écriture interrompue)
+                        break
+
+                    offset = f.tell()
+                    count += 1
+                    yield json.loads(meta_raw), data, segment, offset
+
+            if limit is not None and count >= limit:
+                return
+
+    def _scan_pending(self) -> Tuple[int, int]:
+        """Compter les fenêtres en attente à l'ouverture"""
+        windows = 0
+        total = 0
+        for meta, _, _, _ in self._iter_records(with_data=False):
+            windows += 1
+            total += meta.get('size', 0)
+        return windows, total
+
+    def append(self, meta: Dict[str, Any], data: bytes) -> bool:
+        """
+        Ajouter une fenêtre au spool
+
+        Args:
+            meta: Métadonnées sérialisables en JSON
+            data: Contenu binaire
+
+        Returns:
+            bool: False si le spool est plein
+        """
+        meta = dict(meta, size=len(data))
+        meta_raw = json.dumps(meta).encode('utf-8')
+
+        with self.lock:
+            if self.pending_bytes + len(data) > self.max_bytes:
+                self.dropped_windows += 1
+                logger.error(f"Spool {self.directory} full ({self.pending_bytes} bytes), dropping window")
+                return False
+
+            if self.write_file is None or self.write_size >= self.segment_bytes:
+                self._rotate()
+
+            self.write_file.write(RECORD_HEADER.pack(RECORD_MAGIC, len(meta_raw), len(data)))
+            self.write_file.write(meta_raw)
+            self.write_file.write(data)
+            self.write_file.flush()
+            self.write_size += RECORD_HEADER.size + len(meta_raw) + len(data)
+
+            self.pending_windows += 1
+            self.pending_bytes += len(data)
+            return True
+
+    def _rotate(self):
+        """Ouvrir un nouveau segment d'écriture"""
+        if self.write_file:
+            self.write_file.close()
+
+        path = os.path.join(self.directory, f'{self.write_seq:020d}{SEGMENT_SUFFIX}')
+        self.write_file = open(path, 'ab')
+        self.write_seq += 1
+        self.write_size = 0
+
+    def peek(self, limit: int) -> Tuple[List[Tuple[Dict[str, Any], bytes]], Optional[Tuple[str, int]]]:
+        """
+        Lire les prochaines fenêtres sans les retirer
+
+        Args:
+            limit: Nombre maximum de fenêtres
+
+        Returns:
+            tuple: (liste de (métadonnées, données), position à valider)
+        """
+        with self.lock:
+            if self.write_file:
+                self.write_file.flush()
+
+        records = []
+        position = None
+        for meta, data, segment, offset in self._iter_records(limit=limit):
+            records.append((meta, data))
+            position = (segment, offset)
+
+        return records, position
+
+    def commit(self, position: Tuple[str, int], windows: int, size: int):
+        """
+        Valider la lecture jusqu'à une position
+
+        Args:
+            position: Position renvoyée par peek
+            windows: Nombre de fenêtres consommées
+            size: Taille totale des données consommées
+        """
+        with self.lock:
+            self.read_segment, self.read_offset = position
+            self._save_checkpoint()
+
+            self.pending_windows = max(0, self.pending_windows - windows)
+            self.pending_bytes = max(0, self.pending_bytes - size)
+
+            # Supprimer les segments entièrement consommés
+            active = f'{self.write_seq - 1:020d}{SEGMENT_SUFFIX}' if self.write_file else None
+            for segment in self._segments():
+                if segment >= self.read_segment or segment == active:
+                    break
+                os.unlink(os.path.join(self.directory, segment))
+
+    def dead_letter(self, meta: Dict[str, Any], data: bytes, position: Tuple[str, int], error: str):
+        """
+        Écarter une fenêtre refusée par la base et valider la lecture au-delà
+
+        La fenêtre est conservée dans dead_letter/ (même format d'enregistrement, erreur
+        dans les métadonnées) pour analyse ou réinjection manuelle.
+
+        Args:
+            meta: Métadonnées de la fenêtre
+            data: Contenu binaire
+            position: Position suivant la fenêtre (renvoyée par peek)
+            error: Erreur renvoyée par la base
+        """
+        directory = os.path.join(self.directory, DEAD_LETTER_DIR)
+        os.makedirs(directory, exist_ok=True)
+        meta_raw = json.dumps(dict(meta, error=error)).encode('utf-8')
+
+        with open(os.path.join(directory, f'{position[0]}'), 'ab') as f:
+            f.write(RECORD_HEADER.pack(RECORD_MAGIC, len(meta_raw), len(data)))
+            f.write(meta_raw)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.dead_letter_windows += 1
+        self.commit(position, 1, len(data))
+
+    def status(self) -> Dict[str, int]:
+        """
+        Décrire l'arriéré du spool
+
+        Returns:
+            dict: Fenêtres et octets en attente, fenêtres rejetées et écartées
+        """
+        return {
+            'pending_windows': self.pending_windows,
+            'pending_bytes': self.pending_bytes,
+            'dropped_windows': self.dropped_windows,
+            'dead_letter_windows': self.dead_letter_windows
+        }
+
+    def close(self):
+        """Fermer le segment d'écriture"""
+        with self.lock:
+            if self.write_file:
+                self.write_file.close()
+                self.write_file = None
+
+class SpoolReplayer:
+    """
+    Vide un spool vers la base par lots, avec reprise exponentielle en cas d'échec
+
+    Une erreur passagère (connexion, verrou) fait réessayer le même lot. Un lot refusé
+    pour son contenu (PermanentWriteError) est rejoué fenêtre par fenêtre : la fenêtre
+    fautive est écartée dans dead_letter/ et le vidage continue au-delà.
+    """
+
+    def __init__(self, spool: WindowSpool, db_manager, batch_size: int = 10,
+                 max_backoff: float = 60.0, on_saved=None, exit_when_empty: bool = False):
+        """
+        Initialiser le lecteur
+
+        Args:
+            spool: Spool à vider
+            db_manager: Gestionnaire de base de données
+            batch_size: Nombre de fenêtres par transaction
+            max_backoff: Délai maximal entre deux tentatives en secondes
+            on_saved: Fonction appelée avec les métadonnées des fenêtres enregistrées
+            exit_when_empty: S'arrêter et libérer le verrou une fois le spool vide (spool orphelin)
+        """
+        self.spool = spool
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.on_saved = on_saved
+        self.exit_when_empty = exit_when_empty
+        self.last_error = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._lock_file = None
+        # Fenêtres restant à rejouer une par une après un lot refusé
+        self._isolating = 0
+
+    def _acquire_lock(self) -> bool:
+        """Garantir un seul lecteur par spool, y compris entre processus"""
+        if self._lock_file:
+            return True
+
+        lock_file = open(os.path.join(self.spool.directory, 'reader.lock'), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        return True
+
+    def _release_lock(self):
+        if self._lock_file:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def start(self):
+        """Démarrer le vidage en arrière-plan"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='spool-replayer', daemon=True)
+        self.thread.start()
+
+    def stop(self, drain_timeout: float = 2.0):
+        """
+        Arrêter le vidage après une dernière tentative bornée
+
+        Args:
+            drain_timeout: Temps accordé pour vider l'arriéré
+        """
+        deadline = time.time() + drain_timeout
+        while self.spool.pending_windows and time.time() < deadline and self.last_error is None:
+            time.sleep(0.05)
+
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=drain_timeout + 1)
+
+    def drain_once(self) -> int:
+        """
+        Enregistrer un lot de fenêtres
+
+        Returns:
+            int: Nombre de fenêtres enregistrées, -1 en cas d'échec
+        """
+        records, position = self.spool.peek(1 if self._isolating else self.batch_size)
+        if not records:
+            self._isolating = 0
+            return 0
+
+        windows = []
+        for meta, data in records:
+            # Données = image suivie des échantillons bruts
+            image_size = meta.get('image_size', len(data))
+            windows.append(dict(meta, image_blob=data[:image_size] or None, samples_blob=data[image_size:] or None))
+
+        try:
+            if not self.db_manager.save_ecg_images(windows):
+                return -1
+        except PermanentWriteError as e:
+            if len(records) > 1:
+                # Rejouer le lot fenêtre par fenêtre pour trouver la fenêtre refusée
+                logger.warning(f"Spool {self.spool.directory}: batch rejected ({e}), retrying window by window")
+                self._isolating = len(records)
+                return self.drain_once()
+
+            meta, data = records[0]
+            self.spool.dead_letter(meta, data, position, str(e))
+            SPOOL_DEAD_LETTER_TOTAL.inc(diagnostic_id=meta.get('diagnostic_id'))
+            logger.error(f"Spool {self.spool.directory}: window moved to dead letter ({e})")
+            self._isolating = max(self._isolating - 1, 0)
+            return 1
+
+        self._isolating = max(self._isolating - len(records), 0)
+        self.spool.commit(position, len(records), sum(len(data) for _, data in records))
+
+        if self.on_saved:
+            self.on_saved([meta for meta, _ in records])
+
+        return len(records)
+
+    def _run(self):
+        """Boucle de vidage"""
+        backoff = 1.0
+
+        while not self.stop_event.is_set():
+            if not self._acquire_lock():
+                # Un autre lecteur vide déjà ce spool
+                self.stop_event.wait(5)
+                continue
+
+            try:
+                saved = self.drain_once()
+            except Exception as e:
+                logger.error(f"Error replaying spool {self.spool.directory}: {e}")
+                saved = -1
+
+            if saved < 0:
+                self.last_error = f"Database write failed, retrying in {backoff:.0f}s"
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            elif saved == 0:
+                if self.exit_when_empty:
+                    # Rendre la main à la capture qui reprendra ce spool
+                    break
+                self.stop_event.wait(0.5)
+            else:
+                self.last_error = None
+                backoff = 1.0
+
+        self._release_lock()
@@ -0,0 +1,17 @@
+"""
+Configuration des tests
+Les modules de scripts/ sont importés directement ; matériel simulé hors Raspberry Pi
+"""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+try:
+    import RPi.GPIO  # noqa: F401
+    import spidev  # noqa: F401
+except ImportError:
+    import simulated_hardware
+    simulated_hardware.install()
@@ -0,0 +1,118 @@
+"""Tests des analyses par lots : reprise et portée des points de reprise"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import simulated_hardware
+from batch_analysis import BatchAnalysisJob, analysis_scope
+
+class MemoryDatabase:
+    """Fenêtres et points de reprise en mémoire, mêmes signatures que DatabaseManager"""
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.results = {}
+        self.jobs = {}
+
+    def stream_ecg_windows(self, after_id, limit, since=None, until=None, diagnostic_ids=None):
+        rows = [w for w in self.windows if w[0] > after_id
+                and (since is None or w[2] >= since) and (until is None or w[2] < until)
+                and (not diagnostic_ids or w[1] in diagnostic_ids)]
+        return iter(rows[:limit])
+
+    def get_analysis_job(self, analysis, version, scope=''):
+        return self.jobs.get((analysis, version, scope))
+
+    def reset_analysis_job(self, analysis, version, scope='', filters=None):
+        self.jobs[(analysis, version, scope)] = {'last_ecg_data_id': 0, 'processed': 0, 'failed': 0,
+                                                 'status': 'running'}
+        return True
+
+    def save_analysis_results(self, analysis, version, results, scope='', filters=None):
+        job = self.jobs.setdefault((analysis, version, scope), {'last_ecg_data_id': 0, 'processed': 0,
+                                                                'failed': 0, 'status': 'running'})
+        for ecg_data_id, _, _, result, error in results:
+            self.results[(analysis, ecg_data_id)] = (result, error)
+        job['last_ecg_data_id'] = max(job['last_ecg_data_id'], results[-1][0])
+        job['processed'] += len(results)
+        return True
+
+    def update_analysis_job_status(self, analysis, version, status, scope='', filters=None):
+        self.jobs.setdefault((analysis, version, scope), {'last_ecg_data_id': 0})['status'] = status
+        return True
+
+def _windows(count: int):
+    """Fenêtres de 5 s alternant entre les diagnostics 1 et 2"""
+    start = datetime(2026, 10, 1)
+    samples = np.array([simulated_hardware.synthetic_ecg_value(i) for i in range(500)], dtype='<u2').tobytes()
+    return [(i, 1 + i % 2, start + timedelta(seconds=5 * i), 100, samples) for i in range(1, count + 1)]
+
+def test_scope_depends_only_on_filters():
+    assert analysis_scope() == ('', None)
+    scope, filters = analysis_scope(diagnostic_ids=[2, 1, 2])
+    assert scope and analysis_scope(diagnostic_ids=[1, 2])[0] == scope
+    assert '"diagnostic_ids":[1,2]' in filters
+    assert analysis_scope(since=datetime(2026, 1, 1))[0] != scope
+
+def test_run_analyses_every_window(tmp_path):
+    db = MemoryDatabase(_windows(25))
+    result = BatchAnalysisJob(db, 'heart_rate', workers=1, chunk_size=10, batch_size=4).run()
+
+    assert result['status'] == 'completed'
+    assert result['processed'] == 25
+    assert db.jobs[('heart_rate', 1, '')]['last_ecg_data_id'] == 25
+    assert all(error is None for _, error in db.results.values())
+
+def test_resume_after_interruption():
+    db = MemoryDatabase(_windows(20))
+    job = BatchAnalysisJob(db, 'heart_rate', workers=1, chunk_size=20, batch_size=5)
+
+    saved = db.save_analysis_results
+
+    def save_then_stop(*args, **kwargs):
+        job.stop()
+        return saved(*args, **kwargs)
+
+    db.save_analysis_results = save_then_stop
+    assert job.run()['status'] == 'interrupted'
+    assert db.jobs[('heart_rate', 1, '')]['last_ecg_data_id'] == 5
+
+    db.save_analysis_results = saved
+    result = BatchAnalysisJob(db, 'heart_rate', workers=1, chunk_size=20, batch_size=5).run()
+    assert result['status'] == 'completed'
+    assert result['processed'] == 15
+    assert len(db.results) == 20
+
+def test_filtered_run_does_not_advance_global_checkpoint():
+    db = MemoryDatabase(_windows(20))
+
+    filtered = BatchAnalysisJob(db, 'heart_rate', workers=1, chunk_size=8, batch_size=3, diagnostic_ids=[2]).run()
+    assert filtered['status'] == 'completed'
+    assert filtered['processed'] == 10
+    assert db.get_analysis_job('heart_rate', 1) is None
+
+    # Les fenêtres du diagnostic 1, d'id inférieurs au dernier id filtré, restent à analyser
+    full = BatchAnalysisJob(db, 'heart_rate', workers=1, chunk_size=8, batch_size=3).run()
+    assert full['processed'] == 20
+    assert all(('heart_rate', i) in db.results for i in range(1, 21))
+
+def test_unreadable_checkpoint_aborts_instead_of_starting_over():
+    db = MemoryDatabase(_windows(10))
+    db.jobs[('heart_rate', 1, '')] = {'last_ecg_data_id': 6, 'processed': 6, 'failed': 0, 'status': 'running'}
+
+    def lost_connection(*args, **kwargs):
+        raise RuntimeError('Lost connection to MySQL server')
+
+    db.get_analysis_job = lost_connection
+    result = BatchAnalysisJob(db, 'heart_rate', workers=1, chunk_size=10, batch_size=5).run()
+
+    assert result['status'] == 'interrupted'
+    assert result['processed'] == 0
+    assert db.results == {}
+    assert db.jobs[('heart_rate', 1, '')]['status'] == 'running'
+
+def test_unknown_analysis():
+    with pytest.raises(ValueError):
+        BatchAnalysisJob(MemoryDatabase([]), 'unknown')
@@ -0,0 +1,66 @@
+"""Tests de la validation des profils de capture"""
+
+import pytest
+
+from capture_profile import CaptureProfile, PRESETS, MAX_WINDOW_SECONDS
+
+@pytest.mark.parametrize('name', sorted(PRESETS))
+def test_presets_are_valid(name):
+    profile = CaptureProfile.from_dict({'preset': name})
+
+    assert profile.name == name
+    assert profile.to_dict()['window_size'] == PRESETS[name]['window_size']
+
+def test_default_is_diagnostic_preset():
+    profile = CaptureProfile.from_dict(None)
+
+    assert profile.name == 'diagnostic'
+    assert profile.image_format == 'png'
+    assert profile.window_seconds == 5
+
+def test_explicit_values_override_preset():
+    profile = CaptureProfile.from_dict({'preset': 'monitoring', 'dpi': 80})
+
+    assert profile.name == 'custom'
+    assert profile.dpi == 80
+    assert profile.image_format == 'webp'
+
+def test_window_given_in_seconds_follows_sample_rate():
+    profile = CaptureProfile.from_dict({'sample_rate': 250, 'window_seconds': 2, 'overlap_seconds': 0.5})
+
+    assert (profile.window_size, profile.window_overlap) == (500, 125)
+
+def test_sample_rate_change_keeps_preset_window_duration():
+    profile = CaptureProfile.from_dict({'sample_rate': 250})
+
+    assert profile.window_size == 1250
+    assert profile.window_seconds == 5
+
+@pytest.mark.parametrize('data', [
+    {'preset': 'holter'},
+    {'sample_rate': 0},
+    {'sample_rate': 2000},
+    {'window_size': 0},
+    {'window_size': 500, 'window_overlap': 500},
+    {'window_overlap': -1},
+    {'dpi': 1000},
+    {'width': 100},
+    {'image_format': 'gif'},
+    {'frame_rate': 30},
+    {'sample_rate': 'fast'},
+])
+def test_invalid_profiles_are_rejected(data):
+    with pytest.raises(ValueError):
+        CaptureProfile.from_dict(data)
+
+def test_window_size_is_bounded_in_seconds():
+    longest = CaptureProfile.from_dict({'sample_rate': 250, 'window_seconds': MAX_WINDOW_SECONDS})
+    assert longest.window_size == MAX_WINDOW_SECONDS * 250
+
+    with pytest.raises(ValueError):
+        CaptureProfile.from_dict({'sample_rate': 250, 'window_size': MAX_WINDOW_SECONDS * 250 + 1})
+    with pytest.raises(ValueError):
+        CaptureProfile.from_dict({'window_seconds': 3600})
+
+def test_profile_without_image_has_no_mime_type():
+    assert CaptureProfile.from_dict({'preset': 'samples_only'}).mime_type is None
@@ -0,0 +1,72 @@
+"""Tests du raccord des fenêtres stockées et des indicateurs de qualité"""
+
+import numpy as np
+import pytest
+
+from ecg_analysis import contiguous_segments, stitch_windows, signal_quality, classify_signal_quality
+
+def _blob(first: int, count: int) -> bytes:
+    """Fenêtre dont chaque échantillon vaut son indice (rampe modulo l'échelle ADC)"""
+    return (np.arange(first, first + count) % 1024).astype('<u2').tobytes()
+
+def _window(first: int, count: int, sample_rate: int = 100) -> tuple:
+    return (first, sample_rate, _blob(first, count))
+
+@pytest.mark.parametrize('windows', [
+    [(0, 500), (500, 500), (1000, 500)],
+    [(0, 500), (400, 500), (800, 500)],
+    [(0, 500), (400, 150)],
+])
+def test_stitch_windows_removes_overlap(windows):
+    stitched = np.concatenate(list(stitch_windows((first, _blob(first, count)) for first, count in windows)))
+    end = max(first + count for first, count in windows)
+
+    assert np.array_equal(stitched, np.arange(end) % 1024)
+
+def test_stitch_windows_without_index_keeps_everything():
+    stitched = list(stitch_windows([(None, _blob(0, 10)), (None, _blob(0, 10))]))
+
+    assert [len(samples) for samples in stitched] == [10, 10]
+
+def test_contiguous_segments_joins_consecutive_and_overlapping_windows():
+    windows = [_window(0, 500), _window(400, 500), _window(900, 500)]
+
+    assert list(contiguous_segments(windows)) == [windows]
+
+def test_contiguous_segments_splits_on_new_session():
+    first_session = [_window(0, 500), _window(500, 500)]
+    second_session = [_window(0, 500), _window(500, 500)]
+
+    assert list(contiguous_segments(first_session + second_session)) == [first_session, second_session]
+
+def test_contiguous_segments_splits_on_missing_window():
+    # Fenêtre 500-999 écartée par le contrôle qualité ou perdue (spool plein)
+    windows = [_window(0, 500), _window(1000, 500), _window(1500, 500)]
+
+    assert list(contiguous_segments(windows)) == [windows[:1], windows[1:]]
+
+def test_contiguous_segments_splits_on_sample_rate_change():
+    windows = [_window(0, 500, 100), _window(500, 500, 250)]
+
+    assert list(contiguous_segments(windows)) == [windows[:1], windows[1:]]
+
+def test_contiguous_segments_isolates_windows_without_index():
+    windows = [(None, 100, _blob(0, 500)), (None, 100, _blob(0, 500))]
+
+    assert list(contiguous_segments(windows)) == [windows[:1], windows[1:]]
+
+def test_flat_signal_is_classified_flatline():
+    quality = signal_quality(np.full(500, 512, dtype='<u2'), 100)
+
+    assert classify_signal_quality(quality) == 'flatline'
+
+def test_saturated_signal_is_classified_saturation():
+    samples = np.where(np.arange(500) % 2, 0, 1023).astype('<u2')
+
+    assert classify_signal_quality(signal_quality(samples, 100)) == 'saturation'
+
+def test_clean_signal_is_accepted():
+    t = np.arange(500) / 100
+    samples = (512 + 200 * np.sin(2 * np.pi * 1.2 * t)).astype('<u2')
+
+    assert classify_signal_quality(signal_quality(samples, 100)) is None
@@ -0,0 +1,118 @@
+"""Tests du découpage en fenêtres de la boucle de capture"""
+
+import queue
+import threading
+
+import pytest
+
+import ecg_capture
+from capture_profile import CaptureProfile
+
+class FakeClock:
+    """Horloge qui n'avance que par les attentes"""
+
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+class MemoryDatabase:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return True
+        return call
+
+def _run_capture(tmp_path, monkeypatch, samples: int, window_size: int, overlap: int):
+    """Capturer exactement N échantillons et renvoyer les fenêtres émises (premier, dernier indice)"""
+    monkeypatch.setattr(ecg_capture.ECGCapture, 'SPOOL_DIR', str(tmp_path))
+    monkeypatch.setattr(ecg_capture.ECGCapture, 'QUALITY_CHECK', False)
+
+    profile = CaptureProfile(sample_rate=100, window_size=window_size, window_overlap=overlap, image_format='none')
+    capture = ecg_capture.ECGCapture(1, threading.Event(), profile=profile, db_manager=MemoryDatabase())
+    capture.clock = FakeClock()
+
+    emitted = []
+    read = capture._analog_read
+
+    def analog_read():
+        if capture.sample_count + 1 >= samples:
+            capture.stop_event.set()
+        return read()
+
+    capture._analog_read = analog_read
+    capture._save_to_database = lambda image, window=None, samples=b'', rendered=True: emitted.append(
+        (window['first_sample_index'], window['last_sample_index'])
+    )
+    capture.run()
+
+    assert capture.sample_count == samples
+    return emitted
+
+def test_windows_without_overlap(tmp_path, monkeypatch):
+    assert _run_capture(tmp_path, monkeypatch, 1000, 500, 0) == [(0, 499), (500, 999)]
+
+def test_partial_tail_is_emitted(tmp_path, monkeypatch):
+    assert _run_capture(tmp_path, monkeypatch, 620, 500, 0) == [(0, 499), (500, 619)]
+
+def test_overlapping_windows(tmp_path, monkeypatch):
+    assert _run_capture(tmp_path, monkeypatch, 1300, 500, 100) == [(0, 499), (400, 899), (800, 1299)]
+
+@pytest.mark.parametrize('samples', [500, 900])
+def test_stop_after_full_overlapping_window_emits_no_duplicate(tmp_path, monkeypatch, samples):
+    emitted = _run_capture(tmp_path, monkeypatch, samples, 500, 100)
+    assert emitted[-1][1] == samples - 1
+    assert len(emitted) == len(set(emitted))
+    assert len(emitted) == (1 if samples == 500 else 2)
+
+def test_overlapping_tail_keeps_overlap(tmp_path, monkeypatch):
+    assert _run_capture(tmp_path, monkeypatch, 550, 500, 100) == [(0, 499), (400, 549)]
+
+def _capture_with_queue(tmp_path, monkeypatch, stats_queue):
+    monkeypatch.setattr(ecg_capture.ECGCapture, 'SPOOL_DIR', str(tmp_path))
+    profile = CaptureProfile(sample_rate=100, window_size=500, image_format='none')
+    return ecg_capture.ECGCapture(1, threading.Event(), stats_queue=stats_queue, profile=profile,
+                                  db_manager=MemoryDatabase())
+
+def test_signal_issue_is_sent_to_parent_instead_of_written(tmp_path, monkeypatch):
+    stats = queue.Queue()
+    capture = _capture_with_queue(tmp_path, monkeypatch, stats)
+
+    capture._set_signal_issue('flatline')
+
+    messages = [stats.get_nowait() for _ in range(stats.qsize())]
+    signal = [payload for kind, _, payload in messages if kind == 'signal']
+    assert len(signal) == 1
+    assert signal[0]['issue'] == 'flatline' and signal[0]['new_event']
+    assert 'update_signal_quality' not in capture.db_manager.calls
+
+def test_standalone_capture_writes_signal_issue(tmp_path, monkeypatch):
+    capture = _capture_with_queue(tmp_path, monkeypatch, None)
+
+    capture._set_signal_issue('noise')
+
+    assert capture.db_manager.calls == ['update_signal_quality']
+
+def test_process_manager_persists_signal_issue():
+    process_manager = pytest.importorskip('process_manager')
+
+    class RecordingDatabase:
+        def __init__(self):
+            self.updates = []
+
+        def update_signal_quality(self, diagnostic_id, **quality):
+            self.updates.append((diagnostic_id, quality['issue']))
+
+    db = RecordingDatabase()
+    manager = process_manager.ECGProcessManager(db)
+    manager._handle_stats_message(('signal', 4, {'issue': 'saturation', 'issue_since': None,
+                                                 'suppressed_windows': 0, 'new_event': True}))
+
+    assert db.updates == [(4, 'saturation')]
@@ -0,0 +1,149 @@
+"""Tests des points d'accès du service : pagination par clé, erreurs de base de données et routage"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('flask')
+import ecg_service
+from database_manager import DatabaseManager
+from federation import NodeRegistry
+
+class FailingDatabase:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RuntimeError('Lost connection to MySQL server')
+        return fail
+
+class FeatureDatabase:
+    """Fenêtres de la plus récente à la plus ancienne, pagination comme search_window_features"""
+
+    def __init__(self, count):
+        start = datetime(2026, 3, 1, 12, 0, 0, 250000)
+        self.windows = [{'ecg_data_id': i, 'diagnostic_id': 1,
+                         'image_created_at': (start + timedelta(seconds=5 * (i // 2))).isoformat()}
+                        for i in range(count)]
+        self.windows.sort(key=lambda w: (w['image_created_at'], w['ecg_data_id']), reverse=True)
+        self.calls = []
+
+    def search_window_features(self, filters, match_any=False, since=None, until=None,
+                               diagnostic_ids=None, after=None, limit=100):
+        self.calls.append(after)
+        windows = self.windows
+        if after is not None:
+            windows = [w for w in windows
+                       if (datetime.fromisoformat(w['image_created_at']), w['ecg_data_id']) < after]
+        return windows[:limit]
+
+    def get_diagnostic_summary(self, diagnostic_id):
+        return None
+
+@pytest.fixture
+def client(monkeypatch):
+    def use(database):
+        monkeypatch.setattr(ecg_service, 'db_manager', database)
+        return ecg_service.app.test_client()
+    return use
+
+@pytest.mark.parametrize('created_at', [
+    datetime(2026, 3, 1, 12, 0, 0),
+    datetime(2026, 3, 1, 12, 0, 0, 250000),
+    datetime(2026, 3, 1, 12, 0, 0, tzinfo=timezone.utc),
+])
+def test_feature_cursor_round_trip(created_at):
+    cursor = ecg_service._format_feature_cursor({'image_created_at': created_at.isoformat(), 'ecg_data_id': 42})
+
+    assert ecg_service._parse_feature_cursor(cursor) == (created_at, 42)
+
+@pytest.mark.parametrize('cursor', ['42', '2026-03-01T12:00:00', '2026-03-01T12:00:00,abc', 'yesterday,42'])
+def test_malformed_feature_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        ecg_service._parse_feature_cursor(cursor)
+
+def test_missing_feature_cursor_starts_from_newest():
+    assert ecg_service._parse_feature_cursor(None) is None
+    assert ecg_service._parse_feature_cursor('') is None
+
+def test_feature_pages_cover_every_window_once(client):
+    database = FeatureDatabase(7)
+    http = client(database)
+
+    seen = []
+    cursor = None
+    while True:
+        response = http.get('/features', query_string={'limit': 3, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(w['ecg_data_id'] for w in response.json['windows'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == [w['ecg_data_id'] for w in database.windows]
+    assert len(database.calls) == 3
+
+def test_malformed_cursor_is_a_bad_request(client):
+    response = client(FeatureDatabase(1)).get('/features?cursor=42')
+
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('url', ['/features', '/summary/1', '/summaries?ids=1,2'])
+def test_database_errors_are_server_errors(client, url):
+    response = client(FailingDatabase()).get(url)
+
+    assert response.status_code == 500
+    assert 'Lost connection' in response.json['error']
+
+@pytest.mark.parametrize('url', ['/frames/1?window=5', '/frames/1?since=2026-03-01T12:00:00',
+                                 '/images/1/batch?ids=1,2'])
+def test_lookup_errors_are_not_reported_as_missing(client, monkeypatch, url):
+    database = DatabaseManager()
+    monkeypatch.setattr(database, '_get_connection', FailingDatabase().connect)
+
+    response = client(database).get(url)
+
+    assert response.status_code == 500
+    assert 'Lost connection' in response.json['error']
+
+def test_diagnostic_without_capture_is_not_found(client):
+    assert client(FeatureDatabase(0)).get('/summary/1').status_code == 404
+
+class ForwardingSession:
+    """Nœud distant répondant avec un statut donné"""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        class Forwarded:
+            status_code = self.status_code
+            content = b'{}'
+            headers = {'Content-Type': 'application/json'}
+        return Forwarded()
+
+@pytest.fixture
+def federation(monkeypatch):
+    def use(status_code):
+        registry = NodeRegistry(local_name='a', nodes='a=http://a,b=http://b')
+        registry.nodes['a'].captures_running = 2
+        registry.nodes['b'].healthy = True
+        registry.session = ForwardingSession(status_code)
+        monkeypatch.setattr(ecg_service, 'node_registry', registry)
+        return registry, ecg_service.app.test_client()
+    return use
+
+def test_failed_remote_start_releases_placement(federation):
+    registry, http = federation(500)
+
+    assert http.post('/capture/start/9').status_code == 500
+
+    assert registry.nodes['b'].captures_running == 0
+    assert 9 not in registry.assignments
+
+def test_remote_stop_releases_assignment(federation):
+    registry, http = federation(200)
+
+    assert http.post('/capture/start/9').status_code == 200
+    assert registry.assignments[9] == 'b'
+
+    assert http.post('/capture/stop/9').status_code == 200
+    assert 9 not in registry.assignments
@@ -0,0 +1,94 @@
+"""Tests du registre des nœuds : recherche du propriétaire, placement et assignations"""
+
+import pytest
+
+from federation import NodeRegistry
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+
+    def json(self):
+        return self.data
+
+class FakeSession:
+    """Nœuds distants simulés : diagnostics en cours par URL de nœud"""
+
+    def __init__(self, running=None):
+        self.running = running or {}
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(url)
+        base, _, diagnostic_id = url.rpartition('/capture/status/')
+        return FakeResponse(data={'is_running': int(diagnostic_id) in self.running.get(base, ())})
+
+@pytest.fixture
+def registry():
+    registry = NodeRegistry(local_name='a', nodes='a=http://a,b=http://b,c=http://c', unowned_ttl=10)
+    for node in registry.nodes.values():
+        node.healthy = True
+    registry.session = FakeSession({'http://c': {7}})
+    return registry
+
+def test_owner_is_found_on_remote_node_and_remembered(registry):
+    assert registry.owner(7).name == 'c'
+    assert registry.assignments[7] == 'c'
+
+    registry.session.requests.clear()
+    assert registry.owner(7).name == 'c'
+    assert registry.session.requests == []
+
+def test_unowned_diagnostic_is_not_searched_again_before_ttl(registry, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('federation.time.monotonic', lambda: now[0])
+
+    assert registry.owner(3) is None
+    assert len(registry.session.requests) == 2
+
+    now[0] += 5
+    assert registry.owner(3) is None
+    assert len(registry.session.requests) == 2
+
+    now[0] += 6
+    assert registry.owner(3) is None
+    assert len(registry.session.requests) == 4
+
+def test_assignment_replaces_negative_lookup(registry):
+    assert registry.owner(3) is None
+
+    registry.assign(3, registry.nodes['b'])
+
+    assert registry.owner(3).name == 'b'
+
+def test_failed_start_rolls_back_placement(registry):
+    node = registry.place(5)
+    assert node.captures_running == 1
+
+    registry.cancel_placement(5, node)
+
+    assert node.captures_running == 0
+
+def test_failed_restart_on_existing_owner_keeps_its_count(registry):
+    node = registry.place(5)
+    registry.assign(5, node)
+
+    assert registry.place(5) is node
+    registry.cancel_placement(5, node)
+
+    assert node.captures_running == 1
+
+def test_stopped_session_is_searched_again(registry):
+    registry.assign(7, registry.nodes['b'])
+
+    registry.unassign(7)
+
+    assert registry.owner(7).name == 'c'
+
+def test_unregistered_node_loses_its_sessions(registry):
+    registry.assign(4, registry.nodes['b'])
+
+    assert registry.unregister('b')
+
+    assert 4 not in registry.assignments
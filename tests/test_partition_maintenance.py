@@ -0,0 +1,184 @@
+"""Tests de la maintenance des partitions : partitions initiales, rétention et lignes orphelines"""
+
+import re
+from datetime import datetime
+
+from database_manager import DatabaseManager, _month_start
+from partition_maintenance import PartitionMaintenanceWorker
+
+class ScriptedConnection:
+    """Connexion dont les résultats dépendent de la requête ; journal des requêtes exécutées"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.log = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self, *args):
+        return ScriptedCursor(self)
+
+    def commit(self):
+        self.log.append('COMMIT')
+
+class ScriptedCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        sql = re.sub(r'\s+', ' ', sql).strip()
+        self.conn.log.append(sql)
+        self.rows, self.rowcount = self.conn.respond(sql, params)
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+class RecordingBlobStore:
+    def __init__(self, log):
+        self.log = log
+
+    def delete(self, blob_ref):
+        self.log.append(f'BLOB DELETE {blob_ref}')
+        return True
+
+def _database(monkeypatch, respond, partitions):
+    db = DatabaseManager()
+    conn = ScriptedConnection(respond)
+    db.blob_store = RecordingBlobStore(conn.log)
+    monkeypatch.setattr(db, '_get_connection', lambda: conn)
+    monkeypatch.setattr(db, 'get_ecg_partitions', lambda: partitions)
+    return db, conn
+
+def _index(log, prefix):
+    return next(i for i, sql in enumerate(log) if sql.startswith(prefix))
+
+def test_first_partitions_keep_history_out_of_current_month(monkeypatch):
+    db, conn = _database(monkeypatch, lambda sql, params: ([], 0),
+                         [{'name': 'p_future', 'upper_bound': None, 'rows': 0}])
+
+    created = db.ensure_ecg_partitions(months_ahead=3)
+
+    month = _month_start(datetime.now())
+    assert created == ['p_history'] + [f'p{_month_start(month, i):%Y%m}' for i in range(4)]
+    assert f"PARTITION p_history VALUES LESS THAN ('{month:%Y-%m-%d}')" in conn.log[0]
+
+def test_existing_partitions_are_extended_from_last_bound(monkeypatch):
+    month = _month_start(datetime.now())
+    db, _ = _database(monkeypatch, lambda sql, params: ([], 0), [
+        {'name': 'p_history', 'upper_bound': month, 'rows': 0},
+        {'name': f'p{month:%Y%m}', 'upper_bound': _month_start(month, 1), 'rows': 0},
+        {'name': 'p_future', 'upper_bound': None, 'rows': 0},
+    ])
+
+    assert db.ensure_ecg_partitions(months_ahead=1) == [f'p{_month_start(month, 1):%Y%m}']
+
+class ExpiredPartition:
+    """Réponses d'une partition expirée ; le DDL peut échouer et la trace des décomptes persiste"""
+
+    def __init__(self, fail_drop):
+        self.fail_drop = fail_drop
+        self.adjusted = set()
+
+    def __call__(self, sql, params):
+        if sql.startswith('SELECT DISTINCT blob_ref'):
+            return [('ref1',)], 1
+        if sql.startswith('SELECT diagnostic_id, COUNT(*)'):
+            return [(7, 10, 4, 5000, 5000)], 1
+        if sql.startswith('INSERT IGNORE INTO ecg_partition_drops'):
+            if params in self.adjusted:
+                return [], 0
+            self.adjusted.add(params)
+            return [], 1
+        if sql.startswith('ALTER TABLE ecg_data DROP PARTITION') and self.fail_drop:
+            raise RuntimeError('Lock wait timeout exceeded')
+        return [], 0
+
+def test_partition_is_dropped_last_and_summaries_adjusted_once(monkeypatch):
+    respond = ExpiredPartition(fail_drop=True)
+    db, conn = _database(monkeypatch, respond, [
+        {'name': 'p202001', 'upper_bound': datetime(2020, 2, 1), 'rows': 10},
+        {'name': 'p_future', 'upper_bound': None, 'rows': 0},
+    ])
+
+    assert db.drop_expired_ecg_partitions(retention_months=1) == []
+
+    log = conn.log
+    drop = _index(log, 'ALTER TABLE ecg_data DROP PARTITION')
+    assert drop == len(log) - 1
+    assert _index(log, 'UPDATE ecg_diagnostic_summary') < _index(log, 'COMMIT') < drop
+    assert _index(log, 'DELETE FROM ecg_window_features') < drop
+    results = _index(log, 'DELETE FROM ecg_analysis_results')
+    assert results < _index(log, 'COMMIT')
+    assert 'WHERE diagnostic_id = %s AND image_created_at < %s' in log[results]
+    assert _index(log, 'BLOB DELETE ref1') < drop
+
+    # Nouvelle passe : le DDL réussit, les résumés ne sont pas décomptés une seconde fois
+    respond.fail_drop = False
+    conn.log.clear()
+
+    assert db.drop_expired_ecg_partitions(retention_months=1) == ['p202001']
+    assert not any(sql.startswith('UPDATE ecg_diagnostic_summary') for sql in conn.log)
+    assert conn.log[-1] == 'ALTER TABLE ecg_data DROP PARTITION p202001'
+
+def test_orphan_windows_are_deleted_in_batches(monkeypatch):
+    deletes = {'ecg_data': [3, 1], 'ecg_window_features': [2], 'ecg_analysis_results': [0],
+               'ecg_deleted_diagnostics': [1]}
+
+    def respond(sql, params):
+        if sql.startswith('SELECT diagnostic_id FROM ecg_deleted_diagnostics'):
+            return [(42,)], 1
+        if sql.startswith('SELECT DISTINCT blob_ref'):
+            return [('ref1',)], 1
+        if sql.startswith('DELETE FROM'):
+            return [], deletes[sql.split()[2]].pop(0)
+        return [], 0
+
+    db, conn = _database(monkeypatch, respond, [])
+
+    deleted = db.delete_orphan_ecg_data(batch_size=3)
+
+    assert deleted == {'diagnostics': 1, 'windows': 4, 'features': 2, 'results': 0}
+    assert all(not remaining for remaining in deletes.values())
+    assert 'BLOB DELETE ref1' in conn.log
+    # La file n'est vidée qu'une fois les données supprimées ; ecg_data n'est jamais parcourue
+    assert _index(conn.log, 'DELETE FROM ecg_deleted_diagnostics') > _index(conn.log, 'BLOB DELETE ref1')
+    assert conn.log[-1] == 'COMMIT'
+    assert not any('LEFT JOIN' in sql for sql in conn.log)
+
+def test_worker_cleans_orphans_on_each_pass():
+    class MemoryDatabase:
+        def __init__(self):
+            self.calls = []
+
+        def ensure_ecg_partitions(self, months_ahead):
+            self.calls.append('ensure')
+            return []
+
+        def drop_expired_ecg_partitions(self, retention_months):
+            self.calls.append('drop')
+            return []
+
+        def delete_orphan_ecg_data(self):
+            self.calls.append('orphans')
+            return {'diagnostics': 1, 'windows': 5, 'features': 5, 'results': 0}
+
+    db = MemoryDatabase()
+    result = PartitionMaintenanceWorker(db, retention_months=12).run_once()
+
+    assert db.calls == ['ensure', 'drop', 'orphans']
+    assert result['orphans']['windows'] == 5
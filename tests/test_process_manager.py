@@ -0,0 +1,32 @@
+"""Tests du gestionnaire de processus : suivi des profilages"""
+
+import pytest
+
+process_manager = pytest.importorskip('process_manager')
+
+def _request(manager, diagnostic_id, index, status='completed'):
+    name = f'diagnostic_{diagnostic_id}_{index:04d}.folded'
+    manager.profiles[name] = {'name': name, 'diagnostic_id': diagnostic_id, 'mode': 'sampling',
+                              'duration': 1.0, 'requested_at': f'2026-10-19T12:00:00.{index:06d}',
+                              'status': status, 'error': None}
+    return name
+
+def test_profile_status_follows_capture_messages():
+    manager = process_manager.ECGProcessManager()
+    name = _request(manager, 3, 0, status='requested')
+
+    manager._handle_stats_message(('profile', 3, {'path': f'/tmp/ecg_profiles/{name}', 'status': 'running'}))
+
+    assert manager.get_profiles(3)[0]['status'] == 'running'
+
+def test_session_end_keeps_only_recent_profiles():
+    manager = process_manager.ECGProcessManager()
+    names = [_request(manager, 3, i) for i in range(process_manager.PROFILE_HISTORY + 5)]
+    other = _request(manager, 4, 0)
+
+    with manager.lock:
+        manager._cleanup_process(3)
+
+    kept = [p['name'] for p in manager.get_profiles(3)]
+    assert kept == names[::-1][:process_manager.PROFILE_HISTORY]
+    assert [p['name'] for p in manager.get_profiles(4)] == [other]
@@ -0,0 +1,84 @@
+"""Tests du format des trames de forme d'onde"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from waveform_frame import (encode_frame, encode_window_frames, decode_frame, decode_frames,
+                            FRAME_HEADER, ADC_GAIN)
+
+@pytest.mark.parametrize('encoding', ['int16', 'delta'])
+def test_round_trip(encoding):
+    samples = np.random.default_rng(1).integers(0, 1024, 500)
+
+    frame = decode_frame(encode_frame(samples, 100, 1700000000.5, encoding))
+
+    assert frame['encoding'] == encoding
+    assert frame['sample_rate'] == 100
+    assert frame['start'] == 1700000000.5
+    assert frame['gain'] == pytest.approx(ADC_GAIN)
+    assert np.array_equal(frame['samples'], samples)
+
+def test_delta_escapes_large_steps():
+    samples = np.array([512, 513, 0, 1023, 1022, 512])
+
+    data = encode_frame(samples, 100, 0.0, 'delta')
+
+    assert np.array_equal(decode_frame(data)['samples'], samples)
+    # 2 octets pour la première valeur, 1 par petit écart, 3 par échappement
+    assert len(data) == FRAME_HEADER.size + 2 + 1 + 3 + 3 + 1 + 3
+
+def test_delta_is_smaller_than_int16_for_smooth_signal():
+    t = np.arange(500) / 100
+    samples = (512 + 200 * np.sin(2 * np.pi * 1.2 * t)).astype(np.int32)
+
+    assert len(encode_frame(samples, 100, 0.0, 'delta')) < len(encode_frame(samples, 100, 0.0, 'int16'))
+
+@pytest.mark.parametrize('encoding', ['int16', 'delta'])
+def test_empty_frame(encoding):
+    data = encode_frame(np.array([], dtype=np.int32), 100, 0.0, encoding)
+
+    assert len(data) == FRAME_HEADER.size
+    assert len(decode_frame(data)['samples']) == 0
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        encode_frame(np.zeros(10), 100, 0.0, 'gzip')
+
+def test_invalid_and_truncated_frames_are_rejected():
+    data = encode_frame(np.arange(100), 100, 0.0)
+
+    with pytest.raises(ValueError):
+        decode_frame(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        decode_frame(data[:-1])
+
+def _window(first: int, count: int, end: float) -> tuple:
+    """Fenêtre stockée : image_created_at à la fin de la fenêtre"""
+    blob = (np.arange(first, first + count) % 1024).astype('<u2').tobytes()
+    return (first, 100, blob, datetime.fromtimestamp(end, tz=timezone.utc))
+
+def test_window_frames_split_at_discontinuities():
+    windows = [
+        _window(0, 500, 1005.0), _window(400, 500, 1009.0),
+        # Fenêtre 800-1299 absente
+        _window(1200, 500, 1017.0),
+        # Nouvelle session
+        _window(0, 500, 2005.0)
+    ]
+
+    frames = decode_frames(b''.join(encode_window_frames(windows)))
+
+    assert [len(frame['samples']) for frame in frames] == [900, 500, 500]
+    assert [frame['start'] for frame in frames] == [1000.0, 1012.0, 2000.0]
+    assert np.array_equal(frames[0]['samples'], np.arange(900))
+    assert np.array_equal(frames[1]['samples'], np.arange(1200, 1700) % 1024)
+
+def test_window_frames_of_continuous_recording_form_one_frame():
+    windows = [_window(i * 500, 500, 1005.0 + i * 5) for i in range(4)]
+
+    frames = encode_window_frames(windows, 'int16')
+
+    assert len(frames) == 1
+    assert np.array_equal(decode_frame(frames[0])['samples'], np.arange(2000) % 1024)
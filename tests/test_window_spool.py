@@ -0,0 +1,210 @@
+"""Tests du spool disque et de son vidage"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from window_spool import WindowSpool, SpoolReplayer, PermanentWriteError, SEGMENT_SUFFIX, DEAD_LETTER_DIR
+
+class MemoryDatabase:
+    """Base en mémoire : fenêtres enregistrées, échec ou blocage à la demande"""
+
+    def __init__(self, fail: bool = False, reject=()):
+        self.windows = []
+        self.fail = fail
+        # Indices de fenêtres refusées définitivement (clé étrangère, valeur trop grande)
+        self.reject = set(reject)
+        self.batches = []
+
+    def save_ecg_images(self, windows):
+        self.batches.append([window['index'] for window in windows if 'index' in window])
+        if self.fail:
+            return False
+        if any(window.get('index') in self.reject for window in windows):
+            raise PermanentWriteError('Cannot add or update a child row: a foreign key constraint fails')
+        self.windows.extend(windows)
+        return True
+
+def _window(index: int):
+    return {'diagnostic_id': 1, 'index': index, 'image_size': 3}, b'img' + bytes([index]) * 4
+
+def _wait(condition, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def test_append_peek_commit(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    for i in range(3):
+        assert spool.append(*_window(i))
+
+    records, position = spool.peek(2)
+    assert [meta['index'] for meta, _ in records] == [0, 1]
+    spool.commit(position, 2, sum(len(data) for _, data in records))
+
+    assert spool.pending_windows == 1
+    records, _ = spool.peek(10)
+    assert [meta['index'] for meta, _ in records] == [2]
+
+def test_reopen_resumes_from_checkpoint(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    for i in range(4):
+        spool.append(*_window(i))
+    records, position = spool.peek(3)
+    spool.commit(position, 3, sum(len(data) for _, data in records))
+    spool.close()
+
+    reopened = WindowSpool(str(tmp_path))
+    assert reopened.pending_windows == 1
+    assert [meta['index'] for meta, _ in reopened.peek(10)[0]] == [3]
+
+def test_truncated_record_is_ignored(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    spool.append(*_window(0))
+    spool.append(*_window(1))
+    spool.close()
+
+    # Écriture interrompue : fin du dernier enregistrement perdue
+    segment = sorted(f for f in os.listdir(tmp_path) if f.endswith(SEGMENT_SUFFIX))[-1]
+    path = os.path.join(tmp_path, segment)
+    os.truncate(path, os.path.getsize(path) - 2)
+
+    reopened = WindowSpool(str(tmp_path))
+    assert reopened.pending_windows == 1
+    assert reopened.append(*_window(2))
+    assert [meta['index'] for meta, _ in reopened.peek(10)[0]] == [0, 2]
+
+def test_full_spool_drops_windows(tmp_path):
+    spool = WindowSpool(str(tmp_path), max_bytes=10)
+    assert spool.append(*_window(0))
+    assert not spool.append(*_window(1))
+    assert spool.dropped_windows == 1
+
+def test_consumed_segments_are_removed(tmp_path):
+    spool = WindowSpool(str(tmp_path), segment_bytes=1)
+    for i in range(3):
+        spool.append(*_window(i))
+    records, position = spool.peek(3)
+    spool.commit(position, 3, sum(len(data) for _, data in records))
+
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(SEGMENT_SUFFIX)]) == 1
+
+def test_replayer_splits_image_and_samples(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    spool.append({'diagnostic_id': 1, 'image_size': 2}, b'imSAMPLES')
+    db = MemoryDatabase()
+
+    assert SpoolReplayer(spool, db).drain_once() == 1
+    assert db.windows[0]['image_blob'] == b'im'
+    assert db.windows[0]['samples_blob'] == b'SAMPLES'
+    assert spool.pending_windows == 0
+
+def test_replayer_keeps_windows_on_failure(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    spool.append(*_window(0))
+
+    assert SpoolReplayer(spool, MemoryDatabase(fail=True)).drain_once() == -1
+    assert spool.pending_windows == 1
+
+def test_rejected_window_is_set_aside(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    for i in range(5):
+        spool.append(*_window(i))
+    db = MemoryDatabase(reject={2})
+    replayer = SpoolReplayer(spool, db, batch_size=5)
+
+    while replayer.drain_once() > 0:
+        pass
+
+    assert [window['index'] for window in db.windows] == [0, 1, 3, 4]
+    assert spool.pending_windows == 0
+    assert spool.status()['dead_letter_windows'] == 1
+
+    # Lot refusé rejoué fenêtre par fenêtre, puis retour aux lots complets
+    assert db.batches == [[0, 1, 2, 3, 4], [0], [1], [2], [3], [4]]
+
+    dead_letter = WindowSpool(str(tmp_path / DEAD_LETTER_DIR))
+    records, _ = dead_letter.peek(10)
+    assert [(meta['index'], 'foreign key' in meta['error']) for meta, _ in records] == [(2, True)]
+
+def test_batches_resume_after_rejected_window(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    for i in range(3):
+        spool.append(*_window(i))
+    db = MemoryDatabase(reject={0})
+    replayer = SpoolReplayer(spool, db, batch_size=3)
+
+    assert replayer.drain_once() == 1
+    for i in range(3, 6):
+        spool.append(*_window(i))
+    while replayer.drain_once() > 0:
+        pass
+
+    assert db.batches == [[0, 1, 2], [0], [1], [2], [3, 4, 5]]
+
+def test_orphan_replayer_releases_lock_when_empty(tmp_path):
+    spool = WindowSpool(str(tmp_path))
+    for i in range(3):
+        spool.append(*_window(i))
+    spool.close()
+
+    db = MemoryDatabase()
+    orphan = SpoolReplayer(WindowSpool(str(tmp_path)), db, exit_when_empty=True)
+    orphan.start()
+    orphan.thread.join(timeout=5)
+
+    assert not orphan.thread.is_alive()
+    assert len(db.windows) == 3
+    assert SpoolReplayer(WindowSpool(str(tmp_path)), db)._acquire_lock()
+
+def test_orphan_drain_then_new_capture(tmp_path):
+    """Une capture qui reprend un spool vidé par un orphelin compte ses fenêtres et vide son spool"""
+    spool = WindowSpool(str(tmp_path))
+    for i in range(3):
+        spool.append(*_window(i))
+    spool.close()
+
+    db = MemoryDatabase()
+    orphan = SpoolReplayer(WindowSpool(str(tmp_path)), db, exit_when_empty=True)
+    orphan.start()
+    orphan.thread.join(timeout=5)
+
+    saved = []
+    capture_spool = WindowSpool(str(tmp_path))
+    capture = SpoolReplayer(capture_spool, db, on_saved=saved.extend)
+    capture.start()
+    for i in range(3, 5):
+        capture_spool.append(*_window(i))
+
+    try:
+        assert _wait(lambda: len(db.windows) == 5)
+        assert _wait(lambda: capture_spool.pending_windows == 0)
+        assert [meta['index'] for meta in saved] == [3, 4]
+        assert capture._lock_file is not None
+    finally:
+        capture.stop(drain_timeout=0)
+
+def test_process_manager_stops_orphan_before_capture(tmp_path, monkeypatch):
+    """Un orphelin bloqué sur une base en échec rend le verrou quand la capture redémarre"""
+    process_manager = pytest.importorskip('process_manager')
+    from ecg_capture import ECGCapture
+
+    monkeypatch.setattr(ECGCapture, 'SPOOL_DIR', str(tmp_path))
+    spool_dir = os.path.join(tmp_path, 'diagnostic_7')
+    spool = WindowSpool(spool_dir)
+    spool.append(*_window(0))
+    spool.close()
+
+    manager = process_manager.ECGProcessManager()
+    assert manager.drain_orphan_spools(MemoryDatabase(fail=True)) == 1
+    orphan = manager.spool_replayers['diagnostic_7']
+    assert _wait(lambda: orphan._lock_file is not None)
+
+    manager._stop_orphan_replayer(7)
+
+    assert not orphan.thread.is_alive()
+    assert 'diagnostic_7' not in manager.spool_replayers
+    assert SpoolReplayer(WindowSpool(spool_dir), MemoryDatabase())._acquire_lock()
@@ -72,6 +72,40 @@ function makeHttpRequest($url, $method = 'GET', $data = null) {
     return ['data' => $decoded, 'http_code' => $httpCode];
 }
 
+/**
+ * Effectuer une requête GET vers le service Python sans décoder la réponse
+ * (en-têtes de réponse renvoyés avec des noms en minuscules)
+ */
+function makeRawHttpRequest($url, $headers = []) {
+    $ch = curl_init();
+    $responseHeaders = [];
+    
+    curl_setopt($ch, CURLOPT_URL, $url);
+    curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+    curl_setopt($ch, CURLOPT_TIMEOUT, 30);
+    curl_setopt($ch, CURLOPT_HTTPHEADER, $headers);
+    curl_setopt($ch, CURLOPT_HEADERFUNCTION, function ($ch, $line) use (&$responseHeaders) {
+        $parts = explode(':', $line, 2);
+        if (count($parts) === 2) {
+            $responseHeaders[strtolower(trim($parts[0]))] = trim($parts[1]);
+        }
+        return strlen($line);
+    });
+    
+    $response = curl_exec($ch);
+    $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+    $contentType = curl_getinfo($ch, CURLINFO_CONTENT_TYPE);
+    $error = curl_error($ch);
+    
+    curl_close($ch);
+    
+    if ($error) {
+        return ['error' => 'Erreur de connexion: ' . $error, 'http_code' => 0];
+    }
+    
+    return ['body' => $response, 'http_code' => $httpCode, 'content_type' => $contentType, 'headers' => $responseHeaders];
+}
+
 /**
  * Vérifier que le diagnostic existe et appartient à l'utilisateur
  */
@@ -126,8 +160,11 @@ try {
             
             $diagnostic = validateDiagnosticAccess($diagnosticId);
             
+            // Profil de capture optionnel transmis tel quel au service Python
+            $profile = json_decode(file_get_contents('php://input'), true);
+            
             // Démarrer la capture via le service Python
-            $response = makeHttpRequest($ECG_SERVICE_URL . '/capture/start/' . $diagnosticId, 'POST');
+            $response = makeHttpRequest($ECG_SERVICE_URL . '/capture/start/' . $diagnosticId, 'POST', is_array($profile) ? $profile : null);
             
             if ($response['http_code'] === 200) {
                 echo json_encode([
@@ -200,6 +237,33 @@ try {
             }
             break;
             
+        case 'summary':
+            if ($method !== 'GET') {
+                http_response_code(405);
+                echo json_encode(['error' => 'Méthode non autorisée']);
+                exit();
+            }
+            
+            $diagnostic = validateDiagnosticAccess($diagnosticId);
+            
+            // Résumé maintenu par le service Python (nombre de fenêtres, volume, durée)
+            $response = makeHttpRequest($ECG_SERVICE_URL . '/summary/' . $diagnosticId, 'GET');
+            
+            if ($response['http_code'] === 200) {
+                echo json_encode([
+                    'success' => true,
+                    'diagnostic_id' => $diagnosticId,
+                    'data' => $response['data']
+                ]);
+            } else {
+                http_response_code($response['http_code'] ?: 500);
+                echo json_encode([
+                    'error' => $response['data']['error'] ?? 'Erreur lors de la récupération du résumé',
+                    'diagnostic_id' => $diagnosticId
+                ]);
+            }
+            break;
+            
         case 'images':
             if ($method !== 'GET') {
                 http_response_code(405);
@@ -244,7 +308,7 @@ try {
             }
             
             // Vérifier que l'image existe et récupérer le diagnostic associé
-            $sql = "SELECT e.id, e.diagnostic_id 
+            $sql = "SELECT e.id, e.diagnostic_id, e.image_created_at 
                     FROM ecg_data e 
                     JOIN diagnostics d ON e.diagnostic_id = d.id 
                     WHERE e.id = ?";
@@ -257,8 +321,11 @@ try {
                 exit();
             }
             
-            // Récupérer l'image via le service Python
-            $response = makeHttpRequest($ECG_SERVICE_URL . '/image/' . $imageId, 'GET');
+            // Récupérer l'image via le service Python (la date limite la lecture à une partition)
+            $response = makeHttpRequest(
+                $ECG_SERVICE_URL . '/image/' . $imageId . '?created_at=' . urlencode($imageInfo['image_created_at']),
+                'GET'
+            );
             
             if ($response['http_code'] === 200) {
                 echo json_encode([
@@ -275,6 +342,122 @@ try {
             }
             break;
             
+        case 'image_batch':
+            if ($method !== 'GET') {
+                http_response_code(405);
+                echo json_encode(['error' => 'Méthode non autorisée']);
+                exit();
+            }
+            
+            $diagnostic = validateDiagnosticAccess($diagnosticId);
+            
+            // Liste d'IDs d'images séparés par des virgules
+            $imageIds = array_filter(explode(',', $_GET['ids'] ?? ''), 'strlen');
+            
+            if (empty($imageIds) || count(array_filter($imageIds, 'ctype_digit')) !== count($imageIds)) {
+                http_response_code(400);
+                echo json_encode(['error' => 'Liste d\'images invalide']);
+                exit();
+            }
+            
+            // Récupérer les images en une requête, réponse binaire transmise telle quelle
+            $response = makeRawHttpRequest(
+                $ECG_SERVICE_URL . '/images/' . $diagnosticId . '/batch?ids=' . implode(',', $imageIds)
+            );
+            
+            if ($response['http_code'] === 200) {
+                header('Content-Type: application/octet-stream');
+                echo $response['body'];
+            } else {
+                $data = json_decode($response['body'] ?? '', true);
+                http_response_code($response['http_code'] ?: 500);
+                echo json_encode([
+                    'error' => $data['error'] ?? $response['error'] ?? 'Erreur lors de la récupération des images',
+                    'diagnostic_id' => $diagnosticId
+                ]);
+            }
+            break;
+            
+        case 'frames':
+            if ($method !== 'GET') {
+                http_response_code(405);
+                echo json_encode(['error' => 'Méthode non autorisée']);
+                exit();
+            }
+            
+            $diagnostic = validateDiagnosticAccess($diagnosticId);
+            
+            // Trame binaire d'une fenêtre ou d'une période ; l'ETag est relayé pour le cache du navigateur
+            $query = array_filter($_GET, function ($value, $key) {
+                return in_array($key, ['window', 'created_at', 'since', 'until', 'encoding'], true) && is_string($value);
+            }, ARRAY_FILTER_USE_BOTH);
+            
+            $headers = [];
+            if (!empty($_SERVER['HTTP_IF_NONE_MATCH'])) {
+                $headers[] = 'If-None-Match: ' . $_SERVER['HTTP_IF_NONE_MATCH'];
+            }
+            
+            $response = makeRawHttpRequest(
+                $ECG_SERVICE_URL . '/frames/' . $diagnosticId . '?' . http_build_query($query),
+                $headers
+            );
+            
+            if ($response['http_code'] === 200 || $response['http_code'] === 304) {
+                http_response_code($response['http_code']);
+                foreach (['etag' => 'ETag', 'cache-control' => 'Cache-Control', 'x-window-count' => 'X-Window-Count',
+                          'x-frame-count' => 'X-Frame-Count'] as $key => $name) {
+                    if (isset($response['headers'][$key])) {
+                        header($name . ': ' . $response['headers'][$key]);
+                    }
+                }
+                if ($response['http_code'] === 200) {
+                    header('Content-Type: application/octet-stream');
+                    echo $response['body'];
+                } else {
+                    header_remove('Content-Type');
+                }
+            } else {
+                $data = json_decode($response['body'] ?? '', true);
+                http_response_code($response['http_code'] ?: 500);
+                echo json_encode([
+                    'error' => $data['error'] ?? $response['error'] ?? 'Erreur lors de la récupération du tracé',
+                    'diagnostic_id' => $diagnosticId
+                ]);
+            }
+            break;
+            
+        case 'features':
+            if ($method !== 'GET') {
+                http_response_code(405);
+                echo json_encode(['error' => 'Méthode non autorisée']);
+                exit();
+            }
+            
+            $diagnostic = validateDiagnosticAccess($diagnosticId);
+            
+            // Recherche par caractéristiques limitée au diagnostic (bornes, période, pagination)
+            $query = array_filter($_GET, function ($value, $key) {
+                return preg_match('/^([a-z_]+_(min|max)|match|since|until|limit|cursor)$/', $key) && is_string($value);
+            }, ARRAY_FILTER_USE_BOTH);
+            $query['diagnostic_ids'] = $diagnosticId;
+            
+            $response = makeHttpRequest($ECG_SERVICE_URL . '/features?' . http_build_query($query), 'GET');
+            
+            if ($response['http_code'] === 200) {
+                echo json_encode([
+                    'success' => true,
+                    'diagnostic_id' => $diagnosticId,
+                    'data' => $response['data']
+                ]);
+            } else {
+                http_response_code($response['http_code'] ?: 500);
+                echo json_encode([
+                    'error' => $response['data']['error'] ?? 'Erreur lors de la recherche des fenêtres',
+                    'diagnostic_id' => $diagnosticId
+                ]);
+            }
+            break;
+            
         case 'health':
             if ($method !== 'GET') {
                 http_response_code(405);
@@ -10,8 +10,11 @@ class ECGRealtimeController {
         this.captureStartTime = null;
         this.refreshInterval = null;
         this.imageCache = new Map();
+        this.imageBatchSize = config.imageBatchSize || 50;
         this.retryCount = 0;
         this.maxRetries = config.maxRetries || 3;
+        this.signalIssue = null;
+        this.liveWindowId = null;
         
         // Éléments DOM
         this.elements = {};
@@ -57,7 +60,9 @@ class ECGRealtimeController {
             imageModal: new bootstrap.Modal(document.getElementById('imageModal')),
             modalImage: document.getElementById('modalImage'),
             imageInfo: document.getElementById('imageInfo'),
-            downloadBtn: document.getElementById('downloadImageBtn')
+            downloadBtn: document.getElementById('downloadImageBtn'),
+            liveWaveform: document.getElementById('liveWaveform'),
+            liveWaveformCanvas: document.getElementById('liveWaveformCanvas')
         };
     }
     
@@ -196,6 +201,11 @@ class ECGRealtimeController {
                 const images = response.data.images || [];
                 this.renderGallery(images);
                 this.updateImageCount(images.length);
+                
+                // Galerie triée de la plus récente à la plus ancienne
+                if (this.isCapturing && images.length > 0) {
+                    this.showLiveWaveform(images[0].id);
+                }
             }
             
         } catch (error) {
@@ -225,6 +235,9 @@ class ECGRealtimeController {
             const imageElement = this.createImageElement(image, index);
             gallery.appendChild(imageElement);
         });
+        
+        // Charger les miniatures par lots plutôt qu'une requête par image
+        this.loadImageThumbnails(images.map(image => image.id));
     }
     
     /**
@@ -268,37 +281,244 @@ class ECGRealtimeController {
             }
         });
         
-        // Charger l'image de manière asynchrone
-        this.loadImageThumbnail(image.id, div);
-        
         return div;
     }
     
     /**
-     * Charger la miniature d'une image
+     * Charger les miniatures de la galerie par lots
      */
-    async loadImageThumbnail(imageId, container) {
-        try {
-            const response = await this.apiRequest(`/image/${imageId}`, 'GET');
+    async loadImageThumbnails(imageIds) {
+        const missing = [];
+        
+        imageIds.forEach(imageId => {
+            const imageData = this.imageCache.get(imageId);
+            if (imageData) {
+                this.showThumbnail(imageId, imageData);
+            } else {
+                missing.push(imageId);
+            }
+        });
+        
+        for (let i = 0; i < missing.length; i += this.imageBatchSize) {
+            const batch = missing.slice(i, i + this.imageBatchSize);
             
-            if (response.success && response.data.image_data) {
-                const imgElement = container.querySelector('.image-thumbnail');
-                const loadingElement = container.querySelector('.image-loading');
+            try {
+                const images = await this.fetchImageBatch(batch);
                 
-                imgElement.src = `data:image/png;base64,${response.data.image_data}`;
-                imgElement.onload = () => {
-                    loadingElement.style.display = 'none';
-                    imgElement.style.display = 'block';
-                };
+                batch.forEach(imageId => {
+                    const imageData = images.get(imageId);
+                    if (imageData) {
+                        this.imageCache.set(imageId, imageData);
+                        this.showThumbnail(imageId, imageData);
+                    } else {
+                        this.showThumbnailError(imageId);
+                    }
+                });
                 
-                // Mettre en cache
-                this.imageCache.set(imageId, response.data);
+            } catch (error) {
+                console.error('Error loading image batch:', error);
+                batch.forEach(imageId => this.showThumbnailError(imageId));
+            }
+        }
+    }
+    
+    /**
+     * Récupérer un lot d'images (réponse binaire préfixée par longueur)
+     *
+     * Chaque enregistrement : id, taille des métadonnées, taille de l'image (uint32 little-endian),
+     * métadonnées JSON puis contenu de l'image.
+     */
+    async fetchImageBatch(imageIds) {
+        const url = `${this.config.apiBaseUrl}/image_batch/${this.config.diagnosticId}?ids=${imageIds.join(',')}`;
+        const response = await fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}});
+        
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        
+        const buffer = await response.arrayBuffer();
+        const view = new DataView(buffer);
+        const decoder = new TextDecoder();
+        const images = new Map();
+        let offset = 0;
+        
+        while (offset + 12 <= buffer.byteLength) {
+            const imageId = view.getUint32(offset, true);
+            const metaLength = view.getUint32(offset + 4, true);
+            const dataLength = view.getUint32(offset + 8, true);
+            offset += 12;
+            
+            const meta = JSON.parse(decoder.decode(new Uint8Array(buffer, offset, metaLength)));
+            offset += metaLength;
+            
+            const blob = new Blob([new Uint8Array(buffer, offset, dataLength)], {type: meta.mime_type});
+            offset += dataLength;
+            
+            images.set(imageId, {...meta, image_id: imageId, url: URL.createObjectURL(blob)});
+        }
+        
+        return images;
+    }
+
+    /**
+     * Récupérer le tracé d'une fenêtre ou d'une période en trames binaires, une par segment
+     * continu (le cache HTTP du navigateur revalide par ETag)
+     */
+    async fetchWaveformFrames(params) {
+        const query = new URLSearchParams(params).toString();
+        const url = `${this.config.apiBaseUrl}/frames/${this.config.diagnosticId}?${query}`;
+        const response = await fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}});
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        return this.decodeWaveformFrames(await response.arrayBuffer());
+    }
+
+    /**
+     * Décoder les trames d'une réponse (voir scripts/waveform_frame.py)
+     *
+     * En-tête little-endian de 30 octets : 'ECGF', version, encodage (0 int16, 1 delta),
+     * fréquence (uint16), gain (float32), ligne de base (int16), début (float64), nombre (uint32),
+     * taille des échantillons codés (uint32), la trame suivante commençant juste après.
+     * Delta : première valeur int16 puis écarts int8, -128 annonçant une valeur int16 complète.
+     */
+    decodeWaveformFrames(buffer) {
+        const view = new DataView(buffer);
+        const frames = [];
+        let frameOffset = 0;
+
+        while (frameOffset < buffer.byteLength) {
+            const magic = String.fromCharCode(...new Uint8Array(buffer, frameOffset, 4));
+
+            if (magic !== 'ECGF' || view.getUint8(frameOffset + 4) !== 1) {
+                throw new Error('Trame ECG invalide');
+            }
+
+            const encoding = view.getUint8(frameOffset + 5);
+            const sampleRate = view.getUint16(frameOffset + 6, true);
+            const gain = view.getFloat32(frameOffset + 8, true);
+            const baseline = view.getInt16(frameOffset + 12, true);
+            const start = view.getFloat64(frameOffset + 14, true);
+            const count = view.getUint32(frameOffset + 22, true);
+            const size = view.getUint32(frameOffset + 26, true);
+            const voltages = new Float32Array(count);
+            let offset = frameOffset + 30;
+            let value = 0;
+
+            for (let i = 0; i < count; i++) {
+                if (encoding === 0 || i === 0) {
+                    value = view.getInt16(offset, true);
+                    offset += 2;
+                } else {
+                    const delta = view.getInt8(offset);
+                    if (delta === -128) {
+                        value = view.getInt16(offset + 1, true);
+                        offset += 3;
+                    } else {
+                        value += delta;
+                        offset += 1;
+                    }
+                }
+                voltages[i] = (value + baseline) * gain;
             }
+
+            frames.push({sampleRate, start: new Date(start * 1000), voltages});
+            frameOffset += 30 + size;
+        }
+
+        return frames;
+    }
+
+    /**
+     * Tracer des trames sur un canvas (échelle verticale 0 à 3.3 V, comme les images rendues),
+     * placées selon leur horodatage : les interruptions entre segments restent visibles
+     */
+    drawWaveform(canvas, frames) {
+        const context = canvas.getContext('2d');
+        const {width, height} = canvas;
+        const first = frames[0].start.getTime();
+        const end = Math.max(...frames.map(
+            frame => frame.start.getTime() + (frame.voltages.length / frame.sampleRate) * 1000));
+        const scale = width / Math.max(end - first, 1);
+
+        context.clearRect(0, 0, width, height);
+        context.strokeStyle = '#1f77b4';
+        context.lineWidth = 1;
+        context.beginPath();
+
+        frames.forEach(frame => {
+            const x0 = (frame.start.getTime() - first) * scale;
+            const step = (1000 / frame.sampleRate) * scale;
+
+            frame.voltages.forEach((voltage, i) => {
+                const y = height - (voltage / 3.3) * height;
+                if (i === 0) {
+                    context.moveTo(x0, y);
+                } else {
+                    context.lineTo(x0 + i * step, y);
+                }
+            });
+        });
+
+        context.stroke();
+    }
+
+    /**
+     * Tracer la dernière fenêtre capturée à partir de ses échantillons plutôt que de son image
+     */
+    async showLiveWaveform(windowId) {
+        if (windowId === this.liveWindowId) {
+            return;
+        }
+        
+        try {
+            const frames = await this.fetchWaveformFrames({window: windowId});
             
+            this.drawWaveform(this.elements.liveWaveformCanvas, frames);
+            this.elements.liveWaveform.style.display = 'block';
+            this.liveWindowId = windowId;
         } catch (error) {
-            console.error(`Error loading image ${imageId}:`, error);
-            const loadingElement = container.querySelector('.image-loading');
-            loadingElement.innerHTML = '<i class="fas fa-exclamation-triangle text-warning"></i>';
+            // Fenêtre sans échantillons enregistrés (profil sans échantillons, ancienne capture)
+            console.error('Live waveform error:', error);
+            this.elements.liveWaveform.style.display = 'none';
+        }
+    }
+    
+    /**
+     * Source affichable d'une image (URL objet d'un lot ou données base64)
+     */
+    imageSource(imageData) {
+        return imageData.url || `data:${imageData.mime_type || 'image/png'};base64,${imageData.image_data}`;
+    }
+    
+    /**
+     * Afficher la miniature d'une image de la galerie
+     */
+    showThumbnail(imageId, imageData) {
+        const container = this.elements.imageGallery.querySelector(`[data-image-id="${imageId}"]`);
+        if (!container) {
+            return;
+        }
+        
+        const imgElement = container.querySelector('.image-thumbnail');
+        const loadingElement = container.querySelector('.image-loading');
+        
+        imgElement.onload = () => {
+            loadingElement.style.display = 'none';
+            imgElement.style.display = 'block';
+        };
+        imgElement.src = this.imageSource(imageData);
+    }
+    
+    /**
+     * Signaler une miniature non chargée
+     */
+    showThumbnailError(imageId) {
+        const container = this.elements.imageGallery.querySelector(`[data-image-id="${imageId}"]`);
+        if (container) {
+            container.querySelector('.image-loading').innerHTML = '<i class="fas fa-exclamation-triangle text-warning"></i>';
         }
     }
     
@@ -318,7 +538,7 @@ class ECGRealtimeController {
             }
             
             if (imageData) {
-                this.elements.modalImage.src = `data:image/png;base64,${imageData.image_data}`;
+                this.elements.modalImage.src = this.imageSource(imageData);
                 this.elements.imageInfo.innerHTML = `
                     <p><strong>ID:</strong> ${imageId}</p>
                     <p><strong>Créée le:</strong> ${new Date(imageData.created_at).toLocaleString()}</p>
@@ -349,8 +569,8 @@ class ECGRealtimeController {
             
             if (imageData) {
                 const link = document.createElement('a');
-                link.href = `data:image/png;base64,${imageData.image_data}`;
-                link.download = `ecg_diagnostic_${this.config.diagnosticId}_image_${imageId}.png`;
+                link.href = this.imageSource(imageData);
+                link.download = `ecg_diagnostic_${this.config.diagnosticId}_image_${imageId}.${imageData.mime_type === 'image/webp' ? 'webp' : 'png'}`;
                 link.click();
             }
             
@@ -443,6 +663,23 @@ class ECGRealtimeController {
         if (sessionInfo.total_images) {
             this.updateImageCount(sessionInfo.total_images);
         }
+        
+        // Signal inexploitable : rendu suspendu par le service jusqu'au retour d'un signal correct
+        const issue = sessionInfo.signal ? sessionInfo.signal.issue : null;
+        if (issue !== this.signalIssue) {
+            const labels = {
+                flatline: 'signal plat (électrode débranchée ?)',
+                saturation: 'signal saturé (mauvais contact ?)',
+                noise: 'signal trop bruité'
+            };
+            
+            if (issue) {
+                this.showNotification(`Qualité du signal : ${labels[issue] || issue}, images suspendues`, 'error');
+            } else if (this.signalIssue) {
+                this.showNotification('Signal rétabli, reprise des images', 'success');
+            }
+            this.signalIssue = issue;
+        }
     }
     
     /**
@@ -557,7 +794,12 @@ class ECGRealtimeController {
         this.pausePolling();
         this.stopCaptureTimer();
         
-        // Nettoyer le cache
+        // Nettoyer le cache (et libérer les URL objets des lots)
+        this.imageCache.forEach(imageData => {
+            if (imageData.url) {
+                URL.revokeObjectURL(imageData.url);
+            }
+        });
         this.imageCache.clear();
         
         console.log('ECG Realtime Controller destroyed');
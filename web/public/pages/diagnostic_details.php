@@ -128,6 +128,11 @@ include_once '../../includes/header.php';
                             </div>
                         </div>
                     </div>
+                    
+                    <!-- Tracé de la dernière fenêtre, dessiné depuis ses échantillons -->
+                    <div id="liveWaveform" class="live-waveform mt-3" style="display: none;">
+                        <canvas id="liveWaveformCanvas" width="1000" height="200"></canvas>
+                    </div>
                 </div>
             </div>
         </div>